@@ -6,36 +6,78 @@ Dependencies:
     python-dotenv: version 1.0.1
     influxdb-client: version 1.43.0
     pyside6: version 6.6.2
+    numpy: version 1.24.4
+    pyarrow: version 15.0.2 (optional, for Parquet recording)
 
 
 Classes:
-    E36312A_Controls: holds functions that controls the power source
+    E36312A_Controls: holds functions that controls the power source, the SCPI commands are declared in COMMANDS (see scpi.py)
         Constructor: 
             all parameters
-            DPS: reference to the connected Digital Power Source
+            staleness: time in seconds a cached setting is used before it is read from the power source again
         Methods:
             sample() - all parameters; description
 
+            all methods of SCPIInstrument (cached(), store(), invalidate(), peek(), check(), set(), get(), getMany())
             test() - no parameters; tests the output channels and data logger, resets Power Source to DEFAULT SETTINGS, briefly turns all output channels on
             turnOn() - reference to power source, channel number; turns on the specified channel
             turnOff() - reference to power source, channel number; turns off the specified channel
             turnAllOn() - reference to power source; turns all channels on
             turnAllOff() - reference to power source; turns all channels off
+            getVoltageProtection() - reference to power source, channel number; returns the over voltage protection limit of the specified channel
             findVoltageRange() - reference to power source, channel number; returns the minimum and maximum voltage of the specified channel
             findCurrentRange() - reference to power source, channel number; returns the minimum and maximum current limit of the specified channel
             setVoltage() - reference to power source, channel number, voltage; sets the voltage of the specified channel to the specified voltage, if it is within the alotted range
             setCurrentLimit() - reference to power source, channel number, current limit; sets the current limit of the specified channel to the specified current limit, if it is within the alotted range
             getCurrentLimit() - reference to power source, channel number; returns the set current limit
             getSetVoltage() - reference to power source, channel number; returns the set voltage
-            getCurrent() - reference to power source, channel number; returns the output current limit
-            getVoltage() - reference to power source, channel number; returns the output voltage
+            getCurrent() - reference to power source, channel number; returns the measured output current
+            getVoltage() - reference to power source, channel number; returns the measured output voltage
             enableDlogVoltage() - reference to power source, channel number; enables the voltage for the specified channel on the data logger
             disableDlogVoltage() - reference to power source, channel number; disables the voltage for the specified channel on the data logger
             enableDlogCurrent() - reference to power source, channel number; enables the current for the specified channel on the data logger
             disableDlogCurrent() - reference to power source, channel number; disables the current for the specified channel on the data logger
             setDlogTime() - reference to power source, time in seconds; sets the duration of time for data logger to record
+            startDlog() - reference to power source, file name; starts the data logger, recording to the file on the external drive
+            setDlogPeriod() - reference to power source, period in seconds; sets the sample period of the data logger, returns the period the power source uses
+            abortDlog() - reference to power source; stops the data logger
+            fetchDlog() - reference to power source, number of records; returns up to that many data logger records that were not fetched yet as one flat list
+                          of values, every record is the logged voltage and current of each channel in channel order
             writeCommand() - reference to power source, command; queries the power source with the specified command
             changeOperationMode() - reference to power source, mode of operation; changes the operation mode of channel 3 to the specified mode
+            channelList() - list of channel numbers; returns the SCPI channel list for the channels, (@1:3) for a contiguous range
+            measureAll() - reference to power source, list of channel numbers; reads the voltage, current and output state of every listed channel in one query and returns an E36312A_Snapshot
+            getChannelSettings() - reference to power source, channel number; returns the output state, set voltage and set current limit of the specified channel in one query
+            getOperationMode() - reference to power source; returns the operation mode of channel 3 (OFF, SER, PAR)
+            poll() - reference to power source, list of items; reads every item in one query and returns a dictionary of item: value, used by PollScheduler
+                     items: ("pair",) operation mode, ("settings", channel) output state, set voltage and set current limit, ("measure", channel) E36312A_Snapshot
+                     operation mode and settings are taken from the cache when they are fresh, measurements are always read
+
+    E36312A_Dlog: Records with the data logger of the power source (SENS:DLOG). The power source samples voltage and current at the logger period on its own,
+    the records are fetched in chunks (FETC:DLOG?) so one query returns many samples.
+        Constructor:
+            chlist: list of channel numbers to log
+            period: time in seconds between samples (the power source may round it, start() returns the period it uses)
+            duration: time in seconds the data logger runs
+            file: name of the log file the power source writes on the external drive
+            chunk: maximum number of records per query
+            controls: E36312A_Controls to use (optional)
+        Methods:
+            sample() - all parameters; description
+
+            start() - reference to power source; enables voltage and current logging of the channels (disables the others), sets period and duration, reads the
+                      output states and starts the data logger, returns the period
+            fetch() - reference to power source, maximum number of queries (optional); fetches the new records in chunks, returns them as E36312A_Snapshots
+                      timestamped start + record number * period
+            stop() - reference to power source; fetches the records that are left, stops the data logger, returns the records
+            finished() - no parameters; returns True once the records of the whole duration were fetched
+            stats() - no parameters; returns a dictionary of counters: records, transfers, period
+
+    Note: The methods take the power source as the first parameter so they can be run on the acquisition worker (self.worker.submit(dlog.fetch, ...)).
+    Note: The output state of each channel is read once in start(), the data logger only logs voltage and current.
+
+    ChannelReading: measured voltage, current and output state of one channel, power is calculated from voltage and current
+    E36312A_Snapshot: timestamp (nanoseconds since epoch, when the query was sent), end (when the answer arrived) and ChannelReading of every channel read by measureAll()
 
     GUI_E36312A: Creates the GUI for the power source
         Constructor:
@@ -44,33 +86,69 @@ Classes:
         Methods:
             sample() - all parameters; description
 
-            createChannel() - channel number; creates the interface for one output channel, with the correct voltage and current limit ranges
+            createChannel() - channel number; creates the interface for one output channel, with the correct voltage and current limit ranges, subscribes it to the poll scheduler
             toggleButton() - channel number, reference to the button; turns the specific channel off, updates the appearance of the button
             toggleAllChannelsOn() - no parameters; turns all channels on, updates button texts
             toggleAllChannelsOff() - no parameters; turns all channels off, updates button texts
             readVoltageEntry() - channel number, reference to voltage entry text box; sets the voltage of the specified channel to the specified voltage, updates set voltage label
+            voltageEntryResult() - result of setVoltage(); warns the user if the voltage was out of range
             readCurrentEntry() - channel number, reference to current limit entry text box; sets the current limit of the specified channel to the specified current limit, updates set current limit label
-            updateVoltageCurrent() - channel number, reference to voltage label, reference to current label; updates the voltage and current readings as measured by the power source
+            currentEntryResult() - result of setCurrentLimit(); warns the user if the current limit was out of range
+            displayVoltageCurrent() - E36312A_Snapshot, channel number, reference to voltage label, reference to current label; displays the measured voltage and current, adds them to the live plot
             addTerminal() - no parameters; createsthe interface for the terminal
             sendTerminalCommand() - no parameters; queries the power source with the inputted command and displays the response
             createNotesBox() - no parameters; creates the interface for the notes
             importTextFile() - no parameters; displays the saved notes from previous sessions
             saveNotes() - no parameters; saves the notes in the textbox to a text file
-            startRecording() - reference to status label; starts recording data at specified frequency, updates status label
-            stopRecording() - reference to status label; stops recording data, updates status label
-            setRecordingDelay() - time delay, reference to frequency label, reference to frequency entry box; updates the frequency of measurements, updates the label
-            record() - reference to power source; queries all three channels of the power source and writes voltage and current to InfluxDB if the channel is turned on
+            openSpool() - reference to status label; opens the spool, drainer, Parquet sink and capture file for the selected bucket if they are not open yet, starts a new capture segment,
+                        notes in the terminal output if pyarrow is missing, returns False if no bucket is selected
+            startRecording() - reference to status label; starts the sampling clock at specified frequency, opens the spool and drainer for the selected bucket, updates status label
+            startDlogRecording() - reference to status label, reference to period entry box; starts recording with the data logger of the power source at the entered sample period
+            dlogFailed() - reference to status label; stops data logger recording and warns the user if the data logger could not be started
+            fetchDlog() - no parameters; requests the new data logger records, stops recording when the data logger is finished
+            writeDlog() - list of E36312A_Snapshots; appends the data logger records to the spool for InfluxDB, the Parquet sink, the capture file and the live plot
+            stopDlog() - list of E36312A_Snapshots; writes the last data logger records, seals the spool, completes the Parquet file and flushes the capture file
+            stopRecording() - reference to status label; stops recording data (or the data logger), seals the spool so the drainer sends the rest to InfluxDB, completes the Parquet file, flushes the capture file, shows the number of samples and missed samples
+            closeSpool() - no parameters; seals the spool and closes the spool, drainer, InfluxDB client, Parquet sink and capture file without waiting for InfluxDB,
+                           what was not sent yet stays in the spool and is sent the next time the bucket is recorded to, a drainer still in a write closes its client
+                           when the write returns
+            setRecordingDelay() - time delay, reference to frequency label, reference to frequency entry box; updates the period of the sampling clock, updates the label
+            record() - SampleTick; requests a measurement of all active channels of the power source, counts the tick as an overrun if the last measurement is still waiting
+            writeRecord() - E36312A_Snapshot, SampleTick; records the acquisition time with the sampling clock, appends one point (voltage, current, power, output state)
+                            per channel that is turned on to the spool for InfluxDB and every channel to the Parquet sink, capture file and live plot, shows the jitter and missed samples in the status label
             addRecording() - reference to bucket label, reference to recording status label; creates the interface for the data recorder
-            displayBuckets() - no parameters; lists all available buckets in InfluxDB
+            addLivePlot() - no parameters; creates the live plot of voltage, current and power with its time span entry and clear button
+            setPlotSpan() - reference to span entry box; changes the time shown by the live plot
+            displayBuckets() - list of bucket names; lists the available buckets, called with the cached names and again when a refresh finishes
+            refreshBuckets() - no parameters; loads the bucket names from InfluxDB in the background
+            bucketRequestFailed() - operation, error message; warns the user if a bucket could not be created, marks the list as cached if it could not be refreshed
             selectBucket() - reference to bucket label; updates the selected bucket, updates bucket label
-            createBucket() - reference to bucket entry box; creates new InfluxDB bucket, refreshes bucket list
-            syncPowerSupply() - reference to power source, reference to on/off button, reference to channel number, reference to voltage label, reference to current label; syncs the status of each channel on the GUI with the power source
-            syncOutputChannel() - reference to power source, reference to the channel 3 widget, reference to the timer updating the status of channel 3; Synchronizes channel 3 with operation mode (independent, series, parallel), resets timers used to update channel status to avoid runtime errors
-            syncOutputChannel2() - reference to power source, reference to the channel 3 widget; same as above but for when channel 3 is in series or in parallel, without reference to timer because it does not exist
+            createBucket() - reference to bucket entry box; creates new InfluxDB bucket in the background, refreshes bucket list when it is created
+            displayPowerSupply() - channel settings, reference to on/off button, reference to voltage label, reference to current label; syncs the status of the channel on the GUI with the power source
+            updateOutputChannel() - operation mode; Synchronizes channel 3 with operation mode (independent, series, parallel), rebuilds channel 3 and its subscriptions when the mode changes
             addChannel3Status() - no parameters; creates interface for changing output mode of channel 3 (Independent, Series, Parallel)
-            
-    Note: Code that displays the output voltage and current is disabled because it causes significant lag when running.
-    Note: It is recommended that the power source be fully configured before user starts recording data as it causes significant lag.
+            closeEvent() - close event; stops the acquisition worker and the data logger, closes the spool and the bucket directory before the window closes
+
+    Note: All communication with the power source after the window is created goes through self.worker (AcquisitionWorker, see acquisition.py), which runs it on
+    a separate thread and updates the widgets when the response arrives. Do not call self.DPS directly from the GUI.
+    Note: Recorded data is written to a local spool (spool/<bucket>, see spool.py) and sent to InfluxDB from there, so recording does not wait on the network
+    and data recorded while InfluxDB is unreachable is sent once it is reachable again.
+    Note: The window does not wait for InfluxDB. Bucket names are shown from bucket_cache.json (see buckets.py), listing and creating buckets runs on a
+    background thread, and InfluxDB is first contacted when the list is refreshed, a bucket is created or recording is started.
+    Note: E36312A_Controls keeps a write-through cache of the settings (set voltage, current limit, output state, protection limits, operation mode), writes
+    update it and reads are answered from it until it is older than staleness. *RST (test()), changing the operation mode and terminal commands clear it.
+    Which commands are cached and what clears them is declared in COMMANDS.
+    Note: Recording is driven by a SamplingClock (see clock.py), samples are due at fixed times from the start of the recording so they do not drift, samples that
+    cannot be taken in time are skipped and counted. Points are timestamped with the time the measurement query was sent.
+    Note: Data logger recording (E36312A_Dlog) lets the power source sample at its own period, the records are fetched in chunks every DLOG_FETCH_INTERVAL
+    seconds and written to the same spool, Parquet and capture files as software recording.
+    Note: When pyarrow is installed, recordings are also kept locally as Parquet files (recordings/<bucket>, see columnar.py), every channel with voltage, current,
+    power and output state, written in row groups. Load them with columnar.readRecording().
+    Note: Every recording is also appended to a memory mapped capture file (recordings/<bucket>/E36312A.capture, see capture.py), one segment per recording,
+    an analysis process can read it with capture.CaptureReader while it is being written.
+    Note: The live plot (LivePlot, see liveplot.py) is fed with the measurements of the poll scheduler and of recording, it redraws at most every PLOT_REFRESH
+    seconds, whatever the sample rate.
+    Note: Periodic reads are not owned by the widgets, they subscribe to self.scheduler (PollScheduler, see scheduler.py), which reads everything that is due in one query.
 """
 
 
@@ -78,26 +156,95 @@ Classes:
 from pyvisa.errors import VisaIOError
 from datetime import datetime
 from statistics import mean
+from dataclasses import dataclass
+from typing import List
+import time
 
 #Influx imports
 import os
 from dotenv import load_dotenv
-from influxdb_client import BucketRetentionRules, BucketsApi
-from influxdb_client.client.write_api import SYNCHRONOUS
-from influxdb_client import InfluxDBClient, BucketsApi, BucketRetentionRules
 
 #Pyside6 imports
 from PySide6.QtWidgets import QMainWindow, QLabel, QPushButton, QLineEdit, QVBoxLayout, QHBoxLayout, QWidget, QMessageBox, QListWidget, QTextEdit
 from PySide6.QtCore import QTimer
 
-import csv
 
 #Python Scripts
 from influx import InfluxClient
+from buckets import BucketDirectory
+from spool import TelemetrySpool, SpoolDrainer
+from lineprotocol import encodeSnapshot
+from acquisition import AcquisitionWorker
+from scheduler import PollScheduler
+from clock import SamplingClock
+from columnar import ColumnarSink, pyarrowAvailable
+from capture import CaptureWriter
+from liveplot import LivePlot
+from scpi import SCPIInstrument, Command, channelList, parseBool, parseLine
+
+SPOOL_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "spool")
+RECORDING_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+RECORD_PRECISION = 'ns'
+# Data logger recording runs until stopped or for this long, fetching new records every DLOG_FETCH_INTERVAL seconds
+DLOG_DURATION = 86400
+# Closing waits at most this many seconds for a write to InfluxDB that is in progress
+DRAIN_STOP_TIMEOUT = 2.0
+# Live plot: samples kept per channel, time shown in seconds, time between redraws in seconds
+PLOT_CAPACITY = 100000
+PLOT_SPAN = 300
+PLOT_REFRESH = 0.1
+DLOG_FETCH_INTERVAL = 0.2
+CHANNELS = [1, 2, 3]
+PAIR_MODES = ["OFF", "SER", "PAR"]
 
 # Functions
-class E36312A_Controls:
-    
+@dataclass
+class ChannelReading:
+    channel: int
+    voltage: float
+    current: float
+    output: bool
+
+    @property
+    def power(self):
+        return self.voltage * self.current
+
+
+@dataclass
+class E36312A_Snapshot:
+    timestamp: int
+    readings: List[ChannelReading]
+    end: int = None
+
+    def channel(self, ch):
+        for reading in self.readings:
+            if reading.channel == int(ch):
+                return reading
+        return None
+
+
+class E36312A_Controls(SCPIInstrument):
+    COMMANDS = (
+        Command("reset", write="*RST", invalidates="*"),
+        Command("clear", write="*CLS"),
+        Command("identify", query="*IDN?"),
+        Command("output", write="OUTP {value}, (@{ch})", query="OUTP:STAT? (@{ch})", parse=parseBool, validate={"ch": CHANNELS}, cached=True),
+        Command("voltage", write="VOLT {value}, (@{ch})", query="VOLT? (@{ch})", parse=float, validate={"ch": CHANNELS}, cached=True),
+        Command("current", write="CURR {value}, (@{ch})", query="CURR? (@{ch})", parse=float, validate={"ch": CHANNELS}, cached=True),
+        Command("voltageProtection", query="VOLT:PROT? (@{ch})", parse=float, validate={"ch": CHANNELS}, cached=True),
+        # Pairing changes the setpoints and limits of channels 2 and 3
+        Command("pair", write="OUTP:PAIR {value}", query="OUTP:PAIR?", parse=parseLine, validate={"value": PAIR_MODES}, cached=True, invalidates="*"),
+        Command("measureVoltage", query="MEAS:VOLT:DC? (@{ch})", parse=float, validate={"ch": CHANNELS}),
+        Command("measureCurrent", query="MEAS:CURR:DC? (@{ch})", parse=float, validate={"ch": CHANNELS}),
+        Command("dlogVoltage", write="SENS:DLOG:FUNC:VOLT {value}, (@{ch})", validate={"ch": CHANNELS}),
+        Command("dlogCurrent", write="SENS:DLOG:FUNC:CURR {value}, (@{ch})", validate={"ch": CHANNELS}),
+        Command("dlogTime", write="SENS:DLOG:TIME {value}"),
+        Command("dlogPeriod", write="SENS:DLOG:PER {value}", query="SENS:DLOG:PER?", parse=float),
+        Command("dlogStart", write="INIT:DLOG 'External:/{file}.csv'"),
+        Command("dlogAbort", write="ABOR:DLOG"),
+        Command("dlogFetch", query="FETC:DLOG? {count}"),
+    )
+
     def test(self, DPS):
         """Tests device connection"""
         DPS.read_termination = '\n'
@@ -105,61 +252,54 @@ class E36312A_Controls:
         DPS.channels = 3
         DPS.powertest = 13
         DPS.datalog = 30
-        DPS.write("*CLS")
-        DPS.write("*RST")
+        self.set(DPS, "clear")
+        self.set(DPS, "reset")
         powertest = []
-        for state in ['1', '0']:
+        for state in [True, False]:
             for channel in range(DPS.channels):
-                powertest.append(DPS.write(f"OUTP {state}, (@{channel+1})"))
+                powertest.append(self.set(DPS, "output", state, ch=channel+1))
         if (not mean(powertest) == DPS.powertest):
             print("Power Test Failed")
             return None
     
         datalog = []
-        for state in ['1', '0']:
-            for type in ['VOLT', 'CURR']:
-                datalog.append(DPS.write(f"SENS:DLOG:FUNC:{type} {state}, (@1:3)"))
+        for state in [True, False]:
+            for type in ["dlogVoltage", "dlogCurrent"]:
+                datalog.append(self.set(DPS, type, state, ch=CHANNELS))
         if (not mean(datalog) == DPS.datalog):
             print("Data Logger Test Failed")
             return None
         return True
             
     def turnOn(self, DPS, ch):
-        chlist=[1,2,3]
-        if int(ch) not in chlist:
-            print("Invalid Channel")
-        else:
-            DPS.write(f"OUTP 1, (@{ch})")
+        self.set(DPS, "output", True, ch=ch)
     
     def turnOff(self, DPS, ch):
-        chlist=[1,2,3]
-        if int(ch) not in chlist:
-            print("Invalid Channel")
-        else:
-            DPS.write(f"OUTP 0, (@{ch})")
+        self.set(DPS, "output", False, ch=ch)
 
     def turnAllOn(self, DPS, chlist):
-        for ch in chlist:
-            DPS.write(f"OUTP 1, (@{ch})")
+        self.set(DPS, "output", True, ch=list(chlist))
 
     def turnAllOff(self, DPS, chlist):
-        for ch in chlist:
-            DPS.write(f"OUTP 0, (@{ch})")
+        self.set(DPS, "output", False, ch=list(chlist))
+
+    def getVoltageProtection(self, DPS, ch):
+        return self.get(DPS, "voltageProtection", ch=ch)
 
     def findVoltageRange(self, DPS, ch, paired):
         maximum = 0
         if (ch == 1):  
-            maximum = min(float(DPS.query(f"VOLT:PROT? (@{ch})")), 6.18)
+            maximum = min(self.getVoltageProtection(DPS, ch), 6.18)
         elif (ch == 2):
             if (paired == "OFF\n"):
-                maximum = min(float(DPS.query(f"VOLT:PROT? (@{ch})")), 25.75)
+                maximum = min(self.getVoltageProtection(DPS, ch), 25.75)
             elif (paired == "SER\n"):
-                maximum = min(float(DPS.query(f"VOLT:PROT? (@{ch})")), 50)
+                maximum = min(self.getVoltageProtection(DPS, ch), 50)
             elif (paired == "PAR\n"):
-                maximum = min(float(DPS.query(f"VOLT:PROT? (@{ch})")), 25)
+                maximum = min(self.getVoltageProtection(DPS, ch), 25)
         elif (ch == 3):
             if (paired == "OFF\n"):
-                maximum = min(float(DPS.query(f"VOLT:PROT? (@{ch})")), 25.75)
+                maximum = min(self.getVoltageProtection(DPS, ch), 25.75)
         return 0, maximum
 
     def findCurrentRange(self, ch, paired):
@@ -173,102 +313,71 @@ class E36312A_Controls:
         return 0.001, maximum
     
     def setVoltage(self, DPS, ch, voltage, paired):
-        range = self.findVoltageRange(DPS, ch, paired)
-        chlist=[1,2,3]
-        if int(ch) not in chlist:
-            print("Invalid Channel")
+        if not self.check("voltage", ch=ch):
             return -1
-        elif voltage > range[1] or voltage < range[0]:
+        range = self.findVoltageRange(DPS, ch, paired)
+        if voltage > range[1] or voltage < range[0]:
             #print("Voltage Out of Range")
             return -2
-        else:
-            DPS.write(f"VOLT {voltage}, (@{ch})")
-            return 1
+        self.set(DPS, "voltage", voltage, ch=ch)
+        return 1
 
     def setCurrentLimit(self, DPS, ch, current):
-        range = self.findCurrentRange(DPS, ch)
-        chlist=[1,2,3]
-        if int(ch) not in chlist:
-            print("Invalid Channel")
+        if not self.check("current", ch=ch):
             return -1
-        elif current > range[1] or current < range[0]:
+        range = self.findCurrentRange(ch, self.getOperationMode(DPS))
+        if current > range[1] or current < range[0]:
             #print("Current Out of Range")
             return -2
-        else:
-            DPS.write(f"CURR {current}, (@{ch})")
-            return 1
+        self.set(DPS, "current", current, ch=ch)
+        return 1
     
     def getCurrentLimit(self, DPS, ch):
-        chlist=[1,2,3]
-        if int(ch) not in chlist:
-            print("Invalid Channel")
-            return None
-        else:
-            current = DPS.query(f"SOUR:CURR? (@{ch})")
-            return current
+        return self.get(DPS, "current", ch=ch)
     
     def getSetVoltage(self, DPS, ch):
-        chlist=[1,2,3]
-        if int(ch) not in chlist:
-            print("Invalid Channel")
-            return None
-        else:
-            voltage = DPS.query(f"SOUR:VOLT? (@{ch})")
-            return voltage
+        return self.get(DPS, "voltage", ch=ch)
     
     def getCurrent(self, DPS, ch):
-        chlist=[1,2,3]
-        if int(ch) not in chlist:
-            print("Invalid Channel")
-            return None
-        else:
-            current = DPS.query(f"MEAS:CURR:DC? (@{ch})")
-            return current
+        return self.get(DPS, "measureCurrent", ch=ch)
     
     def getVoltage(self, DPS, ch):
-        chlist=[1,2,3]
-        if int(ch) not in chlist:
-            print("Invalid Channel")
-            return None
-        else:
-            voltage = DPS.query(f"MEAS:VOLT:DC? (@{ch})")
-            return voltage
+        return self.get(DPS, "measureVoltage", ch=ch)
     
     def enableDlogVoltage(self, DPS, ch):
-        chlist=[1,2,3]
-        if int(ch) not in chlist:
-            print("Invalid Channel")
-        else:
-            DPS.write(f"SENS:DLOG:FUNC:VOLT 1, (@{ch})")
+        self.set(DPS, "dlogVoltage", True, ch=ch)
     
     def disableDlogVoltage(self, DPS, ch):
-        chlist=[1,2,3]
-        if int(ch) not in chlist:
-            print("Invalid Channel")
-        else:
-            DPS.write(f"SENS:DLOG:FUNC:VOLT 0, (@{ch})")
+        self.set(DPS, "dlogVoltage", False, ch=ch)
     
     def enableDlogCurrent(self, DPS, ch):
-        chlist=[1,2,3]
-        if int(ch) not in chlist:
-            print("Invalid Channel")
-        else:
-            DPS.write(f"SENS:DLOG:FUNC:CURR 1, (@{ch})")
+        self.set(DPS, "dlogCurrent", True, ch=ch)
     
     def disableDlogCurrent(self, DPS, ch):
-        chlist=[1,2,3]
-        if int(ch) not in chlist:
-            print("Invalid Channel")
-        else:
-            DPS.write(f"SENS:DLOG:FUNC:CURR 0, (@{ch})")
+        self.set(DPS, "dlogCurrent", False, ch=ch)
     
     def setDlogTime(self, DPS, time):
-        DPS.write(f"SENS:DLOG:TIME {time}")
+        self.set(DPS, "dlogTime", time)
     
     def startDlog(self, DPS, file):
-        DPS.write(f"INIT:DLOG 'External:/{file}.csv'")
+        self.set(DPS, "dlogStart", file=file)
+
+    def setDlogPeriod(self, DPS, period):
+        """Sets the sample period of the data logger, returns the period the power source uses"""
+        self.set(DPS, "dlogPeriod", period)
+        return self.get(DPS, "dlogPeriod")
+
+    def abortDlog(self, DPS):
+        self.set(DPS, "dlogAbort")
+
+    def fetchDlog(self, DPS, count):
+        """Returns up to count records of the data logger that were not fetched yet, as one flat list of values"""
+        answer = self.get(DPS, "dlogFetch", count=count)
+        return [float(value) for value in answer.split(",")] if answer else []
 
     def writeCommand(self, DPS, command):
+        # Anything can be changed from the terminal
+        self.invalidate()
         try:
             response = DPS.query(command)
             return response
@@ -276,9 +385,126 @@ class E36312A_Controls:
             return "Invalid Command"
         
     def changeOperationMode(self, DPS, mode):
-        DPS.write(f"OUTP:PAIR {mode}")
+        self.set(DPS, "pair", mode)
+
+    def channelList(self, chlist):
+        return f"(@{channelList(chlist)})"
+
+    def measureAll(self, DPS, chlist):
+        """Reads voltage, current and output state of all listed channels in one transaction"""
+        chlist = sorted(int(ch) for ch in chlist)
+        timestamp = time.time_ns()
+        values = self.getMany(DPS, self._measureRequests(chlist))
+        return self._snapshot(chlist, timestamp, values, time.time_ns())
+
+    def _measureRequests(self, chlist):
+        return [("measureVoltage", {"ch": chlist}), ("measureCurrent", {"ch": chlist}), ("output", {"ch": chlist})]
+
+    def _snapshot(self, chlist, timestamp, values, end=None):
+        voltages, currents, states = values
+        readings = [ChannelReading(ch, voltages[i], currents[i], states[i]) for i, ch in enumerate(chlist)]
+        return E36312A_Snapshot(timestamp, readings, end)
+
+    def poll(self, DPS, items):
+        """Reads every item in one chained query, returns a dictionary of item: value"""
+        requests = []
+        for item in items:
+            if item[0] == "pair":
+                requests.append(("pair", {}))
+            elif item[0] == "settings":
+                requests += [("output", {"ch": item[1]}), ("voltage", {"ch": item[1]}), ("current", {"ch": item[1]})]
+        measured = sorted(set(int(item[1]) for item in items if item[0] == "measure"))
+        if measured:
+            requests += self._measureRequests(measured)
+
+        timestamp = time.time_ns()
+        values = self.getMany(DPS, requests)
+        end = time.time_ns()
+        results = {}
+        for item in items:
+            if item[0] == "pair":
+                results[item] = values.pop(0)
+            elif item[0] == "settings":
+                results[item] = tuple(values[:3])
+                del values[:3]
+        if measured:
+            snapshot = self._snapshot(measured, timestamp, values[:3], end)
+            for item in items:
+                if item[0] == "measure":
+                    results[item] = snapshot
+        return results
+
+    def getChannelSettings(self, DPS, ch):
+        """Returns output state, set voltage and set current limit in one query"""
+        return tuple(self.getMany(DPS, [("output", {"ch": ch}), ("voltage", {"ch": ch}), ("current", {"ch": ch})]))
+
+    def getOperationMode(self, DPS):
+        return self.get(DPS, "pair")
         
 
+class E36312A_Dlog:
+    def __init__(self, chlist, period=0.001, duration=3600, file="dlog", chunk=1000, controls=None):
+        self.chlist = sorted(int(ch) for ch in chlist)
+        self.period = period
+        self.duration = duration
+        self.file = file
+        self.chunk = chunk
+        self.controls = controls or E36312A_Controls()
+        self._timestamp = None
+        self._outputs = {}
+        self._counters = {"records": 0, "transfers": 0}
+
+    def start(self, DPS):
+        """Configures the data logger to log voltage and current of the channels and starts it"""
+        others = [ch for ch in CHANNELS if ch not in self.chlist]
+        for function in ["dlogVoltage", "dlogCurrent"]:
+            self.controls.set(DPS, function, True, ch=self.chlist)
+            if others:
+                self.controls.set(DPS, function, False, ch=others)
+        self.period = self.controls.setDlogPeriod(DPS, self.period)
+        self.controls.setDlogTime(DPS, self.duration)
+        states = self.controls.get(DPS, "output", ch=self.chlist)
+        self._outputs = dict(zip(self.chlist, states))
+        self.controls.startDlog(DPS, self.file)
+        # Record n was taken n periods after the logger started
+        self._timestamp = time.time_ns()
+        self._counters = {"records": 0, "transfers": 0}
+        return self.period
+
+    def fetch(self, DPS, limit=10):
+        """Fetches the new records in chunks, returns them as E36312A_Snapshots"""
+        snapshots = []
+        width = 2 * len(self.chlist)
+        for _ in range(limit):
+            values = self.controls.fetchDlog(DPS, self.chunk)
+            records = len(values) // width
+            for i in range(records):
+                record = values[i * width:(i + 1) * width]
+                timestamp = self._timestamp + int(round((self._counters["records"] + i) * self.period * 1e9))
+                readings = [ChannelReading(ch, record[2 * j], record[2 * j + 1], self._outputs[ch]) for j, ch in enumerate(self.chlist)]
+                snapshots.append(E36312A_Snapshot(timestamp, readings, timestamp))
+            self._counters["records"] += records
+            self._counters["transfers"] += 1
+            # A short chunk means everything logged so far was fetched
+            if records < self.chunk:
+                break
+        return snapshots
+
+    def stop(self, DPS):
+        """Fetches what is left and stops the data logger"""
+        snapshots = self.fetch(DPS)
+        self.controls.abortDlog(DPS)
+        return snapshots
+
+    def finished(self):
+        return self._timestamp is not None and self._counters["records"] * self.period >= self.duration
+
+    def stats(self):
+        stats = dict(self._counters)
+        stats["period"] = self.period
+        return stats
+
+
 class GUI_E36312A(QMainWindow):
     def __init__(self, DPS, parent=None): 
         global channels
@@ -286,32 +512,26 @@ class GUI_E36312A(QMainWindow):
         global allButtons
         global upload_timer
         global buckets
-        global bucketList
         global bucketNames
         global selectedBucket
         global frequency
         global token
         global org
-        global buckets_api
         global terminal_layout
         global control_layout
         global recording_layout
         global channel_layout
         global paired
-        global channel_timer
 
         load_dotenv()
         token = os.getenv('TOKEN')
         org = os.getenv('ORG')
 
-        self.client = InfluxDBClient(url="http://bragi.caltech.edu:8086", token=token, org=org)
-        
-        # Initialize BucketsApi with the client
-        buckets_api = BucketsApi(self.client)
+        # Starts with the cached bucket names, InfluxDB is only contacted on a refresh, a new bucket or the first recording
+        self.bucketDirectory = BucketDirectory(token, org)
 
         frequency = 2.0
         selectedBucket = "None"
-        bucketList = buckets_api.find_buckets().buckets
         bucketNames = []
         buckets = QListWidget()
         allButtons = []
@@ -330,6 +550,19 @@ class GUI_E36312A(QMainWindow):
         if (paired != "OFF\n"):
             channels = [1, 2]
 
+        self.spool = None
+        self.drainer = None
+        self.stoppingDrainers = {}
+        self.columnar = None
+        self.capture = None
+        self.dlog = None
+        self.dlogTimer = QTimer(self)
+        self.dlogTimer.timeout.connect(self.fetchDlog)
+        self.worker = AcquisitionWorker(DPS)
+        self.worker.start()
+        self.scheduler = PollScheduler(self.worker, x.poll)
+        self.subscriptions = {}
+
         self.setWindowTitle("E36312A GUI")
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
@@ -344,11 +577,10 @@ class GUI_E36312A(QMainWindow):
         self.outputLabel = QLabel("Output Channels")
         control_layout.addWidget(self.outputLabel)
 
-        channel_timer = QTimer(control_layout)
-
         self.createChannel(1)
         self.createChannel(2)
         self.createChannel(3)
+        self.scheduler.subscribe(("pair",), self.updateOutputChannel)
 
         control_layout.addLayout(channel_layout)
 
@@ -385,16 +617,20 @@ class GUI_E36312A(QMainWindow):
         
         self.addRecording(self.bucketLabel, self.isRecording)
 
+        self.addLivePlot()
+
         main_layout.addLayout(control_layout)
         main_layout.addLayout(recording_layout)     
+        main_layout.addLayout(self.layoutP, 1)
 
-        upload_timer = QTimer(self)
-        upload_timer.timeout.connect(lambda: self.record(self.DPS))
+        upload_timer = SamplingClock(self.record, frequency, parent=self)
+
+        # Started last, a dialog shown while the window is built (importTextFile()) runs the event loop and delivers poll results to the widgets
+        self.scheduler.start()
 
 
     
     def createChannel(self, ch):
-        global channel_timer
         if (paired != "OFF\n" and ch == 3):
             self.layoutC = QVBoxLayout()
             channel_label = QLabel(f"Channel {ch}")
@@ -410,14 +646,7 @@ class GUI_E36312A(QMainWindow):
             self.widget.setLayout(self.layoutC)
             self.widget.setStyleSheet("background-color: rgba(0, 0, 255, 64);")
             channel_layout.addWidget(self.widget)
-
-            if channel_timer.isActive():
-                channel_timer.stop()
-                del channel_timer
-
-            channel_timer = QTimer(control_layout)
-            channel_timer.timeout.connect(lambda: self.syncOutputChannel2(self.DPS, self.widget))
-            channel_timer.start(1000)
+            self.channel3Widget = self.widget
 
         else:
             global allButtons
@@ -437,14 +666,16 @@ class GUI_E36312A(QMainWindow):
             button.setStyleSheet("background-color: red")
             self.layoutC.addWidget(button)
 
-            allButtons.append(button)
-            voltage_range = x.findVoltageRange(self.DPS, ch, paired)
+            if len(allButtons) >= ch:
+                allButtons[ch - 1] = button
+            else:
+                allButtons.append(button)
             voltage_label = QLabel("Set Voltage")
             self.layoutC.addWidget(voltage_label)
 
             voltage_entry = QLineEdit()
-            hint_voltage = f"{voltage_range[0]}V - {voltage_range[1]}V"
-            voltage_entry.setPlaceholderText(hint_voltage)
+            self.worker.submit(x.findVoltageRange, ch, paired,
+                               callback=lambda voltage_range: voltage_entry.setPlaceholderText(f"{voltage_range[0]}V - {voltage_range[1]}V"))
             voltage_entry.setStyleSheet("color: black")
             voltage_entry.setStyleSheet("background-color: white")
             voltage_entry.installEventFilter(self)  # To handle placeholder text behavior
@@ -478,11 +709,6 @@ class GUI_E36312A(QMainWindow):
             display_current = QLabel()
             self.layoutC.addWidget(display_current)
 
-            #This code displays the actual outputs of each channel; disabled because it causes significant lag
-            # update_timer = QTimer(self)
-            # update_timer.timeout.connect(lambda: self.updateVoltageCurrent(ch, display_voltage, display_current))
-            # update_timer.start(1000)
-
             self.widget = QWidget()
             self.widget.setLayout(self.layoutC)
             if (ch == 1):
@@ -494,39 +720,34 @@ class GUI_E36312A(QMainWindow):
 
 
             channel_layout.addWidget(self.widget)
+            if (ch == 3):
+                self.channel3Widget = self.widget
 
-            update_timer = QTimer(control_layout)
-            update_timer.timeout.connect(lambda: self.syncPowerSupply(self.DPS, button, ch, setVoltageLabel, setCurrentLimitLabel))
-            update_timer.start(1000)
-
-            if channel_timer.isActive():
-                channel_timer.stop()
-                del channel_timer
-            
-            channel_timer = QTimer(control_layout)
-            channel_timer.timeout.connect(lambda: self.syncOutputChannel(self.DPS, self.widget, update_timer))
-            channel_timer.start(1000)
+            self.subscriptions[ch] = [
+                self.scheduler.subscribe(("settings", ch), lambda settings: self.displayPowerSupply(settings, button, setVoltageLabel, setCurrentLimitLabel)),
+                self.scheduler.subscribe(("measure", ch), lambda snapshot: self.displayVoltageCurrent(snapshot, ch, display_voltage, display_current)),
+            ]
 
     def toggleButton(self, ch, button):
         if button.text() == 'OFF':
-            x.turnOn(self.DPS, ch)
+            self.worker.submit(x.turnOn, ch)
             button.setText('ON')
             button.setStyleSheet("background-color: green")
         else:
-            x.turnOff(self.DPS, ch)
+            self.worker.submit(x.turnOff, ch)
             button.setText('OFF')
             button.setStyleSheet("background-color: red")
 
     def toggleAllChannelsOn(self):
         global x
 
-        x.turnAllOn(self.DPS, channels)
+        self.worker.submit(x.turnAllOn, list(channels))
         for i in channels:  # Assuming you have 3 channels
             allButtons[i - 1].setText("ON")
             allButtons[i - 1].setStyleSheet("background-color: green")
 
     def toggleAllChannelsOff(self):
-        x.turnAllOff(self.DPS, channels)
+        self.worker.submit(x.turnAllOff, list(channels))
         for i in channels:  # Assuming you have 3 channels
             allButtons[i - 1].setText("OFF")
             allButtons[i - 1].setStyleSheet("background-color: red")
@@ -539,12 +760,14 @@ class GUI_E36312A(QMainWindow):
             return
         try:
             voltage = float(text)
-            result = x.setVoltage(self.DPS, ch, voltage, paired)
-            if result == -2:
-                QMessageBox.warning(self, "Warning", "Voltage Entered Out Of Range", QMessageBox.Ok)
+            self.worker.submit(x.setVoltage, ch, voltage, paired, callback=self.voltageEntryResult)
         except ValueError:
             pass
 
+    def voltageEntryResult(self, result):
+        if result == -2:
+            QMessageBox.warning(self, "Warning", "Voltage Entered Out Of Range", QMessageBox.Ok)
+
     def readCurrentEntry(self, ch, current_entry):
         text = current_entry.text()
         current_entry.clear()
@@ -553,24 +776,19 @@ class GUI_E36312A(QMainWindow):
             return
         try:
             current = float(text)
-            result = x.setCurrentLimit(self.DPS, ch, current)
-            if result == -2:
-                QMessageBox.warning(self, "Warning", "Current Entered Out Of Range", QMessageBox.Ok)
+            self.worker.submit(x.setCurrentLimit, ch, current, callback=self.currentEntryResult)
         except ValueError:
             pass
 
-    def updateVoltageCurrent(self, ch, display_voltage, display_current):
-        voltage = float(x.getVoltage(self.DPS, ch))
-        display_voltage.setText(f"{voltage} V")
-
-        current = float(x.getCurrent(self.DPS, ch))
-        display_current.setText(f"{current} A")
+    def currentEntryResult(self, result):
+        if result == -2:
+            QMessageBox.warning(self, "Warning", "Current Entered Out Of Range", QMessageBox.Ok)
 
-        csv_file = f'E36312A_channel{ch}.csv'
-        with open(csv_file, 'a', newline='') as f:
-            writer = csv.writer(f)
-            row = (datetime.datetime.now(), voltage, current, voltage*current)
-            writer.writerow(row)
+    def displayVoltageCurrent(self, snapshot, ch, display_voltage, display_current):
+        reading = snapshot.channel(ch)
+        display_voltage.setText(f"{reading.voltage} V")
+        display_current.setText(f"{reading.current} A")
+        self.livePlot.appendSnapshot(snapshot, ch)
 
     def addTerminal(self):
         self.layoutT = QVBoxLayout()
@@ -594,8 +812,8 @@ class GUI_E36312A(QMainWindow):
         command = self.terminal_input.text()
         self.terminal_input.clear()
         if command:
-            response = x.writeCommand(self.DPS, command)
-            self.terminal_output.append(f"Command: {command}\nResponse: {response}\n")
+            self.worker.submit(x.writeCommand, command,
+                               callback=lambda response: self.terminal_output.append(f"Command: {command}\nResponse: {response}\n"))
 
     
     def createNotesBox(self):
@@ -626,20 +844,117 @@ class GUI_E36312A(QMainWindow):
         except IOError:
             QMessageBox.warning(self, "Error", f"Failed to save file '{file_path}'", QMessageBox.Ok)
 
-    def startRecording(self, label):
-        global upload_timer
+    def openSpool(self, label):
         if (selectedBucket == "None"):
             QMessageBox.warning(label, "No Bucket Selected", "No Bucket Selected", QMessageBox.Ok)
+            return False
+        if self.spool is None or self.spoolBucket != selectedBucket:
+            self.closeSpool()
+            self.spool = TelemetrySpool(os.path.join(SPOOL_DIRECTORY, selectedBucket), precision=RECORD_PRECISION)
+            self.spoolBucket = selectedBucket
+            self.influxClient = InfluxClient(token, org, selectedBucket)
+            # The drainer closes the client when it stops, a drainer of this folder that is still finishing a write runs first
+            self.drainer = SpoolDrainer(self.spool, self.influxClient.write_batch, close=self.influxClient.close,
+                                        after=self.stoppingDrainers.pop(self.spool.directory, None))
+            self.drainer.start()
+            if pyarrowAvailable():
+                self.columnar = ColumnarSink(os.path.join(RECORDING_DIRECTORY, selectedBucket), prefix="E36312A")
+            else:
+                self.terminal_output.append("pyarrow is not installed, no Parquet files are recorded (InfluxDB and the capture file are)\n")
+            os.makedirs(os.path.join(RECORDING_DIRECTORY, selectedBucket), exist_ok=True)
+            self.capture = CaptureWriter(os.path.join(RECORDING_DIRECTORY, selectedBucket, "E36312A.capture"))
+            self.refreshBuckets()
+        # Each recording is its own segment of the capture file
+        self.capture.beginSegment()
+        return True
+
+    def startRecording(self, label):
+        global upload_timer
+        if not upload_timer.isActive() and self.dlog is None and self.openSpool(label):
+            upload_timer.start()
+            label.setText("Status: Recording Started")
+
+    def startDlogRecording(self, label, textbox):
+        try:
+            period = float(textbox.text())
+        except ValueError:
+            QMessageBox.warning(self, "Error", "Invalid data logger period", QMessageBox.Ok)
+            return
+        if upload_timer.isActive() or self.dlog is not None or not self.openSpool(label):
+            return
+        self.dlog = E36312A_Dlog(channels, period, DLOG_DURATION)
+        self.worker.submit(self.dlog.start, callback=lambda period: label.setText(f"Status: Data Logger Recording ({period * 1000:g} ms period)"),
+                           error=lambda e: self.dlogFailed(label))
+        self.dlogTimer.start(int(DLOG_FETCH_INTERVAL * 1000))
+
+    def dlogFailed(self, label):
+        self.dlogTimer.stop()
+        self.dlog = None
+        label.setText("Status: Recording Stopped")
+        QMessageBox.warning(self, "Warning", "Data Logger Failed to Start", QMessageBox.Ok)
+
+    def fetchDlog(self):
+        if self.dlog.finished():
+            self.stopRecording(self.isRecording)
         else:
-            if not upload_timer.isActive():
-                upload_timer.start(frequency * 1000)
-                label.setText("Status: Recording Started")
+            self.worker.submit(self.dlog.fetch, key="dlog", callback=self.writeDlog)
+
+    def writeDlog(self, snapshots):
+        if self.spool is not None:
+            lines = []
+            for snapshot in snapshots:
+                lines += encodeSnapshot(snapshot, precision=RECORD_PRECISION, output_only=True)
+            self.spool.append(lines)
+        if self.columnar is not None:
+            self.columnar.appendSnapshots(snapshots)
+        if self.capture is not None:
+            for snapshot in snapshots:
+                self.capture.appendSnapshot(snapshot)
+        self.livePlot.appendSnapshots(snapshots)
+
+    def stopDlog(self, snapshots):
+        self.writeDlog(snapshots)
+        if self.spool is not None:
+            self.spool.rotate(force=True)
+        if self.columnar is not None:
+            self.columnar.rotate()
+        if self.capture is not None:
+            self.capture.flush()
 
-        
     def stopRecording(self, label):
         global upload_timer
+        if self.dlog is not None:
+            self.dlogTimer.stop()
+            stats = self.dlog.stats()
+            self.worker.submit(self.dlog.stop, callback=self.stopDlog)
+            self.dlog = None
+            label.setText(f"Status: Recording Stopped ({stats['records']} data logger records)")
+            return
         upload_timer.stop()
-        label.setText("Status: Recording Stopped")
+        if self.spool is not None:
+            self.spool.rotate(force=True)
+        if self.columnar is not None:
+            self.columnar.rotate()
+        if self.capture is not None:
+            self.capture.flush()
+        stats = upload_timer.stats()
+        label.setText(f"Status: Recording Stopped ({stats['samples']} samples, {stats['missed'] + stats['overruns']} missed)")
+
+    def closeSpool(self):
+        if self.spool is not None:
+            self.spool.close()
+            # No final drain, with InfluxDB unreachable it would block until the request times out, the segments stay on disk
+            if not self.drainer.stop(drain=False, timeout=DRAIN_STOP_TIMEOUT):
+                # Still in a write, it closes its client when the write returns
+                self.stoppingDrainers[self.spool.directory] = self.drainer
+            self.spool = None
+            self.drainer = None
+        if self.columnar is not None:
+            self.columnar.close()
+            self.columnar = None
+        if self.capture is not None:
+            self.capture.close()
+            self.capture = None
 
     def setRecordingDelay(self, time, label, textbox):
         global frequency
@@ -649,49 +964,61 @@ class GUI_E36312A(QMainWindow):
             textbox.clear()
             if (frequency < 2):
                 QMessageBox.warning(self, "Warning", "Frequency under 2 seconds may result in inconsistent measurements due to execution time of the code", QMessageBox.Ok)
-            if upload_timer.isActive():
-                upload_timer.stop()
-                upload_timer.start(int(frequency * 1000))
-            else:
-                upload_timer.stop()
+            upload_timer.setPeriod(frequency)
         except ValueError as e:
             QMessageBox.warning(self, "Error", "Invalid frequency value", QMessageBox.Ok)
 
             
-    def record(self, DPS):
-        IC = InfluxClient(token, org, selectedBucket)
-        timestamp = int(datetime.now().timestamp())
+    def record(self, tick):
+        submitted = self.worker.submit(x.measureAll, list(channels), key="record", callback=lambda snapshot: self.writeRecord(snapshot, tick),
+                                       error=lambda e: QMessageBox.warning(self, "Warning", "Measurement Failed", QMessageBox.Ok))
+        if not submitted:
+            # The last measurement is still waiting, this sample is dropped instead of piling up behind it
+            upload_timer.overrun(tick)
+
+    def writeRecord(self, snapshot, tick):
+        upload_timer.complete(tick, snapshot.timestamp, snapshot.end)
+        # Append to the spool, the drainer sends it to InfluxDB in batches on its own thread
+        if self.spool is not None:
+            self.spool.append(encodeSnapshot(snapshot, precision=RECORD_PRECISION, output_only=True))
+        if self.columnar is not None:
+            self.columnar.appendSnapshots([snapshot])
+        if self.capture is not None:
+            self.capture.appendSnapshot(snapshot)
+        self.livePlot.appendSnapshot(snapshot)
+        if upload_timer.isActive():
+            stats = upload_timer.stats()
+            self.isRecording.setText(f"Status: Recording (jitter {stats['jitter_std_ms']:.1f} ms, {stats['missed'] + stats['overruns']} missed)")
+
+    def addLivePlot(self):
+        self.layoutP = QVBoxLayout()
+        self.plotLabel = QLabel("Live Plot")
+        self.layoutP.addWidget(self.plotLabel)
+
+        self.livePlot = LivePlot([1, 2, 3], PLOT_CAPACITY, PLOT_SPAN, PLOT_REFRESH)
+        self.layoutP.addWidget(self.livePlot, 1)
+
+        plotControls = QHBoxLayout()
+        self.plotSpanEntry = QLineEdit()
+        self.plotSpanEntry.setPlaceholderText(f"Time Shown ({PLOT_SPAN} s)")
+        self.plotSpanEntry.returnPressed.connect(lambda: self.setPlotSpan(self.plotSpanEntry))
+        plotControls.addWidget(self.plotSpanEntry)
+        self.plotClearButton = QPushButton("Clear Plot", clicked=lambda: self.livePlot.clear())
+        plotControls.addWidget(self.plotClearButton)
+        self.layoutP.addLayout(plotControls)
+
+    def setPlotSpan(self, textbox):
         try:
-            voltage1 = float(DPS.query("MEAS:VOLT:DC? (@1)").strip())
-            current1 = float(DPS.query("MEAS:CURR:DC? (@1)").strip())
-            voltage2 = float(DPS.query("MEAS:VOLT:DC? (@2)").strip())
-            current2 = float(DPS.query("MEAS:CURR:DC? (@2)").strip())
-            if(paired == "OFF\n"):
-                voltage3 = float(DPS.query("MEAS:VOLT:DC? (@3)").strip())
-                current3 = float(DPS.query("MEAS:CURR:DC? (@3)").strip())
-        except VisaIOError as e:
-            QMessageBox.warning(self, "Warning", "Measurement Failed", QMessageBox.Ok)
-    
-        # Format data for InfluxDB
-        voltage_data1 = f"E36312A,Channel=1 voltage={voltage1} {timestamp}"
-        current_data1 = f"E36312A,Channel=1 current={current1} {timestamp}"
-        voltage_data2 = f"E36312A,Channel=2 voltage={voltage2} {timestamp}"
-        current_data2 = f"E36312A,Channel=2 current={current2} {timestamp}"
-        if(paired == "OFF\n"):
-            voltage_data3 = f"E36312A,Channel=3 voltage={voltage3} {timestamp}"
-            current_data3 = f"E36312A,Channel=3 current={current3} {timestamp}"
-        
-        # Write data to InfluxDB
-        if (int(DPS.query("OUTP:STAT? (@1)")) == 1):
-            IC.write_data(voltage_data1, write_option=SYNCHRONOUS)
-            IC.write_data(current_data1, write_option=SYNCHRONOUS)
-        if (int(DPS.query("OUTP:STAT? (@2)")) == 1):
-            IC.write_data(voltage_data2, write_option=SYNCHRONOUS)
-            IC.write_data(current_data2, write_option=SYNCHRONOUS)
-        if(paired == "OFF\n"):
-            if (int(DPS.query("OUTP:STAT? (@3)")) == 1):
-                IC.write_data(voltage_data3, write_option=SYNCHRONOUS)
-                IC.write_data(current_data3, write_option=SYNCHRONOUS)
+            span = float(textbox.text())
+        except ValueError:
+            QMessageBox.warning(self, "Error", "Invalid time span", QMessageBox.Ok)
+            return
+        textbox.clear()
+        if span <= 0:
+            QMessageBox.warning(self, "Error", "Invalid time span", QMessageBox.Ok)
+            return
+        self.livePlot.setSpan(span)
+        textbox.setPlaceholderText(f"Time Shown ({span:g} s)")
 
     def addRecording(self, bucketLabel, recordingLabel):
         self.layoutR = QVBoxLayout()
@@ -709,6 +1036,14 @@ class GUI_E36312A(QMainWindow):
         self.frequencyButton = QPushButton("Set Frequency", clicked=lambda: self.setRecordingDelay(self.frequencyEntry.text(), self.currentFrequencyLabel, self.frequencyEntry))
         self.layoutR.addWidget(self.frequencyButton)
 
+        self.dlogLabel = QLabel("Record with Data Logger")
+        self.layoutR.addWidget(self.dlogLabel)
+        self.dlogEntry = QLineEdit()
+        self.dlogEntry.setPlaceholderText("Enter sample period in seconds")
+        self.layoutR.addWidget(self.dlogEntry)
+        self.dlogButton = QPushButton("Start Data Logger Recording", clicked=lambda: self.startDlogRecording(recordingLabel, self.dlogEntry))
+        self.layoutR.addWidget(self.dlogButton)
+
         self.newBucketLabel = QLabel("Create New Bucket")
         self.layoutR.addWidget(self.newBucketLabel)
         self.newBucketEntry = QLineEdit()
@@ -720,26 +1055,44 @@ class GUI_E36312A(QMainWindow):
         self.bucketSelectButton = QPushButton("Select Bucket", clicked=lambda: self.selectBucket(bucketLabel))
         self.layoutR.addWidget(self.bucketSelectButton)
 
+        self.refreshBucketsButton = QPushButton("Refresh Buckets", clicked=self.refreshBuckets)
+        self.layoutR.addWidget(self.refreshBucketsButton)
+
         self.bucketsLabel = QLabel("Available Buckets")
         self.layoutR.addWidget(self.bucketsLabel)
 
         recording_layout.addLayout(self.layoutR)
 
-        self.displayBuckets()
+        self.bucketDirectory.updated.connect(self.displayBuckets)
+        self.bucketDirectory.failed.connect(self.bucketRequestFailed)
+        self.displayBuckets(self.bucketDirectory.names())
+        if self.bucketDirectory.cacheTime() is None:
+            self.bucketsLabel.setText("Available Buckets (press Refresh Buckets to load)")
+        else:
+            self.bucketsLabel.setText(f"Available Buckets (cached {datetime.fromtimestamp(self.bucketDirectory.cacheTime()):%Y-%m-%d %H:%M})")
 
         self.layoutR.addWidget(buckets)
 
         recording_layout.addLayout(self.layoutR)
     
-    def displayBuckets(self):
+    def displayBuckets(self, names):
         global buckets
-        global bucketList
-        bucketList = buckets_api.find_buckets().buckets
         buckets.clear()
         bucketNames.clear()
-        for bucket in bucketList:
-            buckets.addItem(bucket.name)
-            bucketNames.append(bucket.name)
+        for name in names:
+            buckets.addItem(name)
+            bucketNames.append(name)
+        self.bucketsLabel.setText("Available Buckets")
+
+    def refreshBuckets(self):
+        self.bucketsLabel.setText("Available Buckets (refreshing...)")
+        self.bucketDirectory.refresh()
+
+    def bucketRequestFailed(self, operation, message):
+        if operation == "create":
+            QMessageBox.warning(self, "Warning", f"Failed to create bucket: {message}", QMessageBox.Ok)
+        else:
+            self.bucketsLabel.setText("Available Buckets (InfluxDB unreachable, showing cached list)")
 
     def selectBucket(self, bucketLabel): #when new bucket is created, the available indicies remain the same and any new indicies is refered back to 0
         global selectedBucket
@@ -754,57 +1107,35 @@ class GUI_E36312A(QMainWindow):
         bucketNameEntry.clear()
         
         if (bucketName not in bucketNames):
-            retention_rules = BucketRetentionRules(type="expire", every_seconds=0)
-            buckets_api.create_bucket(bucket_name=bucketName,
-                                               retention_rules=retention_rules,
-                                               org=org)
-            self.displayBuckets()
+            self.bucketsLabel.setText(f"Available Buckets (creating {bucketName}...)")
+            self.bucketDirectory.create(bucketName)
         else:
             QMessageBox.warning(self, "Warning", "Bucket Already Exists", QMessageBox.Ok)
 
-    def syncPowerSupply(self, DPS, button, ch, voltageLabel, currentLimitLabel):
-        if (ch == 3 and paired != "OFF\n"):
-            return
-        if (int(DPS.query(f"OUTP:STAT? (@{ch})")) == 1):
+    def displayPowerSupply(self, settings, button, voltageLabel, currentLimitLabel):
+        output, voltage, current = settings
+        if output:
             button.setText('ON')
             button.setStyleSheet("background-color: green")
         else:
             button.setText('OFF')
             button.setStyleSheet("background-color: red")
 
-        voltage = float(DPS.query(f"VOLT? (@{ch})"))
-        current = float(DPS.query(f"CURR? (@{ch})"))
         voltageLabel.setText(f'Voltage: {voltage} V')
         currentLimitLabel.setText(f'Current: {current} A')
     
-    def syncOutputChannel(self, DPS, widget, update_timer):
-        global paired
-        global channels
-        self.status = DPS.query("OUTP:PAIR?")
-        if self.status != paired:
-            paired = self.status
-            if (paired == "OFF\n"):
-                channels = [1, 2, 3]
-            else:
-                channels = [1, 2]
-            update_timer.stop()
-            update_timer.timeout.disconnect()
-            del update_timer
-            channel_layout.removeWidget(widget)
-            widget.hide()
-            widget.deleteLater()
-            self.createChannel(3)
-
-    def syncOutputChannel2(self, DPS, widget):
+    def updateOutputChannel(self, status):
         global paired
         global channels
-        self.status = DPS.query("OUTP:PAIR?")
+        self.status = status
         if self.status != paired:
             paired = self.status
             if (paired == "OFF\n"):
                 channels = [1, 2, 3]
             else:
                 channels = [1, 2]
+            self.scheduler.unsubscribe(self.subscriptions.pop(3, []))
+            widget = self.channel3Widget
             channel_layout.removeWidget(widget)
             widget.hide()
             widget.deleteLater()
@@ -815,12 +1146,25 @@ class GUI_E36312A(QMainWindow):
         control_layout.addWidget(self.Ch3Label)
 
         self.Ch3Layout = QHBoxLayout()
-        self.indButton = QPushButton("Independent", clicked=lambda: x.changeOperationMode(self.DPS, "OFF"))
-        self.seriesButton = QPushButton("Series", clicked=lambda: x.changeOperationMode(self.DPS, "SER"))
-        self.parallelButton = QPushButton("Parallel", clicked=lambda: x.changeOperationMode(self.DPS, "PAR"))
+        self.indButton = QPushButton("Independent", clicked=lambda: self.worker.submit(x.changeOperationMode, "OFF"))
+        self.seriesButton = QPushButton("Series", clicked=lambda: self.worker.submit(x.changeOperationMode, "SER"))
+        self.parallelButton = QPushButton("Parallel", clicked=lambda: self.worker.submit(x.changeOperationMode, "PAR"))
 
         self.Ch3Layout.addWidget(self.indButton)
         self.Ch3Layout.addWidget(self.seriesButton)
         self.Ch3Layout.addWidget(self.parallelButton)
 
-        control_layout.addLayout(self.Ch3Layout)
\ No newline at end of file
+        control_layout.addLayout(self.Ch3Layout)
+
+    def closeEvent(self, event):
+        upload_timer.stop()
+        self.scheduler.stop()
+        self.dlogTimer.stop()
+        self.worker.stop()
+        if self.dlog is not None:
+            # The worker is stopped, the rest of the data logger records are fetched here
+            self.stopDlog(self.dlog.stop(self.DPS))
+            self.dlog = None
+        self.closeSpool()
+        self.bucketDirectory.close()
+        super().closeEvent(event)
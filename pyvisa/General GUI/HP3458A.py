@@ -0,0 +1,281 @@
+"""
+Dependencies:
+    Python: version 3.8.18
+    pyvisa: version 1.14.1
+    numpy: version 1.24.4
+
+Classes:
+    HP3458A_Controls: holds functions that control the multimeter
+        Constructor:
+            all parameters
+            line_frequency: power line frequency in Hz, used to work out the time of one reading from NPLC
+        Methods:
+            sample() - all parameters; description
+
+            configure() - reference to multimeter; sets the read and write termination (carriage return) of the session
+            identify() - reference to multimeter; returns the identification of the multimeter (ID?)
+            test() - reference to multimeter; resets the multimeter, takes one reading and checks the error register, returns True if it passed, otherwise None
+            readingTime() - NPLC, auto zero; returns the time in seconds of one reading
+            setFormat() - reference to multimeter, output format, memory format (optional); sets OFORMAT and MFORMAT (ASCII, SINT, DINT, SREAL, DREAL),
+                          returns the ISCALE? factor of the output format (1 for the formats that are not integers)
+            decode() - bytes, output format, scale (optional); returns the readings in the bytes as a NumPy array, binary formats are decoded without copying,
+                       integer formats are multiplied by scale
+            setupBurst() - reference to multimeter, number of readings, sample interval in seconds (optional), range, NPLC, auto zero, output format, memory format;
+                           sets up the multimeter to take the readings into memory (MEM FIFO) on the next TARM SGL, returns the sample interval and the ISCALE? factor
+            waitForBurst() - reference to multimeter, time in seconds the burst takes, use SRQ (optional); waits until the multimeter has finished taking the readings,
+                             with SRQ if the interface supports it, otherwise by polling the status byte, raises TimeoutError if it does not finish
+            readMemory() - reference to multimeter, number of readings, first reading (optional), output format, scale; reads the readings from memory in one transfer,
+                           returns a NumPy array
+            burst() - reference to multimeter, number of readings, sample interval in seconds (optional), range, NPLC, auto zero, use SRQ (optional), output format,
+                      memory format; takes the readings and returns an HP3458A_Burst
+            saveCSV() - HP3458A_Burst, path of the file; writes one line per reading with its time and value
+
+    HP3458A_Stream: Thread that keeps the multimeter measuring into memory (MEM FIFO) and drains whatever is there into a RingBuffer (see ringbuffer.py) every
+    poll_interval, for captures of any length. Sinks (CSV, InfluxDB, live plot) read from the buffer with chunks().
+        Constructor:
+            DMM: reference to the multimeter
+            buffer: RingBuffer the readings are written to, closed when the stream stops
+            interval: sample interval in seconds (optional), readings are taken back to back without it
+            range, nplc, azero: measurement settings, see setupBurst()
+            oformat, mformat: binary output and memory formats (SINT, DINT, SREAL, DREAL)
+            poll_interval: time in seconds between drains, must be short enough that memory does not fill up in between
+            count: number of readings to take (optional), runs until stopped without it
+            controls: HP3458A_Controls to use (optional)
+        Methods:
+            sample() - all parameters; description
+
+            drain() - no parameters; moves the readings in memory to the buffer in one transfer, returns how many there were
+            chunks() - maximum number of readings per chunk (optional), timeout (optional); generator of (timestamps, readings) from the start of the stream
+            stats() - no parameters; returns a dictionary of counters: readings, transfers, polls, interval, last_error and the buffer's counters
+            stop() - no parameters; stops the multimeter (TARM HOLD), drains the rest and stops the thread
+            run() - no parameters; streams until stopped or count readings are taken, do not call directly, use start()
+
+    HP3458A_Burst: readings of one burst, timestamp (nanoseconds since epoch) of the trigger and the sample interval in seconds,
+    timestamps gives the time of every reading in nanoseconds since epoch
+
+    Note: The readings are held in the multimeter's memory until the burst is finished and read back with a single RMEM, thousands of readings are one transfer.
+    Note: Binary formats are 2 (SINT), 4 (DINT, SREAL) or 8 (DREAL) bytes per reading instead of about 16 characters, and need no parsing. SINT and DINT are
+    integers that are multiplied by ISCALE?, which depends on the range, SINT only has 16 bits of resolution. The formats are big-endian.
+    Note: In MEM FIFO readings are removed from memory as they are read, so a stream never fills memory as long as it is drained faster than it fills
+    (75000 SINT readings, see MEMORY).
+    Note: Without TIMER (sample interval None) the readings are taken back to back, the interval is the integration time worked out from NPLC and line_frequency.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+import logging
+import threading
+import time
+
+import numpy as np
+from pyvisa.errors import VisaIOError
+
+# Status byte bits
+READY = 16
+ERROR = 32
+RQS = 64
+DATA_READY = 128
+
+# Readings that fit in memory in each memory format
+MEMORY = {"SINT": 75000, "DINT": 37500, "SREAL": 37500, "DREAL": 18750, "ASCII": 10240}
+# Largest NRDGS, a stream without count takes this many
+MAX_READINGS = 16777215
+# NumPy types of the binary formats
+FORMATS = {"SINT": np.dtype(">i2"), "DINT": np.dtype(">i4"), "SREAL": np.dtype(">f4"), "DREAL": np.dtype(">f8")}
+
+
+@dataclass
+class HP3458A_Burst:
+    timestamp: int
+    interval: float
+    readings: np.ndarray
+
+    @property
+    def timestamps(self):
+        return self.timestamp + np.round(np.arange(len(self.readings)) * self.interval * 1e9).astype(np.int64)
+
+
+class HP3458A_Controls:
+    def __init__(self, line_frequency=60):
+        self.line_frequency = line_frequency
+
+    def configure(self, DMM):
+        DMM.read_termination = '\r'
+        DMM.write_termination = '\r'
+
+    def identify(self, DMM):
+        return DMM.query("ID?").strip()
+
+    def test(self, DMM):
+        """Tests device connection"""
+        DMM.write("RESET")
+        DMM.write("TARM HOLD")
+        DMM.write("DCV 10")
+        DMM.write("NPLC 1")
+        DMM.write("AZERO OFF")
+        DMM.write("TARM SGL")
+        if "E" not in DMM.read().strip():
+            return None
+        if DMM.query("ERR?").strip() != "0":
+            return None
+        return True
+
+    def readingTime(self, nplc, azero=False):
+        # Auto zero takes a zero reading for every reading
+        return nplc / self.line_frequency * (2 if azero else 1)
+
+    def setFormat(self, DMM, oformat, mformat=None):
+        oformat = oformat.upper()
+        if oformat not in FORMATS and oformat != "ASCII":
+            raise ValueError(f"Unknown output format {oformat}")
+        DMM.write(f"OFORMAT {oformat}")
+        if mformat is not None:
+            DMM.write(f"MFORMAT {mformat.upper()}")
+        if oformat in ("SINT", "DINT"):
+            return float(DMM.query("ISCALE?"))
+        return 1.0
+
+    def decode(self, data, oformat, scale=1.0):
+        oformat = oformat.upper()
+        if oformat == "ASCII":
+            return np.array(bytes(data).decode("ascii").strip().split(","), dtype=np.float64)
+        readings = np.frombuffer(data, dtype=FORMATS[oformat])
+        if oformat in ("SINT", "DINT"):
+            return readings * scale
+        return readings
+
+    def setupBurst(self, DMM, count, interval=None, range=10, nplc=1, azero=False, oformat="DREAL", mformat="SREAL"):
+        readingTime = self.readingTime(nplc, azero)
+        if interval is not None and interval < readingTime:
+            raise ValueError(f"Sample interval {interval} s is shorter than one reading ({readingTime} s)")
+        DMM.write("PRESET NORM")
+        DMM.write("TARM HOLD")
+        DMM.write(f"DCV {range}")
+        DMM.write(f"NPLC {nplc}")
+        DMM.write(f"AZERO {'ON' if azero else 'OFF'}")
+        scale = self.setFormat(DMM, oformat, mformat)
+        DMM.write("MEM FIFO")
+        # Keep the bus free while the readings are taken, so the status byte can be read
+        DMM.write("INBUF ON")
+        if interval is None:
+            DMM.write(f"NRDGS {count}, AUTO")
+        else:
+            DMM.write(f"TIMER {interval}")
+            DMM.write(f"NRDGS {count}, TIMER")
+        DMM.write("TRIG AUTO")
+        return (interval if interval is not None else readingTime), scale
+
+    def waitForBurst(self, DMM, duration, srq=True):
+        timeout = duration * 1.5 + 2
+        if srq:
+            DMM.write("RQS 0")
+            DMM.read_stb()
+            DMM.write(f"RQS {READY}")
+            try:
+                DMM.wait_for_srq(int(timeout * 1000))
+                DMM.read_stb()
+                return
+            except (VisaIOError, NotImplementedError, AttributeError):
+                # Not every interface has SRQ, poll the status byte instead
+                pass
+        # Sleep through the burst, then check a few times per reading
+        deadline = time.monotonic() + timeout
+        time.sleep(duration)
+        while not DMM.read_stb() & READY:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Burst did not finish in {timeout:.1f} s")
+            time.sleep(min(max(duration / 100, 0.001), 0.1))
+
+    def readMemory(self, DMM, count, first=1, oformat="ASCII", scale=1.0):
+        DMM.write(f"RMEM {first}, {count}, 1")
+        oformat = oformat.upper()
+        if oformat == "ASCII":
+            return self.decode(DMM.read_raw(), oformat)
+        # Binary readings can contain the termination character, read exactly the number of bytes
+        return self.decode(DMM.read_bytes(count * FORMATS[oformat].itemsize), oformat, scale)
+
+    def burst(self, DMM, count, interval=None, range=10, nplc=1, azero=False, srq=True, oformat="DREAL", mformat="SREAL"):
+        if count > MEMORY[mformat.upper()]:
+            raise ValueError(f"{count} readings do not fit in memory, the maximum is {MEMORY[mformat.upper()]}")
+        interval, scale = self.setupBurst(DMM, count, interval, range, nplc, azero, oformat, mformat)
+        timestamp = time.time_ns()
+        DMM.write("TARM SGL")
+        self.waitForBurst(DMM, count * interval, srq)
+        return HP3458A_Burst(timestamp, interval, self.readMemory(DMM, count, 1, oformat, scale))
+
+    def saveCSV(self, burst, path):
+        with open(path, 'w') as output:
+            for timestamp, reading in zip(burst.timestamps, burst.readings):
+                output.write(f"{datetime.fromtimestamp(timestamp / 1e9).strftime('%d/%m/%y-%H:%M:%S.%f')},{reading}\n")
+
+
+class HP3458A_Stream(threading.Thread):
+    def __init__(self, DMM, buffer, interval=None, range=10, nplc=1, azero=False, oformat="SINT", mformat="SINT", poll_interval=0.1, count=None, controls=None):
+        super().__init__(name="HP3458A_Stream", daemon=True)
+        if oformat.upper() not in FORMATS:
+            raise ValueError("Streaming needs a binary output format (SINT, DINT, SREAL, DREAL)")
+        self.DMM = DMM
+        self.buffer = buffer
+        self.interval = interval
+        self.range = range
+        self.nplc = nplc
+        self.azero = azero
+        self.oformat = oformat.upper()
+        self.mformat = mformat.upper()
+        self.poll_interval = poll_interval
+        self.count = count
+        self.controls = controls or HP3458A_Controls()
+        self._start = self.buffer.position()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._taken = 0
+        self._counters = {"readings": 0, "transfers": 0, "polls": 0, "last_error": None}
+
+    def run(self):
+        try:
+            self.interval, self._scale = self.controls.setupBurst(self.DMM, self.count or MAX_READINGS, self.interval, self.range, self.nplc, self.azero,
+                                                                  self.oformat, self.mformat)
+            self._timestamp = time.time_ns()
+            self.DMM.write("TARM SGL")
+            while not self._stopping.wait(self.poll_interval):
+                self.drain()
+                if self.count is not None and self._taken >= self.count:
+                    break
+            self.DMM.write("TARM HOLD")
+            self.drain()
+        except Exception as e:
+            logging.error(f'3458A stream stopped: {e}')
+            with self._lock:
+                self._counters["last_error"] = str(e)
+        finally:
+            self.buffer.close()
+
+    def drain(self):
+        with self._lock:
+            self._counters["polls"] += 1
+        available = int(float(self.DMM.query("MCOUNT?")))
+        if available == 0:
+            return 0
+        data = self.DMM.read_bytes(available * FORMATS[self.oformat].itemsize)
+        readings = self.controls.decode(data, self.oformat, self._scale)
+        indices = np.arange(self._taken, self._taken + len(readings))
+        self.buffer.write(readings, self._timestamp + np.round(indices * self.interval * 1e9).astype(np.int64))
+        self._taken += len(readings)
+        with self._lock:
+            self._counters["readings"] += len(readings)
+            self._counters["transfers"] += 1
+        return len(readings)
+
+    def chunks(self, count=None, timeout=None):
+        return self.buffer.chunks(self._start, count, timeout)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats["interval"] = self.interval
+        stats.update(self.buffer.stats())
+        return stats
+
+    def stop(self):
+        self._stopping.set()
+        self.join()
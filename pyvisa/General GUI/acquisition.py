@@ -0,0 +1,84 @@
+"""
+Dependencies:
+    Python: version 3.8.18
+    pyside6: version 6.6.2
+
+Classes:
+    AcquisitionWorker: Thread that owns the connection to an instrument. Every read and write is queued and run on this thread one at a time, results are
+    sent back to the GUI thread through signals so the GUI never waits on the instrument.
+        Constructor:
+            device: reference to the connected instrument
+        Methods:
+            sample() - all parameters; description
+
+            submit() - function, arguments, callback, key; queues function(device, *arguments) to run on the thread, callback is called on the GUI thread with the result,
+                       requests with a key are skipped while an earlier request with the same key is still waiting
+            write() - command; queues a write of the command to the instrument
+            stop() - no parameters; runs the requests already queued, then stops the thread
+            run() - no parameters; runs queued requests until stopped, do not call directly, use start()
+
+    Note: Errors raised by a request are printed and passed to its error callback (if given), they do not stop the thread.
+"""
+
+import queue
+import threading
+
+#Pyside6 imports
+from PySide6.QtCore import QThread, Signal
+
+
+class AcquisitionWorker(QThread):
+    resultReady = Signal(object, object)
+    errorOccurred = Signal(object, object)
+
+    def __init__(self, device, parent=None):
+        super().__init__(parent)
+        self.device = device
+        self._requests = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        # The worker object lives on the GUI thread, so these are queued connections
+        self.resultReady.connect(self._deliver)
+        self.errorOccurred.connect(self._deliver)
+
+    def submit(self, function, *args, callback=None, error=None, key=None):
+        if key is not None:
+            with self._lock:
+                if key in self._pending:
+                    return False
+                self._pending.add(key)
+        self._requests.put((function, args, callback, error, key))
+        return True
+
+    def write(self, command):
+        return self.submit(lambda device: device.write(command))
+
+    def stop(self):
+        self._requests.put(None)
+        self.wait()
+
+    def run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+            function, args, callback, error, key = request
+            if key is not None:
+                with self._lock:
+                    self._pending.discard(key)
+            try:
+                result = function(self.device, *args)
+            except Exception as e:
+                print(e)
+                if error is not None:
+                    self.errorOccurred.emit(error, e)
+                continue
+            if callback is not None:
+                self.resultReady.emit(callback, result)
+
+    def _deliver(self, callback, result):
+        try:
+            callback(result)
+        except RuntimeError:
+            # Widget was deleted (channel rebuilt) while the request was running
+            pass
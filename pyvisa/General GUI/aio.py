@@ -0,0 +1,293 @@
+"""
+Dependencies:
+    Python: version 3.8.18
+    pyvisa: version 1.14.1
+    pyserial: version 3.5
+    pyserial-asyncio: version 0.6 (optional, serial devices fall back to pyserial on a thread without it)
+    qasync: version 0.27.1 (optional, only for qtEventLoop())
+
+Classes:
+    AsyncSession: asyncio front of a Pyvisa session (or a simulated one). The blocking calls run on a single thread executor that belongs to the session, every
+    AsyncSession of the same session shares it, so one session never runs two calls at the same time and a slow instrument only holds its own thread.
+        Constructor:
+            session: open Pyvisa session
+        Methods:
+            sample() - all parameters; description
+
+            call() - function, arguments; awaits function(session, *arguments) on the session's executor and returns the result
+            write() - command; awaits session.write(command)
+            query() - command; awaits session.query(command) and returns the answer
+            read() - no parameters; awaits session.read() and returns the answer
+            read_bytes() - number of bytes; awaits session.read_bytes() and returns the bytes
+            close() - no parameters; releases the executor, it stops when the last AsyncSession of the session is closed, the session itself stays open (it
+                      belongs to the SessionRegistry)
+
+    AsyncInstrument: AsyncSession with a controls object (E36312A_Controls, HP3458A_Controls, ...), every method of the controls can be awaited without the first
+    parameter, e.g. await dps.measureAll([1, 2, 3]) runs controls.measureAll(session, [1, 2, 3]) on the session's executor.
+        Constructor:
+            session: open Pyvisa session
+            controls: controls object whose methods take the session as the first parameter
+
+    AsyncSerial: Serial device read and written with asyncio. With pyserial-asyncio the port is read by the event loop itself, without it pyserial runs on a thread.
+        Constructor:
+            port: port name (COM3, /dev/ttyUSB0)
+            baud: baud rate
+            timeout: time in seconds to wait for an answer
+        Methods:
+            sample() - all parameters; description
+
+            open() - no parameters; awaits opening the port
+            write() - command; writes the command and a newline
+            query() - command; writes the command and returns the next answer line, empty if nothing arrives within timeout
+            close() - no parameters; closes the port
+
+Methods:
+    sample() - all parameters; description
+
+    openInstrument() - resource string, controls (optional), registry (optional), settings; awaits opening the resource in the SessionRegistry, returns an
+                       AsyncInstrument (AsyncSession without controls)
+    identifySerial() - port name, baud rate, timeout; returns the *IDN? answer of the serial device at the baud rate, empty if it does not answer
+    probeVisa() - resource string, registry (optional), timeout in milliseconds; returns a DiscoveredDevice if the resource answers *IDN?, otherwise None and
+                  closes the session if the probe opened it and nobody claimed it since
+    probeSerial() - port name, list of baud rates, timeout; returns a DiscoveredDevice for the first baud rate that answers *IDN?, otherwise None
+    discover() - list of Pyvisa resources, list of serial ports, maximum number of probes at the same time, callback (optional); probes everything concurrently,
+                 calls callback(kind, resource, DiscoveredDevice or None) as each one finishes and returns the devices that answered
+    qtEventLoop() - QApplication (optional); returns an asyncio event loop that runs the Qt event loop (qasync) and makes it the current loop, so coroutines
+                    and widgets run on the same thread
+
+    Note: The controls classes stay blocking, this module only moves their calls off the event loop. Example:
+        dps = await openInstrument(resource, E36312A_Controls())
+        snapshots = await asyncio.gather(*(dps.measureAll([1, 2, 3]) for _ in range(10)))
+    Note: Probes of the same serial port (as a Pyvisa ASRL resource and through pyserial) run one after another, like DeviceProber.probeAll().
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import threading
+
+from pyvisa.errors import VisaIOError
+
+from discovery import BAUD, DiscoveredDevice, serialPort
+from sessions import registry as sharedRegistry
+
+# Opening resources blocks too, at most this many are opened at the same time
+_openExecutor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="aio-open")
+# One executor per open session, id(session): [executor, number of AsyncSessions using it, session], the session is kept so its id is not reused
+_sessionExecutors = {}
+_sessionExecutorsLock = threading.Lock()
+
+
+def _acquireExecutor(session):
+    with _sessionExecutorsLock:
+        entry = _sessionExecutors.get(id(session))
+        if entry is None:
+            entry = _sessionExecutors[id(session)] = [ThreadPoolExecutor(max_workers=1, thread_name_prefix="aio-session"), 0, session]
+        entry[1] += 1
+        return entry[0]
+
+
+def _releaseExecutor(session):
+    with _sessionExecutorsLock:
+        entry = _sessionExecutors.get(id(session))
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _sessionExecutors[id(session)]
+            entry[0].shutdown(wait=False)
+
+
+class AsyncSession:
+    def __init__(self, session):
+        self.session = session
+        self._executor = _acquireExecutor(session)
+
+    async def call(self, function, *args):
+        if self._executor is None:
+            # run_in_executor(None) would use the loop's shared executor and run the call next to others on the same session
+            raise RuntimeError("AsyncSession is closed")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(function, self.session, *args))
+
+    async def write(self, command):
+        return await self.call(lambda session: session.write(command))
+
+    async def query(self, command):
+        return await self.call(lambda session: session.query(command))
+
+    async def read(self):
+        return await self.call(lambda session: session.read())
+
+    async def read_bytes(self, count):
+        return await self.call(lambda session: session.read_bytes(count))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor = None
+            _releaseExecutor(self.session)
+
+
+class AsyncInstrument(AsyncSession):
+    def __init__(self, session, controls):
+        super().__init__(session)
+        self.controls = controls
+
+    def __getattr__(self, name):
+        method = getattr(self.controls, name)
+        if not callable(method):
+            return method
+
+        async def call(*args, **kwargs):
+            return await self.call(lambda session: method(session, *args, **kwargs))
+        return call
+
+
+class AsyncSerial:
+    def __init__(self, port, baud, timeout=1):
+        self.port = port
+        self.baud = baud
+        self.timeout = timeout
+        self._reader = None
+        self._writer = None
+        self._serial = None
+        self._executor = None
+
+    async def open(self):
+        try:
+            import serial_asyncio
+        except ImportError:
+            serial_asyncio = None
+        if serial_asyncio is not None:
+            self._reader, self._writer = await serial_asyncio.open_serial_connection(url=self.port, baudrate=self.baud)
+        else:
+            import serial
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aio-serial")
+            loop = asyncio.get_running_loop()
+            self._serial = await loop.run_in_executor(self._executor, lambda: serial.Serial(self.port, self.baud, timeout=self.timeout))
+        return self
+
+    async def write(self, command):
+        data = (command + "\n").encode("utf-8")
+        if self._writer is not None:
+            self._writer.write(data)
+            await self._writer.drain()
+        else:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._serial.write, data)
+
+    async def query(self, command):
+        if self._reader is not None:
+            await self.write(command)
+            try:
+                line = await asyncio.wait_for(self._reader.readline(), self.timeout)
+            except asyncio.TimeoutError:
+                return ""
+        else:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self._serial.reset_input_buffer)
+            await self.write(command)
+            line = await loop.run_in_executor(self._executor, self._serial.readline)
+        return line.decode("utf-8", errors="ignore")
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._serial is not None:
+            self._serial.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+async def openInstrument(resource, controls=None, registry=None, **settings):
+    registry = registry or sharedRegistry
+    loop = asyncio.get_running_loop()
+    session = await loop.run_in_executor(_openExecutor, lambda: registry.open(resource, **settings))
+    return AsyncSession(session) if controls is None else AsyncInstrument(session, controls)
+
+
+async def identifySerial(port, baud, timeout=1):
+    device = AsyncSerial(port, baud, timeout)
+    try:
+        await device.open()
+        return await device.query("*IDN?")
+    except OSError:
+        return ""
+    finally:
+        device.close()
+
+
+async def probeVisa(resource, registry=None, timeout=2000):
+    registry = registry or sharedRegistry
+    # A session that is already open belongs to someone else (engine, GUI), a failed probe must not close it
+    opened = registry.get(resource) is None
+    try:
+        device = await openInstrument(resource, registry=registry, open_timeout=timeout)
+    except (VisaIOError, ValueError, OSError):
+        return None
+    def identify(session):
+        previous = session.timeout
+        session.timeout = timeout
+        try:
+            return session.query("*IDN?")
+        finally:
+            # The session stays open in the registry with its normal timeout
+            session.timeout = previous
+
+    try:
+        idn = await device.call(identify)
+    except (VisaIOError, ValueError, OSError):
+        if opened and not registry.isClaimed(resource):
+            registry.close(resource)
+        return None
+    finally:
+        device.close()
+    return DiscoveredDevice("PyVisa", resource, idn)
+
+
+async def probeSerial(port, bauds=BAUD, timeout=1):
+    for baud in bauds:
+        idn = await identifySerial(port, baud, timeout)
+        if idn.strip():
+            return DiscoveredDevice("PySerial", port, idn, baud)
+    return None
+
+
+async def discover(visa_resources, serial_ports, limit=32, callback=None, registry=None):
+    limiter = asyncio.Semaphore(limit)
+    groups = {}
+    for resource in visa_resources:
+        groups.setdefault(serialPort(resource) or resource, []).append(("PyVisa", resource))
+    for port in serial_ports:
+        port = getattr(port, "device", port)
+        groups.setdefault(port, []).append(("PySerial", port))
+
+    async def run(probes):
+        found = []
+        async with limiter:
+            for kind, resource in probes:
+                # A port that answered as a Pyvisa resource is already open there
+                if found:
+                    device = None
+                elif kind == "PyVisa":
+                    device = await probeVisa(resource, registry)
+                else:
+                    device = await probeSerial(resource)
+                if callback is not None:
+                    callback(kind, resource, device)
+                if device is not None:
+                    found.append(device)
+        return found
+
+    results = await asyncio.gather(*(run(probes) for probes in groups.values()))
+    return [device for found in results for device in found]
+
+
+def qtEventLoop(app=None):
+    try:
+        import qasync
+    except ImportError:
+        raise ImportError("qtEventLoop() needs qasync (pip install qasync)")
+    from PySide6.QtWidgets import QApplication
+    loop = qasync.QEventLoop(app or QApplication.instance())
+    asyncio.set_event_loop(loop)
+    return loop
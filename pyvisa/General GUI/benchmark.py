@@ -0,0 +1,326 @@
+"""
+Acquisition throughput benchmark, runs against the simulated instruments (see simulated.py) and a local stand-in for InfluxDB, no hardware or server needed
+
+Dependencies:
+    Python: version 3.8.18
+    pyvisa: version 1.14.1
+    influxdb-client: version 1.43.0
+    pyside6: version 6.6.2
+
+Classes:
+    InfluxStandIn: Local HTTP server that accepts InfluxDB writes (/api/v2/write) and counts the points
+        Constructor:
+            delay: time in seconds every write takes to answer (optional)
+        Methods:
+            sample() - all parameters; description
+
+            url() - no parameters; returns the address to give InfluxClient
+            close() - no parameters; stops the server
+
+Methods:
+    sample() - all parameters; description
+
+    percentiles() - list of times in seconds; returns the mean, p50, p90, p99 and max in milliseconds
+    benchmarkControls() - simulated power source, number of samples; times measureAll() and poll() (the GUI's poll plan) per tick, counts bus round trips per sample
+    benchmarkRecord() - simulated power source, InfluxStandIn, recording period, duration; runs the record() data path (measureAll, line protocol, spool, drainer to InfluxDB)
+                        at the period, returns tick latency, skipped ticks, spacing of the sample timestamps and points per second that reached InfluxDB
+    benchmarkInflux() - InfluxStandIn, number of points, batch size; points per second through InfluxClient.write_data() one point per write and write_batch() in batches
+    runAll() - parsed arguments; runs every benchmark and returns the results
+    compareResults() - old results, new results, tolerance; returns the metrics that got worse by more than tolerance (fraction)
+    main() - no parameters; command line entry point, saves the results as JSON
+
+    Note: Every benchmark reports the CPU time it used (time.process_time, all threads) next to the wall time.
+    Note: The recording periods show what "Frequency under 2 seconds may result in inconsistent measurements" means for the set bus latency, a period is only
+    reliable while tick latency p99 stays below it (skipped ticks 0, sample spacing jitter small).
+    Usage: python benchmark.py --latency 0.002 --meas-latency 0.02 --periods 2 1 0.5 0.2 0.1 --compare benchmark_results/previous.json
+"""
+
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from E36312A import E36312A_Controls, RECORD_PRECISION
+from influx import InfluxClient
+from lineprotocol import encodeSnapshot, encodePoint
+from simulated import SimulatedE36312A
+from spool import TelemetrySpool, SpoolDrainer
+
+RESULTS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_results")
+CHANNELS = [1, 2, 3]
+
+# Metrics compared by compareResults(), True if higher is better
+COMPARED = {
+    "latency_ms.p50": False,
+    "latency_ms.p99": False,
+    "round_trips_per_sample": False,
+    "points_per_second": True,
+    "cpu_seconds": False,
+    "skipped_ticks": False,
+}
+
+
+class InfluxStandIn:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.points = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        standIn = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                time.sleep(standIn.delay)
+                with standIn._lock:
+                    standIn.requests += 1
+                    standIn.points += len([line for line in body.split(b"\n") if line])
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="InfluxStandIn", daemon=True)
+        self._thread.start()
+
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def percentiles(times):
+    if not times:
+        return {}
+    ordered = sorted(times)
+
+    def at(fraction):
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)] * 1000
+
+    return {
+        "mean": statistics.mean(ordered) * 1000,
+        "p50": at(0.50),
+        "p90": at(0.90),
+        "p99": at(0.99),
+        "max": ordered[-1] * 1000,
+    }
+
+
+def roundTrips(before, after):
+    return (after["writes"] - before["writes"]) + (after["reads"] - before["reads"])
+
+
+def benchmarkControls(device, samples=200):
+    results = {}
+    items = [("pair",)] + [("settings", ch) for ch in CHANNELS] + [("measure", ch) for ch in CHANNELS]
+    x = E36312A_Controls()
+    tests = {
+        "measureAll": lambda: x.measureAll(device, CHANNELS),
+        "poll": lambda: x.poll(device, items),
+    }
+    for name, tick in tests.items():
+        times = []
+        before = device.stats()
+        cpu = time.process_time()
+        start = time.perf_counter()
+        for i in range(samples):
+            tickStart = time.perf_counter()
+            tick()
+            times.append(time.perf_counter() - tickStart)
+        wall = time.perf_counter() - start
+        results[name] = {
+            "samples": samples,
+            "latency_ms": percentiles(times),
+            "round_trips_per_sample": roundTrips(before, device.stats()) / samples,
+            "samples_per_second": samples / wall,
+            "wall_seconds": wall,
+            "cpu_seconds": time.process_time() - cpu,
+        }
+    return results
+
+
+def benchmarkRecord(device, standIn, period, duration):
+    x = E36312A_Controls()
+    x.turnAllOn(device, CHANNELS)
+    directory = tempfile.mkdtemp(prefix="benchmark_spool_")
+    spool = TelemetrySpool(directory, precision=RECORD_PRECISION, segment_seconds=min(1.0, duration))
+    client = InfluxClient("benchmark", "benchmark", "benchmark", url=standIn.url())
+    drainer = SpoolDrainer(spool, client.write_batch, interval=0.1)
+    drainer.start()
+    pointsBefore = standIn.points
+    before = device.stats()
+
+    times = []
+    timestamps = []
+    skipped = 0
+    cpu = time.process_time()
+    start = time.perf_counter()
+    due = start
+    while due - start < duration:
+        now = time.perf_counter()
+        if now < due:
+            time.sleep(due - now)
+        tickStart = time.perf_counter()
+        # Same path as GUI_E36312A.record() and writeRecord()
+        snapshot = x.measureAll(device, CHANNELS)
+        spool.append(encodeSnapshot(snapshot, precision=RECORD_PRECISION, output_only=True))
+        times.append(time.perf_counter() - tickStart)
+        timestamps.append(snapshot.timestamp)
+        due += period
+        # Like the worker, a tick that is due while the last one is still running is skipped
+        while due < time.perf_counter():
+            due += period
+            skipped += 1
+    recordWall = time.perf_counter() - start
+    drainer.stop(drain=True)
+    wall = time.perf_counter() - start
+    cpuUsed = time.process_time() - cpu
+    client.close()
+    shutil.rmtree(directory, ignore_errors=True)
+
+    spacing = [(b - a) / 1e9 for a, b in zip(timestamps, timestamps[1:])]
+    return {
+        "period": period,
+        "samples": len(times),
+        "skipped_ticks": skipped,
+        "achieved_rate": len(times) / recordWall,
+        "latency_ms": percentiles(times),
+        "spacing_ms": percentiles(spacing),
+        "spacing_jitter_ms": statistics.pstdev(spacing) * 1000 if len(spacing) > 1 else 0.0,
+        "round_trips_per_sample": roundTrips(before, device.stats()) / max(len(times), 1),
+        "points_written": standIn.points - pointsBefore,
+        "points_per_second": (standIn.points - pointsBefore) / wall,
+        "drain_seconds": wall - recordWall,
+        "wall_seconds": wall,
+        "cpu_seconds": cpuUsed,
+    }
+
+
+def benchmarkInflux(standIn, points=2000, batch_size=500):
+    client = InfluxClient("benchmark", "benchmark", "benchmark", url=standIn.url())
+    lines = [encodePoint("E36312A", {"Channel": i % 3 + 1}, {"voltage": 1.0, "current": 0.1}, time.time_ns() + i) for i in range(points)]
+    results = {}
+    tests = {
+        # How the GUI used to write, one request per point
+        "write_data": lambda: [client.write_data(line, precision='ns') for line in lines[:max(points // 10, 1)]],
+        "write_batch": lambda: [client.write_batch(lines[i:i + batch_size], precision='ns') for i in range(0, points, batch_size)],
+    }
+    for name, run in tests.items():
+        before = standIn.points
+        cpu = time.process_time()
+        start = time.perf_counter()
+        run()
+        wall = time.perf_counter() - start
+        written = standIn.points - before
+        results[name] = {
+            "points_written": written,
+            "points_per_second": written / wall,
+            "wall_seconds": wall,
+            "cpu_seconds": time.process_time() - cpu,
+        }
+    client.close()
+    return results
+
+
+def runAll(arguments):
+    latencies = {"MEAS": arguments.meas_latency} if arguments.meas_latency else None
+    device = SimulatedE36312A(latency=arguments.latency, latencies=latencies, seed=0)
+    standIn = InfluxStandIn(arguments.http_delay)
+    try:
+        results = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": vars(arguments),
+            "controls": benchmarkControls(device, arguments.samples),
+            "record": [benchmarkRecord(device, standIn, period, arguments.duration) for period in arguments.periods],
+            "influx": benchmarkInflux(standIn, arguments.points),
+        }
+    finally:
+        standIn.close()
+    return results
+
+
+def _metrics(results):
+    """Flattens the results into name: value for every compared metric"""
+    metrics = {}
+
+    def collect(prefix, value):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                collect(f"{prefix}{key}.", item)
+        elif isinstance(value, (int, float)):
+            for name, higher in COMPARED.items():
+                if prefix.endswith(f".{name}.") or prefix == f"{name}.":
+                    metrics[prefix[:-1]] = (value, higher)
+
+    collect("", {"controls": results["controls"], "influx": results["influx"]})
+    for record in results["record"]:
+        collect(f"record.{record['period']}.", record)
+    return metrics
+
+
+def compareResults(old, new, tolerance=0.1):
+    worse = {}
+    oldMetrics = _metrics(old)
+    for name, (value, higher) in _metrics(new).items():
+        if name not in oldMetrics or oldMetrics[name][0] == 0:
+            continue
+        change = (value - oldMetrics[name][0]) / abs(oldMetrics[name][0])
+        if (change < -tolerance) if higher else (change > tolerance):
+            worse[name] = {"old": oldMetrics[name][0], "new": value, "change": change}
+    return worse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Acquisition throughput benchmark against simulated instruments")
+    parser.add_argument("--latency", type=float, default=0.002, help="time in seconds of every bus write and read")
+    parser.add_argument("--meas-latency", type=float, default=0.02, help="extra time in seconds of every MEAS command")
+    parser.add_argument("--http-delay", type=float, default=0.005, help="time in seconds the InfluxDB stand-in takes to answer a write")
+    parser.add_argument("--samples", type=int, default=200, help="samples per controls benchmark")
+    parser.add_argument("--periods", type=float, nargs="+", default=[2.0, 1.0, 0.5, 0.2, 0.1, 0.05], help="recording periods in seconds")
+    parser.add_argument("--duration", type=float, default=5.0, help="time in seconds recorded at each period")
+    parser.add_argument("--points", type=int, default=5000, help="points written by the InfluxDB benchmark")
+    parser.add_argument("--output", default=None, help="JSON file for the results (default benchmark_results/benchmark-<time>.json)")
+    parser.add_argument("--compare", default=None, help="JSON results of an earlier run to compare with")
+    arguments = parser.parse_args()
+
+    results = runAll(arguments)
+    output = arguments.output or os.path.join(RESULTS_DIRECTORY, time.strftime("benchmark-%Y%m%d-%H%M%S.json"))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=1)
+
+    for name, result in results["controls"].items():
+        print(f"{name}: p50 {result['latency_ms']['p50']:.2f} ms, p99 {result['latency_ms']['p99']:.2f} ms, "
+              f"{result['round_trips_per_sample']:.1f} round trips/sample, {result['samples_per_second']:.1f} samples/s")
+    for result in results["record"]:
+        print(f"record every {result['period']} s: p99 {result['latency_ms'].get('p99', 0):.2f} ms, {result['skipped_ticks']} skipped, "
+              f"spacing jitter {result['spacing_jitter_ms']:.2f} ms, {result['points_per_second']:.1f} points/s, cpu {result['cpu_seconds']:.2f} s")
+    for name, result in results["influx"].items():
+        print(f"{name}: {result['points_per_second']:.0f} points/s")
+    print(f"Results saved to {output}")
+
+    if arguments.compare:
+        with open(arguments.compare, 'r') as file:
+            worse = compareResults(json.load(file), results)
+        for name, change in worse.items():
+            print(f"WORSE {name}: {change['old']:.4g} -> {change['new']:.4g} ({change['change']:+.0%})")
+        if not worse:
+            print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
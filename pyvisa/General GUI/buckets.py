@@ -0,0 +1,155 @@
+"""
+Dependencies:
+    Python: version 3.8.18
+    influxdb-client: version 1.43.0
+    pyside6: version 6.6.2
+
+Classes:
+    BucketDirectory: Keeps the list of InfluxDB bucket names, loads and changes it on a background thread so the GUI never waits on the network. The last list
+    that was loaded is saved to a JSON file and shown right away the next time, the connection to InfluxDB is only made when the list is refreshed or a bucket is created.
+        Constructor:
+            token: security token obtained from Influx
+            org: set organization on Influx
+            url: address of the InfluxDB server (optional)
+            cache_path: JSON file the bucket names are saved to (optional)
+        Signals:
+            updated: list of bucket names, emitted when a refresh finishes
+            failed: operation ("refresh" or "create"), error message, emitted when a request fails
+        Methods:
+            sample() - all parameters; description
+
+            names() - no parameters; returns the bucket names that were loaded last (from the cache file before the first refresh)
+            cacheTime() - no parameters; returns when the names were loaded (seconds since epoch), None if they never were
+            refresh() - no parameters; loads the bucket names in the background, emits updated or failed, does nothing if a refresh is already running
+            create() - bucket name; creates the bucket in the background, then refreshes the names
+            close() - no parameters; drops the requests that have not started and closes the connection on the background thread once the running request is
+                      done, does not wait for it (an unreachable server would block until the request times out)
+
+    Note: Signals are emitted from the background thread, connected widgets receive them on the GUI thread.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import threading
+import time
+
+#Pyside6 imports
+from PySide6.QtCore import QObject, Signal
+
+from influx import INFLUX_URL
+
+BUCKET_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bucket_cache.json")
+
+
+class BucketDirectory(QObject):
+    updated = Signal(object)
+    failed = Signal(str, str)
+
+    def __init__(self, token, org, url=INFLUX_URL, cache_path=BUCKET_CACHE_PATH, parent=None):
+        super().__init__(parent)
+        self.token = token
+        self.org = org
+        self.url = url
+        self.cache_path = cache_path
+        self._key = f"{url}|{org}"
+        self._client = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="BucketDirectory")
+        self._names, self._time = [], None
+        try:
+            with open(cache_path, 'r') as file:
+                entry = json.load(file).get(self._key)
+            if entry is not None:
+                self._names, self._time = entry["names"], entry["time"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def names(self):
+        with self._lock:
+            return list(self._names)
+
+    def cacheTime(self):
+        return self._time
+
+    def refresh(self):
+        with self._lock:
+            if self._refreshing or self._closed:
+                return
+            self._refreshing = True
+            self._executor.submit(self._refresh)
+
+    def create(self, name):
+        with self._lock:
+            if not self._closed:
+                self._executor.submit(self._create, name)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            # Queued after the running request, the client is never closed under it
+            self._executor.submit(self._closeClient)
+        # Python 3.8 has no cancel_futures, requests that have not started see _closed and return
+        self._executor.shutdown(wait=False)
+
+    def _closeClient(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def _bucketsApi(self):
+        # Runs on the background thread, importing and connecting is done the first time it is needed
+        if self._client is None:
+            from influxdb_client import InfluxDBClient
+            self._client = InfluxDBClient(url=self.url, token=self.token, org=self.org)
+        return self._client.buckets_api()
+
+    def _refresh(self):
+        try:
+            if self._closed:
+                return
+            names = [bucket.name for bucket in self._bucketsApi().find_buckets().buckets]
+        except Exception as e:
+            if not self._closed:
+                self.failed.emit("refresh", str(e))
+            return
+        finally:
+            with self._lock:
+                self._refreshing = False
+        with self._lock:
+            self._names, self._time = names, time.time()
+        self._save()
+        if not self._closed:
+            self.updated.emit(names)
+
+    def _create(self, name):
+        if self._closed:
+            return
+        try:
+            from influxdb_client import BucketRetentionRules
+            retention_rules = BucketRetentionRules(type="expire", every_seconds=0)
+            self._bucketsApi().create_bucket(bucket_name=name, retention_rules=retention_rules, org=self.org)
+        except Exception as e:
+            if not self._closed:
+                self.failed.emit("create", str(e))
+            return
+        self.refresh()
+
+    def _save(self):
+        try:
+            with open(self.cache_path, 'r') as file:
+                entries = json.load(file)
+        except (OSError, ValueError):
+            entries = {}
+        entries[self._key] = {"names": self._names, "time": self._time}
+        temporary = self.cache_path + ".tmp"
+        try:
+            with open(temporary, 'w') as file:
+                json.dump(entries, file, indent=1)
+            os.replace(temporary, self.cache_path)
+        except OSError as e:
+            print(e)
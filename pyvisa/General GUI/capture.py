@@ -0,0 +1,279 @@
+"""
+Dependencies:
+    Python: version 3.8.18
+    numpy: version 1.24.4
+
+Classes:
+    CaptureWriter: Appends readings to a capture file, a fixed size header followed by fixed size records (timestamp, channel, value) accessed through
+    numpy.memmap, so an analysis process can read the file with CaptureReader while it is being written, without copying. The file grows in steps of
+    grow records. Readings are grouped in segments (one run, one burst), the segments are kept in an index file (<path>.idx) so a reader finds a time range
+    with a binary search instead of scanning the records.
+        Constructor:
+            path: capture file, created (or appended to if it exists)
+            grow: number of records the file grows by when it is full
+        Methods:
+            sample() - all parameters; description
+
+            channelId() - channel name (e.g. "E36312A/1/voltage"); returns the number of the channel, adds it to the header if it is new
+            append() - timestamps in nanoseconds since epoch, channel numbers (or one number for all), values; appends the records to the open segment
+            appendSnapshot() - E36312A_Snapshot, instrument name (optional); appends the voltage and current of every channel
+            appendBurst() - HP3458A_Burst, channel name (optional); appends every reading with its time
+            beginSegment() - no parameters; starts a new segment with the next append
+            flush() - no parameters; writes the memory maps to disk
+            close() - no parameters; flushes and closes the file
+            stats() - no parameters; returns a dictionary: records, segments, capacity, bytes
+
+    CaptureReader: Reads a capture file, also while a CaptureWriter is appending to it (call refresh() to see new records)
+        Constructor:
+            path: capture file
+        Methods:
+            sample() - all parameters; description
+
+            refresh() - no parameters; maps the records and segments written since the last refresh, returns the number of records
+            channels() - no parameters; returns the list of channel names, the channel number is the position in the list
+            segments() - no parameters; returns the segments as a structured array (first, last timestamp, start record, count)
+            read() - start and end in nanoseconds since epoch (optional), channel name or number (optional); returns the records in the range, a view of the
+                     file (no copy) when no channel is given
+            latest() - number of records; returns the newest records (view of the file)
+            close() - no parameters; closes the memory maps
+
+    Note: Only the writer changes the file. Records are written before the record count in the header, so a reader never sees a record that is not complete.
+    Note: Timestamps must not go backwards within a segment, and a segment must not start before the previous one ended (true for time.time_ns() readings
+    appended as they are taken), that is what the binary search relies on. Use one file per acquisition thread.
+    Note: RECORD is timestamp (int64), channel (int32), value (float64), 20 bytes per reading, little-endian.
+"""
+
+import bisect
+import json
+import os
+import threading
+
+import numpy as np
+
+MAGIC = b"PVCAPT01"
+HEADER_BYTES = 4096
+RECORD = np.dtype([("timestamp", "<i8"), ("channel", "<i4"), ("value", "<f8")])
+SEGMENT = np.dtype([("first", "<i8"), ("last", "<i8"), ("start", "<i8"), ("count", "<i8")])
+# Header fields, int64 after the magic
+COUNT, CAPACITY, SEGMENTS, SEGMENT_CAPACITY, CHANNELS_BYTES = range(5)
+_FIELDS = 5
+_CHANNELS_OFFSET = len(MAGIC) + 8 * _FIELDS
+
+
+class CaptureWriter:
+    def __init__(self, path, grow=1 << 20):
+        self.path = path
+        self.grow = grow
+        self._lock = threading.Lock()
+        self._newSegment = True
+        if not os.path.exists(path):
+            with open(path, "wb") as file:
+                file.write(MAGIC + np.zeros(_FIELDS, dtype="<i8").tobytes())
+                file.truncate(HEADER_BYTES)
+            with open(path + ".idx", "wb"):
+                pass
+        self._header = np.memmap(path, dtype="<i8", mode="r+", offset=len(MAGIC), shape=(_FIELDS,))
+        if bytes(np.memmap(path, dtype=np.uint8, mode="r", shape=(len(MAGIC),))) != MAGIC:
+            raise ValueError(f"{path} is not a capture file")
+        self._channels = _readChannels(path, self._header)
+        self._records = None
+        self._segments = None
+        self._mapRecords(max(int(self._header[CAPACITY]), 0))
+        self._mapSegments(int(self._header[SEGMENT_CAPACITY]))
+
+    def channelId(self, name):
+        with self._lock:
+            if name not in self._channels:
+                self._channels.append(name)
+                data = json.dumps(self._channels).encode("utf-8")
+                if _CHANNELS_OFFSET + len(data) > HEADER_BYTES:
+                    self._channels.pop()
+                    raise ValueError("Too many channels for the capture header")
+                with open(self.path, "r+b") as file:
+                    file.seek(_CHANNELS_OFFSET)
+                    file.write(data)
+                self._header[CHANNELS_BYTES] = len(data)
+            return self._channels.index(name)
+
+    def append(self, timestamps, channels, values):
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        count = len(values)
+        if count == 0:
+            return
+        with self._lock:
+            used = int(self._header[COUNT])
+            if used + count > len(self._records):
+                self._mapRecords(used + count + self.grow)
+            records = self._records[used:used + count]
+            records["timestamp"] = timestamps
+            records["channel"] = channels
+            records["value"] = values
+
+            segments = int(self._header[SEGMENTS])
+            if self._newSegment or segments == 0:
+                if segments + 1 > len(self._segments):
+                    self._mapSegments(2 * len(self._segments) + 64)
+                self._segments[segments] = (timestamps[0], timestamps.max(), used, count)
+                segments += 1
+                self._newSegment = False
+            else:
+                segment = self._segments[segments - 1]
+                segment["last"] = max(int(segment["last"]), int(timestamps.max()))
+                segment["count"] += count
+            # Published last, a reader only sees complete records and segments
+            self._header[SEGMENTS] = segments
+            self._header[COUNT] = used + count
+
+    def appendSnapshot(self, snapshot, instrument="E36312A"):
+        channels, values = [], []
+        for reading in snapshot.readings:
+            channels += [self.channelId(f"{instrument}/{reading.channel}/voltage"), self.channelId(f"{instrument}/{reading.channel}/current")]
+            values += [reading.voltage, reading.current]
+        self.append(np.full(len(values), snapshot.timestamp, dtype=np.int64), np.array(channels, dtype=np.int32), values)
+
+    def appendBurst(self, burst, name="HP3458A"):
+        self.append(burst.timestamps, self.channelId(name), burst.readings)
+
+    def beginSegment(self):
+        with self._lock:
+            self._newSegment = True
+
+    def flush(self):
+        with self._lock:
+            _flush(self._records)
+            _flush(self._segments)
+            self._header.flush()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._records = None
+            self._segments = None
+            self._header = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "records": int(self._header[COUNT]),
+                "segments": int(self._header[SEGMENTS]),
+                "capacity": len(self._records),
+                "bytes": HEADER_BYTES + len(self._records) * RECORD.itemsize,
+            }
+
+    def _mapRecords(self, capacity):
+        if self._records is not None:
+            _flush(self._records)
+        if capacity:
+            with open(self.path, "r+b") as file:
+                file.truncate(HEADER_BYTES + capacity * RECORD.itemsize)
+            self._records = np.memmap(self.path, dtype=RECORD, mode="r+", offset=HEADER_BYTES, shape=(capacity,))
+        else:
+            self._records = np.zeros(0, dtype=RECORD)
+        self._header[CAPACITY] = capacity
+
+    def _mapSegments(self, capacity):
+        if self._segments is not None:
+            _flush(self._segments)
+        if capacity:
+            with open(self.path + ".idx", "r+b") as file:
+                file.truncate(capacity * SEGMENT.itemsize)
+            self._segments = np.memmap(self.path + ".idx", dtype=SEGMENT, mode="r+", shape=(capacity,))
+        else:
+            self._segments = np.zeros(0, dtype=SEGMENT)
+        self._header[SEGMENT_CAPACITY] = capacity
+
+
+class CaptureReader:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a capture file")
+        self._header = np.memmap(path, dtype="<i8", mode="r", offset=len(MAGIC), shape=(_FIELDS,))
+        self._records = np.zeros(0, dtype=RECORD)
+        self._segments = np.zeros(0, dtype=SEGMENT)
+        self._channels = []
+        self._channelsBytes = 0
+        self._count = 0
+        self._segmentCount = 0
+        self.refresh()
+
+    def refresh(self):
+        # The writer publishes the segments before the count, so reading the count first means every record counted has its segment
+        count = int(self._header[COUNT])
+        segments = int(self._header[SEGMENTS])
+        if segments > len(self._segments):
+            self._segments = np.memmap(self.path + ".idx", dtype=SEGMENT, mode="r", shape=(int(self._header[SEGMENT_CAPACITY]),))
+        if count > len(self._records):
+            self._records = np.memmap(self.path, dtype=RECORD, mode="r", offset=HEADER_BYTES, shape=(int(self._header[CAPACITY]),))
+        if int(self._header[CHANNELS_BYTES]) != self._channelsBytes:
+            self._channelsBytes = int(self._header[CHANNELS_BYTES])
+            self._channels = _readChannels(self.path, self._header)
+        self._count = count
+        self._segmentCount = segments
+        return count
+
+    def channels(self):
+        return list(self._channels)
+
+    def segments(self):
+        return self._segments[:self._segmentCount]
+
+    def read(self, start=None, end=None, channel=None):
+        segments = self.segments()
+        if len(segments) == 0:
+            return self._records[:0]
+        # Segments in time order: the first one that ends at or after start, the last one that begins before end
+        first = 0 if start is None else int(np.searchsorted(segments["last"], start, side="left"))
+        last = len(segments) if end is None else int(np.searchsorted(segments["first"], end, side="left"))
+        if first >= last:
+            return self._records[:0]
+        begin = int(segments[first]["start"])
+        stop = min(int(segments[last - 1]["start"] + segments[last - 1]["count"]), self._count)
+        records = self._records[begin:stop]
+        # Within those segments timestamps only go forward
+        if start is not None:
+            records = records[bisect.bisect_left(_Timestamps(records), start):]
+        if end is not None:
+            records = records[:bisect.bisect_left(_Timestamps(records), end)]
+        if channel is not None:
+            if isinstance(channel, str):
+                channel = self._channels.index(channel)
+            records = records[records["channel"] == channel]
+        return records
+
+    def latest(self, count):
+        return self._records[max(0, self._count - count):self._count]
+
+    def close(self):
+        self._records = None
+        self._segments = None
+        self._header = None
+
+
+class _Timestamps:
+    # np.searchsorted would copy the strided timestamp field first, bisect only touches the log2(n) records it compares
+    def __init__(self, records):
+        self.records = records
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        return int(self.records[index]["timestamp"])
+
+
+def _flush(array):
+    # Empty files are plain arrays until the first append
+    if isinstance(array, np.memmap):
+        array.flush()
+
+
+def _readChannels(path, header):
+    length = int(header[CHANNELS_BYTES])
+    if length == 0:
+        return []
+    with open(path, "rb") as file:
+        file.seek(_CHANNELS_OFFSET)
+        return json.loads(file.read(length).decode("utf-8"))
@@ -0,0 +1,160 @@
+"""
+Dependencies:
+    Python: version 3.8.18
+    pyside6: version 6.6.2
+
+Classes:
+    SampleTick: one tick of a SamplingClock
+        index: number of the tick since start() (missed ticks are counted too, so index * period is its place in the schedule)
+        deadline: time the tick was due (time.monotonic_ns())
+        scheduled: time the tick was due in nanoseconds since epoch, the time the sample should have been taken
+        fired: time the tick was delivered (time.monotonic_ns())
+        missed: number of ticks skipped right before this one because they were already over when the clock got to run
+
+    SamplingClock: Fixed cadence clock for recording. Ticks are due at start + index * period on the monotonic clock, every deadline is computed from the start
+    and not from the last tick, so late ticks, slow acquisitions and a busy GUI do not add up to drift. Ticks that are already over when the clock gets to run
+    are skipped and counted (missed) instead of being delivered in a burst.
+        Constructor:
+            callback: function(SampleTick) called on every tick
+            period: time in seconds between ticks
+            window: number of recent samples the jitter and duration statistics are computed over
+        Methods:
+            sample() - all parameters; description
+
+            start() - no parameters; starts ticking, the first tick is due right away, resets the statistics
+            stop() - no parameters; stops ticking
+            isActive() - no parameters; returns True while ticking
+            setPeriod() - period in seconds; changes the period, if ticking the schedule restarts from the next tick
+            complete() - SampleTick, acquisition start and end in nanoseconds since epoch; records when the sample of the tick was actually taken
+            overrun() - SampleTick; records that the tick was dropped because the previous acquisition was still running
+            stats() - no parameters; returns a dictionary: period, ticks, samples, missed, overruns, jitter (start - scheduled) mean/std/max and
+                      acquisition duration mean/max in milliseconds over the last window samples
+
+    Note: Ticks are delivered by a precise single shot QTimer on the thread the clock lives on, the timer has millisecond resolution so a tick can be up to 1 ms
+    late, this shows up in the jitter statistics and is not carried over to the next tick.
+"""
+
+from collections import deque
+from dataclasses import dataclass
+import math
+import statistics
+import time
+
+#Pyside6 imports
+from PySide6.QtCore import QObject, QTimer, Qt
+
+
+@dataclass
+class SampleTick:
+    index: int
+    deadline: int
+    scheduled: int
+    fired: int
+    missed: int = 0
+
+
+class SamplingClock(QObject):
+    def __init__(self, callback, period=1.0, window=1000, parent=None):
+        super().__init__(parent)
+        self.callback = callback
+        self.period = period
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self._fire)
+        self._jitter = deque(maxlen=window)
+        self._durations = deque(maxlen=window)
+        self._running = False
+        self._start = 0
+        self._offset = 0
+        self._index = 0
+        self._resetStats()
+
+    def start(self):
+        self._resetStats()
+        self._running = True
+        self._index = 0
+        self._anchor(time.monotonic_ns())
+
+    def stop(self):
+        self._running = False
+        self._timer.stop()
+
+    def isActive(self):
+        return self._running
+
+    def setPeriod(self, period):
+        if self._running:
+            # The next tick keeps its place, the ones after it follow the new period
+            following = self._start + self._index * self._periodNs()
+            self.period = period
+            self._anchor(following)
+        else:
+            self.period = period
+
+    def complete(self, tick, start, end):
+        self._samples += 1
+        self._jitter.append(start - tick.scheduled)
+        self._durations.append(end - start)
+
+    def overrun(self, tick):
+        self._overruns += 1
+
+    def stats(self):
+        jitter = [value / 1e6 for value in self._jitter]
+        durations = [value / 1e6 for value in self._durations]
+        return {
+            "period": self.period,
+            "ticks": self._ticks,
+            "samples": self._samples,
+            "missed": self._missed,
+            "overruns": self._overruns,
+            "jitter_mean_ms": statistics.mean(jitter) if jitter else 0.0,
+            "jitter_std_ms": statistics.pstdev(jitter) if len(jitter) > 1 else 0.0,
+            "jitter_max_ms": max(jitter, key=abs) if jitter else 0.0,
+            "duration_mean_ms": statistics.mean(durations) if durations else 0.0,
+            "duration_max_ms": max(durations) if durations else 0.0,
+        }
+
+    def _resetStats(self):
+        self._ticks = 0
+        self._samples = 0
+        self._missed = 0
+        self._overruns = 0
+        self._jitter.clear()
+        self._durations.clear()
+
+    def _periodNs(self):
+        return max(1, int(round(self.period * 1e9)))
+
+    def _anchor(self, deadline):
+        # Deadlines are start + index * period, the offset converts them to epoch time once so wall clock steps do not move the schedule
+        self._start = deadline - self._index * self._periodNs()
+        self._offset = time.time_ns() - time.monotonic_ns()
+        self._arm()
+
+    def _arm(self):
+        deadline = self._start + self._index * self._periodNs()
+        self._timer.start(max(0, math.ceil((deadline - time.monotonic_ns()) / 1e6)))
+
+    def _fire(self):
+        if not self._running:
+            return
+        period = self._periodNs()
+        now = time.monotonic_ns()
+        deadline = self._start + self._index * period
+        if now < deadline:
+            # Woke up just before the deadline
+            self._timer.start(max(1, math.ceil((deadline - now) / 1e6)))
+            return
+        # Deadlines that are over by a full period are skipped, the latest one that is due is delivered
+        missed = (now - deadline) // period
+        self._index += missed
+        self._missed += missed
+        deadline += missed * period
+        tick = SampleTick(self._index, deadline, deadline + self._offset, now, missed)
+        self._index += 1
+        self._ticks += 1
+        self.callback(tick)
+        if self._running:
+            self._arm()
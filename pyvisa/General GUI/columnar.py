@@ -0,0 +1,248 @@
+"""
+Dependencies:
+    Python: version 3.8.18
+    numpy: version 1.24.4
+    pyarrow: version 15.0.2 (imported when the first file is written or read)
+
+Classes:
+    ColumnarSink: Recording sink that keeps samples in column arrays and writes them as row groups of Parquet (or Arrow IPC) files, so a long capture is a few
+    compressed files that load in one call instead of a CSV that is reopened for every sample. The open file is written under a .partial name and renamed when
+    it is complete, a new file is started when it gets too large or too old.
+        Constructor:
+            directory: folder for the files, created if it does not exist
+            prefix: start of the file names (optional)
+            columns: dictionary of column name: NumPy type (optional, SNAPSHOT_COLUMNS by default)
+            format: "parquet" or "arrow" (Arrow IPC file)
+            row_group_size: number of rows buffered before they are written as one row group
+            flush_seconds: time in seconds buffered rows wait at most before they are written (slow recordings)
+            rotate_bytes: size in bytes after which the file is completed and a new one started
+            rotate_seconds: age in seconds after which the file is completed and a new one started
+            compression: Parquet compression ("zstd", "snappy", None)
+        Methods:
+            sample() - all parameters; description
+
+            append() - dictionary of column name: array or list (all the same length); buffers the rows, writes a row group when row_group_size rows are buffered,
+                       raises ValueError without buffering anything if a column is missing or the lengths differ
+            appendSnapshots() - list of E36312A_Snapshots, instrument name (optional); appends one row per channel of every snapshot
+            appendReadings() - timestamps in nanoseconds since epoch, readings, instrument name, channel (optional); appends one row per reading (voltage column)
+            flush() - no parameters; writes the buffered rows as a row group
+            rotate() - no parameters; writes the buffered rows, completes the open file and starts a new one on the next append
+            close() - no parameters; writes the buffered rows and completes the open file
+            stats() - no parameters; returns a dictionary of counters: rows, buffered, row_groups, files, bytes
+
+    Note: Appends are thread safe, the GUI thread and acquisition threads can write to the same sink.
+
+Methods:
+    sample() - all parameters; description
+
+    pyarrowAvailable() - no parameters; returns True if pyarrow is installed, without importing it
+    readRecording() - folder, start and end in nanoseconds since epoch (optional), prefix (optional, every file by default, "E36312A" for the GUI's recordings);
+                      returns the rows of the completed files as one pyarrow Table, only row groups that overlap the time range are read from Parquet files
+                      (table.to_pandas() for a DataFrame)
+
+    Note: SNAPSHOT_COLUMNS are timestamp (ns since epoch), instrument, channel, voltage, current, power and output, readings without a current have NaN there.
+"""
+
+import glob
+import importlib.util
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+SNAPSHOT_COLUMNS = {
+    "timestamp": np.int64,
+    "instrument": object,
+    "channel": np.int8,
+    "voltage": np.float64,
+    "current": np.float64,
+    "power": np.float64,
+    "output": np.bool_,
+}
+
+EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def pyarrowAvailable():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("ColumnarSink needs pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+class ColumnarSink:
+    def __init__(self, directory, prefix="recording", columns=None, format="parquet", row_group_size=65536, flush_seconds=60.0,
+                 rotate_bytes=256 * 1024 * 1024, rotate_seconds=3600.0, compression="zstd"):
+        if format not in EXTENSIONS:
+            raise ValueError(f"format must be one of {', '.join(EXTENSIONS)}")
+        self.directory = directory
+        self.prefix = prefix
+        self.columns = columns or SNAPSHOT_COLUMNS
+        self.format = format
+        self.row_group_size = row_group_size
+        self.flush_seconds = flush_seconds
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compression = compression
+        os.makedirs(directory, exist_ok=True)
+        self._buffer = {name: [] for name in self.columns}
+        self._buffered = 0
+        self._bufferedSince = None
+        self._writer = None
+        self._file = None
+        self._path = None
+        self._opened = None
+        self._lock = threading.Lock()
+        self._counters = {"rows": 0, "row_groups": 0, "files": 0, "bytes": 0}
+
+    def append(self, columns):
+        # Every column is converted and checked before any is buffered, a bad batch must not leave the buffer misaligned
+        arrays = {}
+        for name, dtype in self.columns.items():
+            if name not in columns:
+                raise ValueError(f"Missing column {name}")
+            arrays[name] = np.asarray(columns[name], dtype=dtype)
+        count = len(next(iter(arrays.values())))
+        if any(len(values) != count for values in arrays.values()):
+            raise ValueError("All columns must have the same length")
+        if not count:
+            return
+        with self._lock:
+            for name, values in arrays.items():
+                self._buffer[name].append(values)
+            if self._bufferedSince is None:
+                self._bufferedSince = time.monotonic()
+            self._buffered += count
+            if self._buffered >= self.row_group_size or time.monotonic() - self._bufferedSince >= self.flush_seconds:
+                self._flush()
+
+    def appendSnapshots(self, snapshots, instrument="E36312A"):
+        rows = [(snapshot.timestamp, reading) for snapshot in snapshots for reading in snapshot.readings]
+        self.append({
+            "timestamp": [timestamp for timestamp, reading in rows],
+            "instrument": [instrument] * len(rows),
+            "channel": [reading.channel for timestamp, reading in rows],
+            "voltage": [reading.voltage for timestamp, reading in rows],
+            "current": [reading.current for timestamp, reading in rows],
+            "power": [reading.power for timestamp, reading in rows],
+            "output": [reading.output for timestamp, reading in rows],
+        })
+
+    def appendReadings(self, timestamps, readings, instrument, channel=0):
+        count = len(readings)
+        self.append({
+            "timestamp": timestamps,
+            "instrument": np.full(count, instrument, dtype=object),
+            "channel": np.full(count, channel),
+            "voltage": readings,
+            "current": np.full(count, np.nan),
+            "power": np.full(count, np.nan),
+            "output": np.ones(count, dtype=np.bool_),
+        })
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def rotate(self):
+        with self._lock:
+            self._flush()
+            self._complete()
+
+    def close(self):
+        self.rotate()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["buffered"] = self._buffered
+            return stats
+
+    def _flush(self):
+        if not self._buffered:
+            return
+        pa = _pyarrow()
+        arrays = []
+        for name in self.columns:
+            values = np.concatenate(self._buffer[name])
+            if name == "timestamp":
+                arrays.append(pa.array(values, type=pa.timestamp("ns")))
+            elif values.dtype == object:
+                # Strings repeat (instrument names), dictionary encoding stores each once
+                arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values))
+            self._buffer[name] = []
+        table = pa.Table.from_arrays(arrays, names=list(self.columns))
+        if self._writer is None:
+            self._open(table.schema)
+        if self.format == "parquet":
+            self._writer.write_table(table, row_group_size=len(table))
+        else:
+            self._writer.write_table(table)
+        self._counters["rows"] += self._buffered
+        self._counters["row_groups"] += 1
+        self._buffered = 0
+        self._bufferedSince = None
+        if self._file.tell() >= self.rotate_bytes or time.monotonic() - self._opened >= self.rotate_seconds:
+            self._complete()
+
+    def _open(self, schema):
+        pa = _pyarrow()
+        name = f"{self.prefix}-{datetime.now():%Y%m%d-%H%M%S}-{self._counters['files']:04d}{EXTENSIONS[self.format]}"
+        self._path = os.path.join(self.directory, name)
+        self._file = pa.OSFile(self._path + ".partial", "wb")
+        if self.format == "parquet":
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(self._file, schema, compression=self.compression)
+        else:
+            self._writer = pa.ipc.new_file(self._file, schema)
+        self._opened = time.monotonic()
+
+    def _complete(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._counters["bytes"] += self._file.tell()
+        self._file.close()
+        os.replace(self._path + ".partial", self._path)
+        self._counters["files"] += 1
+        self._writer = None
+        self._file = None
+
+
+def readRecording(directory, start=None, end=None, prefix=None):
+    pa = _pyarrow()
+    tables = []
+    # Completed files only, open ones end in .partial
+    for path in sorted(glob.glob(os.path.join(directory, "*" if prefix is None else f"{prefix}-*"))):
+        if path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+            filters = []
+            if start is not None:
+                filters.append(("timestamp", ">=", pa.scalar(start, type=pa.timestamp("ns"))))
+            if end is not None:
+                filters.append(("timestamp", "<", pa.scalar(end, type=pa.timestamp("ns"))))
+            tables.append(pq.read_table(path, filters=filters or None))
+        elif path.endswith(".arrow"):
+            with pa.memory_map(path) as source:
+                table = pa.ipc.open_file(source).read_all()
+            if start is not None or end is not None:
+                timestamps = table.column("timestamp").cast(pa.int64()).to_numpy()
+                keep = np.ones(len(timestamps), dtype=bool)
+                if start is not None:
+                    keep &= timestamps >= start
+                if end is not None:
+                    keep &= timestamps < end
+                table = table.filter(pa.array(keep))
+            tables.append(table)
+    if not tables:
+        return None
+    return pa.concat_tables(tables)
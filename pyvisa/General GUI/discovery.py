@@ -0,0 +1,232 @@
+"""
+Dependencies:
+    Python: version 3.8.18
+    pyvisa: version 1.14.1
+    pyserial: version 3.5
+
+Classes:
+    DiscoveredDevice: an instrument that answered *IDN?, kind is "PyVisa" or "PySerial", baud is only used for PySerial devices
+
+    DiscoveryCache: Remembers the identification and working baud rate of every device found, saved to a JSON file so the next start does not repeat the full search
+        Constructor:
+            path: JSON file to store the cache in
+            ttl: time in seconds an entry is trusted, older entries are searched for again
+        Methods:
+            sample() - all parameters; description
+
+            get() - key; returns the cached entry (dictionary with kind, resource, idn, baud, time) if it is newer than ttl, otherwise None
+            put() - key, DiscoveredDevice; stores the device and saves the file
+            remove() - key; removes the entry and saves the file
+
+    DeviceProber: Sends *IDN? to every Pyvisa resource and serial port at the same time from a pool of threads, and reports each device as soon as it answers
+        Constructor:
+            registry: SessionRegistry (see sessions.py), sessions of the devices that answer are left open in it
+            visa_timeout: time in milliseconds to wait for a Pyvisa resource to answer
+            serial_timeout: time in seconds to wait for a serial device to answer at each baud rate
+            workers: maximum number of resources probed at the same time
+            cache: DiscoveryCache (optional); cached baud rates are tried first and results are stored in it
+        Methods:
+            sample() - all parameters; description
+
+            probeVisa() - resource string; returns a DiscoveredDevice if the resource answers *IDN?, otherwise None and the session is closed
+            probeSerial() - port name or serial.tools.list_ports port, list of baud rates; tries the cached baud rate first, if the device does not answer the same
+                            identification there, tries each baud rate in order, returns a DiscoveredDevice for the first one that answers, otherwise None
+            identifySerial() - port name, baud rate; opens the port at the baud rate in the registry, sends *IDN? and returns the answer (empty if there is none)
+            probeAll() - list of Pyvisa resources, list of serial ports (names or serial.tools.list_ports ports), callback, done callback (optional); probes everything in the background,
+                         callback is called with the kind ("PyVisa" or "PySerial"), resource and DiscoveredDevice (None if it did not answer) for every resource
+                         as it finishes, done is called once everything has finished. Callbacks are called from the probing threads.
+            shutdown() - no parameters; stops probing after the probes that are running finish
+
+    Note: One serial port is probed by one thread walking its baud list, because different baud rates cannot be tried on the same port at the same time.
+
+Methods:
+    serialPort() - resource string; returns the serial port of an ASRL resource, None for other resources
+    serialKey() - port name or serial.tools.list_ports port; returns the cache key of the port, port name + USB VID:PID + USB serial number when available
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+import json
+import os
+import threading
+import time
+
+import serial
+from pyvisa.errors import VisaIOError
+
+BAUD = [4800, 9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600]
+
+
+@dataclass
+class DiscoveredDevice:
+    kind: str
+    resource: str
+    idn: str
+    baud: int = None
+
+
+def serialPort(resource):
+    """Returns the serial port of an ASRL resource (ASRL3::INSTR is COM3), None for other resources"""
+    if not resource.upper().startswith("ASRL"):
+        return None
+    port = resource[4:].split("::")[0]
+    if port.isdigit():
+        return f"COM{port}"
+    return port
+
+
+def serialKey(port):
+    name = getattr(port, "device", port)
+    if getattr(port, "vid", None) is None:
+        return name
+    return f"{name}|{port.vid:04X}:{port.pid:04X}|{port.serial_number or ''}"
+
+
+class DiscoveryCache:
+    def __init__(self, path, ttl=7 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r') as file:
+                self._entries = json.load(file)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or time.time() - entry["time"] > self.ttl:
+            return None
+        return entry
+
+    def put(self, key, device):
+        entry = asdict(device)
+        entry["time"] = time.time()
+        with self._lock:
+            self._entries[key] = entry
+            self._save()
+
+    def remove(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save()
+
+    def _save(self):
+        temporary = self.path + ".tmp"
+        try:
+            with open(temporary, 'w') as file:
+                json.dump(self._entries, file, indent=1)
+            os.replace(temporary, self.path)
+        except OSError as e:
+            print(e)
+
+
+class DeviceProber:
+    def __init__(self, registry, visa_timeout=1000, serial_timeout=0.3, workers=16, cache=None):
+        self.registry = registry
+        self.visa_timeout = visa_timeout
+        self.serial_timeout = serial_timeout
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="DeviceProber")
+
+    def probeVisa(self, resource):
+        try:
+            device = self.registry.open(resource, open_timeout=self.visa_timeout)
+        except (VisaIOError, ValueError, OSError):
+            return None
+        timeout = device.timeout
+        try:
+            device.timeout = self.visa_timeout
+            device_id = device.query("*IDN?")
+        except (VisaIOError, ValueError, OSError):
+            self.registry.close(resource)
+            if self.cache is not None:
+                self.cache.remove(resource)
+            return None
+        # The session stays open in the registry for the GUI, with its normal timeout
+        device.timeout = timeout
+        found = DiscoveredDevice("PyVisa", resource, device_id)
+        if self.cache is not None:
+            self.cache.put(resource, found)
+        return found
+
+    def probeSerial(self, port, bauds=BAUD):
+        key = serialKey(port)
+        port = getattr(port, "device", port)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None and cached["baud"] in bauds:
+            # Verify the cached setting with one query, only search all baud rates if the answer changed
+            try:
+                device_id = self.identifySerial(port, cached["baud"])
+            except (serial.SerialException, OSError) as e:
+                print(e)
+                self.registry.close(port)
+                return None
+            if device_id.strip() == cached["idn"].strip():
+                found = DiscoveredDevice("PySerial", port, device_id, cached["baud"])
+                self.cache.put(key, found)
+                return found
+            bauds = [baud for baud in bauds if baud != cached["baud"]]
+
+        for baud in bauds:
+            try:
+                device_id = self.identifySerial(port, baud)
+            except (serial.SerialException, OSError) as e:
+                print(e)
+                self.registry.close(port)
+                return None
+            if device_id.strip():
+                found = DiscoveredDevice("PySerial", port, device_id, baud)
+                if self.cache is not None:
+                    self.cache.put(key, found)
+                return found
+        self.registry.close(port)
+        if self.cache is not None:
+            self.cache.remove(key)
+        return None
+
+    def identifySerial(self, port, baud):
+        # The port stays open in the registry, at the next baud rate it is reopened
+        device = self.registry.openSerial(port, baud, timeout=self.serial_timeout)
+        device.reset_input_buffer()
+        device.write(b'*IDN?\n')
+        # readline returns as soon as the answer is complete instead of sleeping a fixed time
+        return device.readline().decode("utf-8", errors="ignore")
+
+    def probeAll(self, visa_resources, serial_ports, callback, done=None):
+        # Probes of the same serial port (as a Pyvisa ASRL resource and through pyserial) run one after another in one job
+        groups = {}
+        for resource in visa_resources:
+            groups.setdefault(serialPort(resource) or resource, []).append(("PyVisa", resource, self.probeVisa))
+        for port in serial_ports:
+            name = getattr(port, "device", port)
+            groups.setdefault(name, []).append(("PySerial", port, self.probeSerial))
+        remaining = [len(groups)]
+        lock = threading.Lock()
+
+        def run(probes):
+            answered = False
+            for kind, resource, probe in probes:
+                result = None
+                # A port that answered as a Pyvisa resource is already open there
+                if not answered:
+                    try:
+                        result = probe(resource)
+                    except Exception as e:
+                        print(e)
+                answered = answered or result is not None
+                callback(kind, getattr(resource, "device", resource), result)
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last and done is not None:
+                done()
+
+        if not groups and done is not None:
+            done()
+        for probes in groups.values():
+            self._executor.submit(run, probes)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,90 @@
+"""
+Registry of instrument drivers, maps the model in the *IDN? answer to the module and GUI class of its driver, so only the selected driver is imported
+
+Dependencies:
+    Python: version 3.8.18
+
+No Classes
+
+Methods:
+    sample() - all parameters; description
+
+    registerDriver() - model, module name, GUI class name; adds a driver to the registry
+    findDriver() - identification (*IDN? answer) or model; returns the module name and GUI class name of its driver, None if there is none
+    loadDriver() - identification (*IDN? answer) or model; imports only the driver's module and returns its GUI class, None if there is none
+    importTime() - module name; imports the module in a new Python process and returns the time it took in seconds
+
+    Note: To add an instrument, write its module (like E36312A.py, with a GUI_<model> class) and add it to DRIVERS. Drivers can also be added without changing
+    this file through the "pyvisa_template.drivers" entry point group, name = model, value = "module:GUI class".
+    Usage: python drivers.py prints the import time of every driver, to keep start up fast.
+"""
+
+import importlib
+import os
+import subprocess
+import sys
+
+ENTRY_POINT_GROUP = "pyvisa_template.drivers"
+
+# model: (module, GUI class)
+DRIVERS = {
+    "E36312A": ("E36312A", "GUI_E36312A"),
+}
+
+
+def registerDriver(model, module, attribute):
+    DRIVERS[model.strip().upper()] = (module, attribute)
+
+
+def _model(idn):
+    parts = idn.split(",")
+    # *IDN? is manufacturer,model,serial,firmware
+    return (parts[1] if len(parts) > 1 else parts[0]).strip().upper()
+
+
+def _entryPoints():
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return []
+    found = entry_points()
+    if hasattr(found, "select"):
+        return list(found.select(group=ENTRY_POINT_GROUP))
+    return list(found.get(ENTRY_POINT_GROUP, []))
+
+
+def findDriver(idn):
+    model = _model(idn)
+    if model in DRIVERS:
+        return DRIVERS[model]
+    # Only looked through when the model is not built in
+    for entry in _entryPoints():
+        if entry.name.strip().upper() == model:
+            module, attribute = entry.value.split(":")
+            registerDriver(model, module.strip(), attribute.strip())
+            return DRIVERS[model]
+    return None
+
+
+def loadDriver(idn):
+    driver = findDriver(idn)
+    if driver is None:
+        return None
+    module, attribute = driver
+    return getattr(importlib.import_module(module), attribute)
+
+
+def importTime(module):
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise ImportError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else module)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    for model, (module, attribute) in DRIVERS.items():
+        try:
+            print(f"{model}: {module}.{attribute} imports in {importTime(module):.3f} s")
+        except ImportError as e:
+            print(f"{model}: {module} does not import ({e})")
@@ -0,0 +1,471 @@
+"""
+Headless acquisition engine, records several instruments at once without the GUI
+
+Dependencies:
+    Python: version 3.8.18
+    pyvisa: version 1.14.1
+
+Classes:
+    EngineSample: one acquisition of one instrument
+        instrument: name the instrument was added with
+        index: tick the acquisition belongs to
+        scheduled: time the tick was due in nanoseconds since epoch
+        start, end: time the acquisition started and finished in nanoseconds since epoch
+        value: what the acquisition function returned (E36312A_Snapshot, HP3458A_Burst, number, ...), None if it failed
+        error: the error if the acquisition failed, otherwise None
+
+    EngineFrame: the samples of every instrument for one tick, frames are delivered in tick order
+        index: tick number since start()
+        scheduled: time the tick was due in nanoseconds since epoch
+        samples: dictionary of instrument name: EngineSample
+        missing: names of the instruments whose acquisition did not finish within frame_timeout
+        skipped: names of the instruments that were due but still busy with an earlier tick
+
+    BusWorker: Thread that runs the acquisitions of every instrument on one bus, one at a time, so instruments on a shared bus (one GPIB board) never talk at the
+    same time while separate buses run in parallel.
+        Constructor:
+            bus: bus name (see busKey())
+            report: function(EngineSample) called on the worker thread after every acquisition
+        Methods:
+            sample() - all parameters; description
+
+            submit() - instrument, SampleTick-like (index, scheduled); queues an acquisition, returns False if the instrument has not finished the last one yet
+            stop() - no parameters; runs the acquisitions already queued, then stops the thread
+            run() - no parameters; runs queued acquisitions until stopped, do not call directly, use start()
+
+    AcquisitionEngine: Opens several instruments through the shared SessionRegistry, ticks at a fixed drift-free period (deadline start + index * period, ticks
+    that are already over are skipped and counted like SamplingClock, see clock.py), gives every due instrument's acquisition to the worker of its bus and merges
+    the samples of each tick into one EngineFrame for the sinks.
+        Constructor:
+            period: time in seconds between ticks
+            registry: SessionRegistry the instruments are opened with (optional, the shared registry)
+            frame_timeout: time in seconds after its deadline a frame is delivered even if not every sample has arrived (optional, two periods by default)
+        Methods:
+            sample() - all parameters; description
+
+            add() - name, resource string, acquisition function(session) (optional, every = ticks between acquisitions, setup = function(session) run once after
+                    opening, settings = session attributes); adds an instrument, must be called before start()
+            addSink() - function(EngineFrame); calls the function with every frame, in tick order, on the engine's delivery thread
+            frames() - timeout (optional); generator of the frames from now on, ends when the engine stops or nothing arrives for timeout seconds
+            start() - no parameters; opens the instruments, starts one BusWorker per bus, the ticker and the delivery thread
+            stop() - no parameters; stops ticking, waits for the acquisitions that are running, delivers the frames that are left and stops the threads
+            stats() - no parameters; returns a dictionary: ticks, missed ticks, frames, incomplete frames (missing or skipped samples), and per instrument bus, samples, errors, overruns,
+                      mean and max acquisition time in milliseconds
+
+Methods:
+    sample() - all parameters; description
+
+    busKey() - resource string; returns the physical bus of the resource: the GPIB board (GPIB0), the serial port (COM3, /dev/ttyUSB0) or the resource itself for USB and
+               network instruments, which do not share their connection
+    encodeSample() - EngineSample, precision (optional); returns the line protocol lines of the sample (measurement = instrument name), E36312A_Snapshot gives one
+                     line per channel, HP3458A_Burst one line per reading, numbers one line with a value field
+    spoolSink() - TelemetrySpool; returns a sink that appends every sample of a frame to the spool (see spool.py), so a SpoolDrainer sends it to InfluxDB
+    columnarSink() - ColumnarSink; returns a sink that appends every sample of a frame to the Parquet files (see columnar.py), E36312A_Snapshots one row per
+                     channel, HP3458A_Burst one row per reading, numbers one row
+    captureSink() - dictionary of instrument name: CaptureWriter; returns a sink that appends every sample of a frame to the memory mapped capture file of its
+                    instrument (see capture.py), E36312A_Snapshots as voltage and current per channel, HP3458A_Burst every reading, numbers one record on
+                    channel <instrument>
+    e36312aAcquisition() - list of channel numbers (optional); returns the acquisition and setup functions that read the channels with measureAll()
+    hp3458aAcquisition() - number of readings, NPLC, range (optional); returns the acquisition and setup functions that take a burst of readings
+    main() - no parameters; command line, records the instruments given with --instrument to a spool folder, Parquet files and/or capture files, or prints
+             the frames
+
+    Note: Each instrument gets its own capture file. A burst can last longer than the period, so the next frame's samples of other instruments can be older
+    than its last reading, one file would not stay in time order (CaptureReader.read() relies on it).
+
+    Note: ACQUISITIONS maps a model to the function that builds its acquisition, the driver modules are only imported when an instrument of the model is added.
+    Usage: python engine.py --simulate --period 0.5 --duration 10 --instrument psu E36312A USB0::0x2A8D::0x1102::SIM00001::INSTR
+                            --instrument dmm HP3458A GPIB0::22::INSTR
+"""
+
+import argparse
+from collections import deque
+from dataclasses import dataclass, field
+import os
+import queue
+import re
+import statistics
+import threading
+import time
+from typing import Any, Dict, List
+
+from discovery import serialKey, serialPort
+from lineprotocol import encodePoint, encodeSnapshot
+from sessions import registry as sharedRegistry
+
+
+@dataclass
+class EngineSample:
+    instrument: str
+    index: int
+    scheduled: int
+    start: int
+    end: int
+    value: Any = None
+    error: Exception = None
+
+
+@dataclass
+class EngineFrame:
+    index: int
+    scheduled: int
+    samples: Dict[str, EngineSample] = field(default_factory=dict)
+    missing: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+
+
+@dataclass
+class _Instrument:
+    name: str
+    resource: str
+    acquire: Any
+    every: int = 1
+    setup: Any = None
+    settings: Dict[str, Any] = field(default_factory=dict)
+    session: Any = None
+    busy: bool = False
+    samples: int = 0
+    errors: int = 0
+    overruns: int = 0
+    durations: deque = field(default_factory=lambda: deque(maxlen=1000))
+
+
+@dataclass
+class _Tick:
+    index: int
+    scheduled: int
+
+
+def busKey(resource):
+    port = serialPort(resource)
+    if port is not None:
+        return serialKey(port)
+    match = re.match(r"GPIB(\d*)", resource.upper())
+    if match is None:
+        return resource
+    return "GPIB" + (match.group(1) or "0")
+
+
+class BusWorker(threading.Thread):
+    def __init__(self, bus, report):
+        super().__init__(name=f"BusWorker-{bus}", daemon=True)
+        self.bus = bus
+        self.report = report
+        self._requests = queue.Queue()
+        self._lock = threading.Lock()
+
+    def submit(self, instrument, tick):
+        with self._lock:
+            if instrument.busy:
+                instrument.overruns += 1
+                return False
+            instrument.busy = True
+        self._requests.put((instrument, tick))
+        return True
+
+    def stop(self):
+        self._requests.put(None)
+        self.join()
+
+    def run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+            instrument, tick = request
+            start = time.time_ns()
+            try:
+                sample = EngineSample(instrument.name, tick.index, tick.scheduled, start, 0, instrument.acquire(instrument.session))
+            except Exception as e:
+                print(f"{instrument.name}: {e}")
+                sample = EngineSample(instrument.name, tick.index, tick.scheduled, start, 0, error=e)
+            sample.end = time.time_ns()
+            with self._lock:
+                instrument.busy = False
+                if sample.error is None:
+                    instrument.samples += 1
+                    instrument.durations.append(sample.end - sample.start)
+                else:
+                    instrument.errors += 1
+            self.report(sample)
+
+
+class AcquisitionEngine:
+    def __init__(self, period=1.0, registry=None, frame_timeout=None):
+        self.period = period
+        self.registry = registry or sharedRegistry
+        self.frame_timeout = 2 * period if frame_timeout is None else frame_timeout
+        self._instruments = {}
+        self._workers = {}
+        self._sinks = []
+        self._streams = []
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._delivery = queue.Queue()
+        self._ticker = None
+        self._deliverer = None
+        self._counters = {"ticks": 0, "missed": 0, "frames": 0, "incomplete": 0}
+
+    def add(self, name, resource, acquire, every=1, setup=None, **settings):
+        if self._ticker is not None:
+            raise RuntimeError("Instruments must be added before start()")
+        self._instruments[name] = _Instrument(name, resource, acquire, every, setup, settings)
+
+    def addSink(self, sink):
+        self._sinks.append(sink)
+
+    def frames(self, timeout=None):
+        frames = queue.Queue()
+        self._streams.append(frames)
+        while True:
+            try:
+                frame = frames.get(timeout=timeout)
+            except queue.Empty:
+                return
+            if frame is None:
+                return
+            yield frame
+
+    def start(self):
+        for instrument in self._instruments.values():
+            instrument.session = self.registry.open(instrument.resource, **instrument.settings)
+            self.registry.claim(instrument.resource)
+            if instrument.setup is not None:
+                instrument.setup(instrument.session)
+            bus = busKey(instrument.resource)
+            if bus not in self._workers:
+                self._workers[bus] = BusWorker(bus, self._report)
+        for worker in self._workers.values():
+            worker.start()
+        self._deliverer = threading.Thread(target=self._deliver, name="AcquisitionEngine-delivery", daemon=True)
+        self._deliverer.start()
+        self._ticker = threading.Thread(target=self._tick, name="AcquisitionEngine-ticker", daemon=True)
+        self._ticker.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._ticker is not None:
+            self._ticker.join()
+        for worker in self._workers.values():
+            worker.stop()
+        with self._lock:
+            self._flush(force=True)
+        self._delivery.put(None)
+        if self._deliverer is not None:
+            self._deliverer.join()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats["instruments"] = {}
+        for instrument in self._instruments.values():
+            durations = [value / 1e6 for value in instrument.durations]
+            stats["instruments"][instrument.name] = {
+                "bus": busKey(instrument.resource),
+                "samples": instrument.samples,
+                "errors": instrument.errors,
+                "overruns": instrument.overruns,
+                "duration_mean_ms": statistics.mean(durations) if durations else 0.0,
+                "duration_max_ms": max(durations) if durations else 0.0,
+            }
+        return stats
+
+    def _tick(self):
+        period = int(round(self.period * 1e9))
+        start = time.monotonic_ns()
+        offset = time.time_ns() - start
+        index = 0
+        while True:
+            deadline = start + index * period
+            if self._stopping.wait(max(0, deadline - time.monotonic_ns()) / 1e9):
+                return
+            # Deadlines that are over by a full period are skipped, like SamplingClock
+            missed = (time.monotonic_ns() - deadline) // period
+            index += missed
+            tick = _Tick(index, start + index * period + offset)
+            with self._lock:
+                self._counters["ticks"] += 1
+                self._counters["missed"] += missed
+                frame = EngineFrame(tick.index, tick.scheduled)
+                due = [instrument for instrument in self._instruments.values() if tick.index % instrument.every == 0]
+                frame.missing = [instrument.name for instrument in due]
+                self._pending[tick.index] = frame
+            for instrument in due:
+                if not self._workers[busKey(instrument.resource)].submit(instrument, tick):
+                    # Still busy with an earlier tick, this tick has no sample of it
+                    with self._lock:
+                        frame.missing.remove(instrument.name)
+                        frame.skipped.append(instrument.name)
+            with self._lock:
+                self._flush()
+            index += 1
+
+    def _report(self, sample):
+        with self._lock:
+            frame = self._pending.get(sample.index)
+            # A frame that was delivered without this sample (frame_timeout) does not get it later
+            if frame is not None and sample.instrument in frame.missing:
+                frame.missing.remove(sample.instrument)
+                frame.samples[sample.instrument] = sample
+            self._flush()
+
+    def _flush(self, force=False):
+        # Frames leave in tick order, a frame waits for its samples until frame_timeout after its deadline
+        now = time.time_ns()
+        while self._pending:
+            index = min(self._pending)
+            frame = self._pending[index]
+            if frame.missing and not force and now - frame.scheduled < self.frame_timeout * 1e9:
+                break
+            del self._pending[index]
+            self._counters["frames"] += 1
+            if frame.missing or frame.skipped:
+                self._counters["incomplete"] += 1
+            self._delivery.put(frame)
+
+    def _deliver(self):
+        while True:
+            frame = self._delivery.get()
+            if frame is None:
+                for stream in self._streams:
+                    stream.put(None)
+                return
+            for sink in self._sinks + [stream.put for stream in self._streams]:
+                try:
+                    sink(frame)
+                except Exception as e:
+                    print(e)
+
+
+def encodeSample(sample, precision='ns'):
+    value = sample.value
+    if value is None:
+        return []
+    if hasattr(value, "readings") and hasattr(value, "timestamps"):
+        lines = []
+        for timestamp, reading in zip(value.timestamps, value.readings):
+            lines.append(encodePoint(sample.instrument, {}, {"value": float(reading)}, int(timestamp), precision))
+        return [line for line in lines if line is not None]
+    if hasattr(value, "readings"):
+        return encodeSnapshot(value, measurement=sample.instrument, precision=precision)
+    line = encodePoint(sample.instrument, {}, {"value": value}, sample.start, precision)
+    return [] if line is None else [line]
+
+
+def spoolSink(spool):
+    def sink(frame):
+        lines = []
+        for sample in frame.samples.values():
+            lines += encodeSample(sample, spool.precision)
+        spool.append(lines)
+    return sink
+
+
+def columnarSink(columnar):
+    def sink(frame):
+        for sample in frame.samples.values():
+            value = sample.value
+            if value is None:
+                continue
+            if hasattr(value, "readings") and hasattr(value, "timestamps"):
+                columnar.appendReadings(value.timestamps, value.readings, sample.instrument)
+            elif hasattr(value, "readings"):
+                columnar.appendSnapshots([value], sample.instrument)
+            else:
+                columnar.appendReadings([sample.start], [value], sample.instrument)
+    return sink
+
+
+def captureSink(writers):
+    def sink(frame):
+        for sample in frame.samples.values():
+            value = sample.value
+            writer = writers.get(sample.instrument)
+            if value is None or writer is None:
+                continue
+            if hasattr(value, "readings") and hasattr(value, "timestamps"):
+                writer.appendBurst(value, sample.instrument)
+            elif hasattr(value, "readings"):
+                writer.appendSnapshot(value, sample.instrument)
+            else:
+                writer.append([sample.start], writer.channelId(sample.instrument), [value])
+    return sink
+
+
+def e36312aAcquisition(chlist=(1, 2, 3)):
+    from E36312A import E36312A_Controls
+    controls = E36312A_Controls()
+    chlist = list(chlist)
+    return (lambda DPS: controls.measureAll(DPS, chlist)), None
+
+
+def hp3458aAcquisition(count=10, nplc=1, range=10):
+    from HP3458A import HP3458A_Controls
+    controls = HP3458A_Controls()
+    return (lambda DMM: controls.burst(DMM, count, range=range, nplc=nplc)), controls.configure
+
+
+ACQUISITIONS = {
+    "E36312A": e36312aAcquisition,
+    "HP3458A": hp3458aAcquisition,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Records several instruments at once, one worker per bus")
+    parser.add_argument("--instrument", nargs=3, action="append", metavar=("NAME", "MODEL", "RESOURCE"), required=True,
+                        help=f"instrument to record, MODEL is one of {', '.join(ACQUISITIONS)}")
+    parser.add_argument("--period", type=float, default=1.0, help="time in seconds between samples")
+    parser.add_argument("--duration", type=float, default=10.0, help="time in seconds to record")
+    parser.add_argument("--spool", default=None, help="folder of a spool to record to (see spool.py), the frames are printed without it")
+    parser.add_argument("--parquet", default=None, help="folder to record Parquet files to (see columnar.py)")
+    parser.add_argument("--capture", default=None, help="folder to record memory mapped capture files to, one per instrument (see capture.py)")
+    parser.add_argument("--simulate", action="store_true", help="use the simulated instruments (see simulated.py)")
+    args = parser.parse_args()
+
+    if args.simulate:
+        from simulated import SimulatedResourceManager
+        sharedRegistry.setResourceManager(SimulatedResourceManager())
+    engine = AcquisitionEngine(args.period)
+    for name, model, resource in args.instrument:
+        acquire, setup = ACQUISITIONS[model.upper()]()
+        engine.add(name, resource, acquire, setup=setup)
+    spool = None
+    columnar = None
+    captures = {}
+    if args.spool:
+        from spool import TelemetrySpool
+        # Burst readings are milliseconds apart, whole second timestamps would overwrite each other in InfluxDB
+        spool = TelemetrySpool(args.spool, precision='ns')
+        engine.addSink(spoolSink(spool))
+    if args.parquet:
+        from columnar import ColumnarSink
+        columnar = ColumnarSink(args.parquet)
+        engine.addSink(columnarSink(columnar))
+    if args.capture:
+        from capture import CaptureWriter
+        os.makedirs(args.capture, exist_ok=True)
+        captures = {name: CaptureWriter(os.path.join(args.capture, f"{name}.capture")) for name, model, resource in args.instrument}
+        engine.addSink(captureSink(captures))
+    if not args.spool and not args.parquet and not args.capture:
+        engine.addSink(lambda frame: print(frame.index, {name: round((sample.end - sample.start) / 1e6, 1) for name, sample in frame.samples.items()},
+                                           frame.missing, frame.skipped))
+    engine.start()
+    try:
+        time.sleep(args.duration)
+    except KeyboardInterrupt:
+        pass
+    engine.stop()
+    if spool is not None:
+        spool.close()
+    if columnar is not None:
+        columnar.close()
+    for capture in captures.values():
+        capture.close()
+    print(engine.stats())
+    sharedRegistry.closeAll()
+
+
+if __name__ == "__main__":
+    main()
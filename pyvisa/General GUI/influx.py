@@ -9,10 +9,13 @@ Classes:
             token: security token obtained from Influx
             org: set organization on Influx
             bucket: bucket to write data to in Influx
+            url: address of the InfluxDB server (optional)
         Methods:
             sample() - all parameters; description
 
             write_data() - data to write; writes data to InfluxDB based on the bucket in the constructor, logs successful and failed writes
+            write_batch() - list of line protocol strings, precision; writes all lines in one request, raises the error if the write fails
+            close() - no parameters; closes the connection to InfluxDB
 """
 
 #sleep configured in GUI to enable adjustment of frequency during recording
@@ -20,22 +23,37 @@ Classes:
 
 from influxdb_client.client.write_api import SYNCHRONOUS
 from influxdb_client import InfluxDBClient
-#from time import sleep
 import logging
-from influxdb_client import InfluxDBClient
+
+INFLUX_URL = "http://bragi.caltech.edu:8086"
 
 
 class InfluxClient:
-    def __init__(self, token, org, bucket): 
-        self._org = org 
+    def __init__(self, token, org, bucket, url=INFLUX_URL):
+        self._org = org
         self._bucket = bucket
-        self._client = InfluxDBClient(url="http://bragi.caltech.edu:8086", token=token)
+        self._client = InfluxDBClient(url=url, token=token)
+        self._write_apis = {}
+
+    def _write_api(self, write_option):
+        # Creating a write_api per call is slow, keep one per write option
+        if write_option not in self._write_apis:
+            self._write_apis[write_option] = self._client.write_api(write_option)
+        return self._write_apis[write_option]
 
-    def write_data(self, data, write_option=SYNCHRONOUS):
-        write_api = self._client.write_api(write_option)
+    def write_data(self, data, write_option=SYNCHRONOUS, precision='s'):
+        write_api = self._write_api(write_option)
         try:
-            write_api.write(self._bucket, self._org, data, write_precision='s')
+            write_api.write(self._bucket, self._org, data, write_precision=precision)
             logging.info('Data written successfully')
         except Exception as e:
             logging.error(f'Failed to write data: {e}')
-            #sleep(1000)
\ No newline at end of file
+
+    def write_batch(self, lines, precision='s'):
+        self._write_api(SYNCHRONOUS).write(self._bucket, self._org, "\n".join(lines), write_precision=precision)
+
+    def close(self):
+        for write_api in self._write_apis.values():
+            write_api.close()
+        self._client.close()
+
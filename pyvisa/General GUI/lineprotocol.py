@@ -0,0 +1,87 @@
+"""
+Dependencies:
+    Python: version 3.8.18
+
+No Classes
+
+Methods:
+    sample() - all parameters; description
+
+    escapeMeasurement() - measurement name; escapes commas and spaces
+    escapeKey() - tag key, tag value or field key; escapes commas, equal signs and spaces
+    formatField() - field value; formats a bool, int, float or string as a line protocol field value, returns None for values InfluxDB cannot store (NaN, infinity)
+    convertTimestamp() - timestamp in nanoseconds, precision ('s', 'ms', 'us', 'ns'); returns the timestamp in the precision
+    encodePoint() - measurement, dictionary of tags, dictionary of fields, timestamp in nanoseconds, precision; returns one line of line protocol, None if there are no fields
+    encodeSnapshot() - E36312A_Snapshot, measurement, precision, output only (optional); returns one line per channel with voltage, current, power and output state fields,
+                       if output only is True channels that are turned off are skipped
+
+    Note: Timestamps are always passed in as integer nanoseconds (time.time_ns()) and converted, so no precision is lost before the point is encoded.
+"""
+
+import math
+
+PRECISION_DIVISORS = {'s': 1000000000, 'ms': 1000000, 'us': 1000, 'ns': 1}
+
+_MEASUREMENT_ESCAPES = str.maketrans({",": "\\,", " ": "\\ ", "\n": "\\n"})
+_KEY_ESCAPES = str.maketrans({",": "\\,", "=": "\\=", " ": "\\ ", "\n": "\\n"})
+
+
+def escapeMeasurement(measurement):
+    return str(measurement).translate(_MEASUREMENT_ESCAPES)
+
+
+def escapeKey(key):
+    return str(key).translate(_KEY_ESCAPES)
+
+
+def formatField(value):
+    # bool first, it is a subclass of int
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return f"{value}i"
+    if isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):
+            return None
+        return repr(value)
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+def convertTimestamp(timestamp, precision='ns'):
+    return int(timestamp) // PRECISION_DIVISORS[precision]
+
+
+def encodePoint(measurement, tags, fields, timestamp=None, precision='ns'):
+    line = escapeMeasurement(measurement)
+    for key in sorted(tags):
+        if tags[key] is not None and tags[key] != "":
+            line += f",{escapeKey(key)}={escapeKey(tags[key])}"
+    encoded = []
+    for key, value in fields.items():
+        value = formatField(value)
+        if value is not None:
+            encoded.append(f"{escapeKey(key)}={value}")
+    if not encoded:
+        return None
+    line += " " + ",".join(encoded)
+    if timestamp is not None:
+        line += f" {convertTimestamp(timestamp, precision)}"
+    return line
+
+
+def encodeSnapshot(snapshot, measurement="E36312A", precision='ns', output_only=False):
+    lines = []
+    for reading in snapshot.readings:
+        if output_only and not reading.output:
+            continue
+        fields = {
+            "voltage": reading.voltage,
+            "current": reading.current,
+            "power": reading.power,
+            "output": reading.output,
+        }
+        line = encodePoint(measurement, {"Channel": reading.channel}, fields, snapshot.timestamp, precision)
+        if line is not None:
+            lines.append(line)
+    return lines
@@ -0,0 +1,193 @@
+"""
+Dependencies:
+    Python: version 3.8.18
+    numpy: version 1.24.4
+    pyside6: version 6.6.2
+
+Classes:
+    LivePlot: Live plot of the voltage, current and power of every channel, drawn with QPainter in three panes that share the time axis. The newest samples of
+    each channel are kept in a RingBuffer (see ringbuffer.py), so memory use is fixed by capacity. Appending a sample only marks the plot as changed, a timer
+    redraws it at most every refresh seconds, so a fast acquisition does not redraw the window for every sample. The time span is divided into one column per
+    pixel, each keeping the minimum and maximum of its samples (decimate()), a redraw only adds the samples that arrived since the last one and draws the
+    columns, so its cost depends on the width of the plot and not on the number of samples, and short spikes stay visible. The columns are rebuilt from the
+    ring buffers when the span or the width changes.
+        Constructor:
+            channels: list of channel numbers
+            capacity: number of samples kept per channel
+            span: time in seconds shown, ending at the newest sample
+            refresh: time in seconds between redraws
+        Methods:
+            sample() - all parameters; description
+
+            appendSnapshot() - E36312A_Snapshot, channel number (optional, all channels of the snapshot by default); adds the readings to the plot
+            appendSnapshots() - list of E36312A_Snapshots; adds the readings of every snapshot to the plot
+            setSpan() - time in seconds; changes the time shown
+            clear() - no parameters; removes every sample
+            stats() - no parameters; returns a dictionary: samples, dropped (older than the newest sample of the channel), redraws, draw time in milliseconds
+
+    Note: Samples are expected in time order per channel, a sample that is not newer than the last one of its channel is dropped (the same measurement
+    delivered to several subscribers, data logger records that arrive after a newer poll).
+
+Methods:
+    sample() - all parameters; description
+
+    decimate() - timestamps in nanoseconds (sorted), values (one row per timestamp), column width in nanoseconds; returns the column number (timestamp // width),
+                 minimum and maximum of every column that has samples
+"""
+
+import math
+import time
+
+import numpy as np
+
+#Pyside6 imports
+from PySide6.QtWidgets import QWidget
+from PySide6.QtCore import QPointF, QRectF, QTimer, Qt
+from PySide6.QtGui import QColor, QPainter, QPen
+
+from ringbuffer import RingBuffer
+
+# Pane title and unit, in the order of the columns of the ring buffers
+PANES = (("Voltage", "V"), ("Current", "A"), ("Power", "W"))
+# Same colours as the channel widgets, darker so they show on white
+COLORS = {1: QColor(190, 150, 0), 2: QColor(0, 128, 0), 3: QColor(0, 0, 255)}
+MARGIN = 4
+TEXT_HEIGHT = 14
+
+
+def decimate(timestamps, values, width):
+    columns = timestamps // width
+    # Timestamps are sorted, so each column is one run of samples
+    runs = np.concatenate(([0], np.flatnonzero(np.diff(columns)) + 1))
+    return columns[runs], np.minimum.reduceat(values, runs, axis=0), np.maximum.reduceat(values, runs, axis=0)
+
+
+class LivePlot(QWidget):
+    def __init__(self, channels=(1, 2, 3), capacity=100000, span=60.0, refresh=0.1, parent=None):
+        super().__init__(parent)
+        self.channels = list(channels)
+        self.capacity = capacity
+        self.span = span
+        self._dropped = 0
+        self._redraws = 0
+        self._drawTime = 0
+        self.clear()
+        self.setMinimumSize(320, 360)
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._redraw)
+        self._timer.start(int(refresh * 1000))
+
+    def appendSnapshot(self, snapshot, ch=None):
+        readings = snapshot.readings if ch is None else [snapshot.channel(ch)]
+        for reading in readings:
+            if reading is None or reading.channel not in self._buffers:
+                continue
+            if snapshot.timestamp <= self._last[reading.channel]:
+                self._dropped += 1
+                continue
+            self._buffers[reading.channel].write([(reading.voltage, reading.current, reading.power)], [snapshot.timestamp])
+            self._last[reading.channel] = snapshot.timestamp
+            self._changed = True
+
+    def appendSnapshots(self, snapshots):
+        for snapshot in snapshots:
+            self.appendSnapshot(snapshot)
+
+    def setSpan(self, span):
+        self.span = span
+        self._changed = True
+
+    def clear(self):
+        # One row of voltage, current and power per sample
+        self._buffers = {ch: RingBuffer(self.capacity, dtype=np.dtype((np.float64, len(PANES)))) for ch in self.channels}
+        self._last = {ch: 0 for ch in self.channels}
+        self._layout = None
+        self._changed = True
+
+    def stats(self):
+        return {
+            "samples": sum(buffer.stats()["size"] for buffer in self._buffers.values()),
+            "dropped": self._dropped,
+            "redraws": self._redraws,
+            "draw_ms": self._drawTime / 1e6,
+        }
+
+    def _redraw(self):
+        # Throttled, however many samples arrived since the last redraw
+        if self._changed and self.isVisible():
+            self._changed = False
+            self.update()
+
+    def _updateColumns(self, width):
+        columnWidth = max(1, math.ceil(self.span * 1e9 / width))
+        if self._layout != (width, columnWidth):
+            # Span or size changed, the columns are rebuilt from everything in the ring buffers
+            self._layout = (width, columnWidth)
+            self._columns = {ch: np.full(width, -1, dtype=np.int64) for ch in self._buffers}
+            self._lows = {ch: np.zeros((width, len(PANES))) for ch in self._buffers}
+            self._highs = {ch: np.zeros((width, len(PANES))) for ch in self._buffers}
+            self._positions = {ch: max(0, buffer.position() - self.capacity) for ch, buffer in self._buffers.items()}
+        for ch, buffer in self._buffers.items():
+            timestamps, values, self._positions[ch], lost = buffer.read(self._positions[ch])
+            if len(timestamps) == 0:
+                continue
+            columns, lows, highs = decimate(timestamps, values, columnWidth)
+            keep = columns > columns[-1] - width
+            columns, lows, highs = columns[keep], lows[keep], highs[keep]
+            # Each column has a slot, a slot holding an older column starts over
+            slots = columns % width
+            fresh = (self._columns[ch][slots] != columns)[:, None]
+            self._lows[ch][slots] = np.where(fresh, lows, np.minimum(self._lows[ch][slots], lows))
+            self._highs[ch][slots] = np.where(fresh, highs, np.maximum(self._highs[ch][slots], highs))
+            self._columns[ch][slots] = columns
+        return columnWidth
+
+    def paintEvent(self, event):
+        started = time.perf_counter_ns()
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        width = max(1, self.width() - 2 * MARGIN)
+        height = (self.height() - TEXT_HEIGHT) / len(PANES)
+        columnWidth = self._updateColumns(width)
+
+        series = {}
+        end = max(self._last.values(), default=0)
+        if end:
+            shown = np.arange(end // columnWidth - width + 1, end // columnWidth + 1)
+            for ch in self._buffers:
+                slots = shown % width
+                valid = self._columns[ch][slots] == shown
+                if valid.any():
+                    series[ch] = (np.flatnonzero(valid), self._lows[ch][slots[valid]], self._highs[ch][slots[valid]])
+
+        for pane, (title, unit) in enumerate(PANES):
+            area = QRectF(MARGIN, pane * height + TEXT_HEIGHT, width, height - TEXT_HEIGHT - MARGIN)
+            painter.setPen(Qt.lightGray)
+            painter.drawRect(area)
+            if series:
+                low = min(float(lows[:, pane].min()) for x, lows, highs in series.values())
+                high = max(float(highs[:, pane].max()) for x, lows, highs in series.values())
+                if high - low < 1e-9:
+                    low, high = low - 0.5, high + 0.5
+                # Keep the extremes off the frame
+                padding = 0.05 * (high - low)
+                low, high = low - padding, high + padding
+                scale = area.height() / (high - low)
+                for ch, (x, lows, highs) in series.items():
+                    # Maximum then minimum of every column, one line that covers the whole range of each column
+                    points = np.empty((2 * len(x), 2))
+                    points[:, 0] = np.repeat(area.left() + x, 2)
+                    points[0::2, 1] = area.bottom() - (highs[:, pane] - low) * scale
+                    points[1::2, 1] = area.bottom() - (lows[:, pane] - low) * scale
+                    painter.setPen(QPen(COLORS.get(ch, Qt.black), 1))
+                    painter.drawPolyline([QPointF(px, py) for px, py in points.tolist()])
+                painter.setPen(Qt.darkGray)
+                painter.drawText(area.adjusted(2, 0, -2, 0), Qt.AlignRight | Qt.AlignTop, f"{high:.4g} {unit}")
+                painter.drawText(area.adjusted(2, 0, -2, 0), Qt.AlignRight | Qt.AlignBottom, f"{low:.4g} {unit}")
+            painter.setPen(Qt.black)
+            painter.drawText(QPointF(MARGIN, pane * height + TEXT_HEIGHT - 2), title)
+
+        painter.drawText(QRectF(0, 0, self.width() - MARGIN, TEXT_HEIGHT), Qt.AlignRight, f"last {self.span:g} s")
+        painter.end()
+        self._redraws += 1
+        self._drawTime = time.perf_counter_ns() - started
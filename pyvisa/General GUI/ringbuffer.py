@@ -0,0 +1,111 @@
+"""
+Dependencies:
+    Python: version 3.8.18
+    numpy: version 1.24.4
+
+Classes:
+    RingBuffer: Preallocated buffer of the newest readings and their timestamps, one writer (e.g. HP3458A_Stream) and any number of readers. Memory use is fixed
+    by capacity no matter how long the run is, when it is full the oldest readings are overwritten.
+        Constructor:
+            capacity: number of readings kept
+            dtype: NumPy type of the readings (optional)
+        Methods:
+            sample() - all parameters; description
+
+            write() - readings, timestamps in nanoseconds since epoch; adds the readings, overwrites the oldest when full, wakes up waiting readers
+            read() - position, maximum number of readings (optional); returns timestamps, readings, next position, number of readings lost because the reader fell
+                     more than capacity behind (copies, safe to keep)
+            chunks() - position (optional, newest by default), maximum number of readings per chunk (optional), timeout (optional); generator of (timestamps, readings)
+                       as they are written, ends when the buffer is closed and everything was read, or when nothing arrives for timeout seconds
+            latest() - number of readings; returns the timestamps and readings of the newest readings
+            position() - no parameters; returns the position after the newest reading, pass it to read() or chunks() to only get readings written later
+            close() - no parameters; marks the end of the data, readers finish what is left and stop
+            stats() - no parameters; returns a dictionary of counters: capacity, size, written, lost
+
+    Note: A position counts every reading ever written, so each reader keeps its own place and readers do not affect each other or the writer.
+    Example: for timestamps, readings in buffer.chunks(): writer.write(...)
+"""
+
+import threading
+
+import numpy as np
+
+
+class RingBuffer:
+    def __init__(self, capacity, dtype=np.float64):
+        self.capacity = capacity
+        self._readings = np.empty(capacity, dtype=dtype)
+        self._timestamps = np.empty(capacity, dtype=np.int64)
+        self._written = 0
+        self._lost = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def write(self, readings, timestamps):
+        readings = np.asarray(readings)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        with self._condition:
+            count = len(readings)
+            if count > self.capacity:
+                # Only the newest readings fit
+                self._written += count - self.capacity
+                readings = readings[-self.capacity:]
+                timestamps = timestamps[-self.capacity:]
+                count = self.capacity
+            start = self._written % self.capacity
+            first = min(count, self.capacity - start)
+            self._readings[start:start + first] = readings[:first]
+            self._timestamps[start:start + first] = timestamps[:first]
+            self._readings[:count - first] = readings[first:]
+            self._timestamps[:count - first] = timestamps[first:]
+            self._written += count
+            self._condition.notify_all()
+
+    def read(self, position, count=None):
+        with self._condition:
+            oldest = max(0, self._written - self.capacity)
+            lost = max(0, oldest - position)
+            self._lost += lost
+            position = max(position, oldest)
+            end = self._written if count is None else min(self._written, position + count)
+            timestamps, readings = self._copy(position, end)
+        return timestamps, readings, end, lost
+
+    def chunks(self, position=None, count=None, timeout=None):
+        if position is None:
+            position = self.position()
+        while True:
+            with self._condition:
+                arrived = self._condition.wait_for(lambda: self._written > position or self._closed, timeout)
+                if not arrived or (self._closed and self._written <= position):
+                    return
+            timestamps, readings, position, lost = self.read(position, count)
+            yield timestamps, readings
+
+    def latest(self, count):
+        with self._condition:
+            end = self._written
+            return self._copy(max(0, end - min(count, self.capacity)), end)
+
+    def position(self):
+        with self._condition:
+            return self._written
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            return {
+                "capacity": self.capacity,
+                "size": min(self._written, self.capacity),
+                "written": self._written,
+                "lost": self._lost,
+            }
+
+    def _copy(self, start, end):
+        # Positions to indices, the range can wrap around the end of the arrays
+        indices = np.arange(start, end) % self.capacity
+        return self._timestamps[indices], self._readings[indices]
@@ -0,0 +1,93 @@
+"""
+Dependencies:
+    Python: version 3.8.18
+    pyside6: version 6.6.2
+
+Classes:
+    PollScheduler: One timer for every periodic read of an instrument. Widgets subscribe to the items they display instead of owning timers. On every tick the items
+    that are due are collected into a single poll plan (each item only once, no matter how many subscribers), the plan is run on the acquisition worker and the
+    results are sent to the subscribers.
+        Constructor:
+            worker: AcquisitionWorker that owns the instrument
+            poll: function(device, items) run on the worker, returns a dictionary of item: value (see E36312A_Controls.poll())
+            tick: time in seconds between checks for due items
+        Methods:
+            sample() - all parameters; description
+
+            subscribe() - item, callback, period in seconds; calls callback with the value of the item every period, returns a handle for unsubscribe()
+            unsubscribe() - handle or list of handles; stops the subscriptions
+            start() - no parameters; starts polling
+            stop() - no parameters; stops polling
+            duePlan() - no parameters; returns the items that are due this tick
+            tick() - no parameters; submits the due items to the worker
+
+    Note: If the previous plan is still running on the worker when the next tick comes, the tick is skipped.
+"""
+
+import itertools
+import time
+
+#Pyside6 imports
+from PySide6.QtCore import QObject, QTimer
+
+
+class PollScheduler(QObject):
+    def __init__(self, worker, poll, tick=0.1, parent=None):
+        super().__init__(parent)
+        self.worker = worker
+        self.poll = poll
+        self._subscribers = {}
+        self._lastPolled = {}
+        self._handles = itertools.count()
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.tick)
+        self._tick = tick
+
+    def subscribe(self, item, callback, period=1.0):
+        handle = next(self._handles)
+        self._subscribers.setdefault(item, {})[handle] = (callback, period)
+        return (item, handle)
+
+    def unsubscribe(self, handles):
+        if isinstance(handles, tuple):
+            handles = [handles]
+        for item, handle in handles:
+            subscribers = self._subscribers.get(item, {})
+            subscribers.pop(handle, None)
+            if not subscribers:
+                self._subscribers.pop(item, None)
+                self._lastPolled.pop(item, None)
+
+    def start(self):
+        self._timer.start(int(self._tick * 1000))
+
+    def stop(self):
+        self._timer.stop()
+
+    def duePlan(self):
+        now = time.monotonic()
+        plan = []
+        for item, subscribers in self._subscribers.items():
+            period = min(period for callback, period in subscribers.values())
+            if now - self._lastPolled.get(item, float("-inf")) >= period:
+                plan.append(item)
+        return plan
+
+    def tick(self):
+        plan = self.duePlan()
+        if not plan:
+            return
+        if self.worker.submit(self.poll, plan, key="poll", callback=self._dispatch):
+            now = time.monotonic()
+            for item in plan:
+                self._lastPolled[item] = now
+
+    def _dispatch(self, results):
+        for item, value in results.items():
+            # Copy, a callback can unsubscribe (channel rebuilt)
+            for callback, period in list(self._subscribers.get(item, {}).values()):
+                try:
+                    callback(value)
+                except RuntimeError:
+                    # Widget was deleted before the result arrived
+                    pass
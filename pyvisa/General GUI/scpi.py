@@ -0,0 +1,224 @@
+"""
+Dependencies:
+    Python: version 3.8.18
+
+Classes:
+    Command: one command of an instrument, declared once in the instrument's COMMANDS table
+        name: name the command is used by (set(), get(), getMany())
+        write: SCPI template to set it, fields in braces (e.g. "VOLT {value}, (@{ch})"), None if it can only be read
+        query: SCPI template to read it (e.g. "VOLT? (@{ch})"), None if it can only be written
+        parse: function that converts one answer (or one element of the answer when a field is a channel list) to a value
+        validate: dictionary of field: allowed values (list) or function(value) returning True if the value is allowed
+        cached: if True, written and read values are kept in the cache and reads are answered from it while they are fresh
+        invalidates: names of the commands whose cached values are cleared when it is written, "*" for all of them
+
+    SCPIInstrument: Base class for instrument controls. Subclasses declare COMMANDS, the templates and validation are compiled once when the class is created,
+    every call only fills in the fields.
+        Constructor:
+            staleness: time in seconds a cached value is used before it is read from the instrument again
+        Methods:
+            sample() - all parameters; description
+
+            cached() - cache key; returns the cached value if it is newer than staleness, otherwise None
+            store() - cache key, value; stores the value in the cache
+            invalidate() - command names (optional); removes their cached values, removes everything if no names are given
+            peek() - command name, fields; returns the cached value of the command, None if it is not cached or not fresh
+            check() - command name, fields; returns True if the fields are allowed, otherwise prints why and returns False
+            set() - reference to instrument, command name, value (optional), fields; writes the command, returns what device.write returns, None if a field is not allowed
+            get() - reference to instrument, command name, fields; returns the parsed answer (from the cache if it is fresh), None if a field is not allowed
+            getMany() - reference to instrument, list of (command name, dictionary of fields); reads everything that is not cached in one chained query, returns the values in order
+
+    Note: A field that is a list of channels is written as a channel list (1:3 or 1,3). Its answer is split at the commas and parsed per channel, the values of
+    cached commands are stored per channel. Reads with a channel list always go to the instrument, reads of one channel can come from the cache.
+    Note: The cached value of a write is the written value passed through parse, so it has the same form as a read.
+
+Methods:
+    sample() - all parameters; description
+
+    channelList() - list of channel numbers; returns the channel list without (@ ), 1:3 for a contiguous range
+    parseBool() - answer; returns True for 1 or ON
+    parseLine() - answer; returns the answer ending in a newline, the form DPS.query() returns
+"""
+
+from dataclasses import dataclass
+from string import Formatter
+import threading
+import time
+
+
+def channelList(chlist):
+    chlist = sorted(int(ch) for ch in chlist)
+    if len(chlist) > 1 and chlist == list(range(chlist[0], chlist[-1] + 1)):
+        return f"{chlist[0]}:{chlist[-1]}"
+    return ",".join(str(ch) for ch in chlist)
+
+
+def parseBool(text):
+    return text.strip().upper() in ("1", "ON")
+
+
+def parseLine(text):
+    return text.strip() + "\n"
+
+
+@dataclass(frozen=True)
+class Command:
+    name: str
+    write: str = None
+    query: str = None
+    parse: object = str.strip
+    validate: dict = None
+    cached: bool = False
+    invalidates: object = ()
+
+
+@dataclass
+class _Compiled:
+    command: Command
+    fields: tuple
+    checks: tuple
+
+
+def _fields(template):
+    if template is None:
+        return ()
+    return tuple(field for literal, field, spec, conversion in Formatter().parse(template) if field)
+
+
+def _check(allowed):
+    if callable(allowed):
+        return allowed
+    allowed = frozenset(str(value) for value in allowed)
+    return lambda value: str(value).upper() in allowed or str(value) in allowed
+
+
+class SCPIInstrument:
+    COMMANDS = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._commands = {}
+        for command in cls.COMMANDS:
+            checks = tuple((field, _check(allowed)) for field, allowed in (command.validate or {}).items())
+            fields = tuple(dict.fromkeys(_fields(command.write) + _fields(command.query)))
+            cls._commands[command.name] = _Compiled(command, fields, checks)
+
+    def __init__(self, staleness=5.0):
+        self.staleness = staleness
+        self._cache = {}
+        self._cacheLock = threading.Lock()
+
+    def cached(self, key):
+        with self._cacheLock:
+            entry = self._cache.get(key)
+        if entry is not None and time.monotonic() - entry[1] <= self.staleness:
+            return entry[0]
+        return None
+
+    def store(self, key, value):
+        with self._cacheLock:
+            self._cache[key] = (value, time.monotonic())
+
+    def invalidate(self, *names):
+        with self._cacheLock:
+            if not names:
+                self._cache.clear()
+            for key in [key for key in self._cache if key[0] in names]:
+                del self._cache[key]
+
+    def peek(self, name, **fields):
+        return self.cached(self._key(self._commands[name], fields))
+
+    def check(self, name, **fields):
+        for field, allowed in self._commands[name].checks:
+            if field not in fields:
+                continue
+            values = fields[field] if isinstance(fields[field], (list, tuple)) else [fields[field]]
+            for value in values:
+                if not allowed(value):
+                    print(f"Invalid {field} for {name}: {value}")
+                    return False
+        return True
+
+    def set(self, device, name, value=None, **fields):
+        compiled = self._commands[name]
+        command = compiled.command
+        fields["value"] = value
+        if not self.check(name, **fields):
+            return None
+        written = device.write(command.write.format(**self._format(fields)))
+        if command.invalidates == "*":
+            self.invalidate()
+        elif command.invalidates:
+            self.invalidate(*command.invalidates)
+        if command.cached and value is not None:
+            stored = command.parse(str(self._format(fields)["value"]))
+            for key in self._keys(compiled, fields):
+                self.store(key, stored)
+        return written
+
+    def get(self, device, name, **fields):
+        return self.getMany(device, [(name, fields)])[0]
+
+    def getMany(self, device, requests):
+        results = [None] * len(requests)
+        pending = []
+        for index, (name, fields) in enumerate(requests):
+            compiled = self._commands[name]
+            if not self.check(name, **fields):
+                continue
+            if compiled.command.cached and not self._listField(fields):
+                results[index] = self.cached(self._key(compiled, fields))
+                if results[index] is not None:
+                    continue
+            pending.append(index)
+        if not pending:
+            return results
+
+        queries = []
+        for index in pending:
+            name, fields = requests[index]
+            queries.append(self._commands[name].command.query.format(**self._format(fields)))
+        parts = device.query(";:".join(queries)).strip().split(";")
+        for index, part in zip(pending, parts):
+            name, fields = requests[index]
+            compiled = self._commands[name]
+            if self._listField(fields):
+                results[index] = [compiled.command.parse(value) for value in part.split(",")]
+                if compiled.command.cached:
+                    for key, value in zip(self._keys(compiled, fields), results[index]):
+                        self.store(key, value)
+            else:
+                results[index] = compiled.command.parse(part)
+                if compiled.command.cached:
+                    self.store(self._key(compiled, fields), results[index])
+        return results
+
+    def _format(self, fields):
+        formatted = {}
+        for field, value in fields.items():
+            if isinstance(value, (list, tuple)):
+                value = channelList(value)
+            elif isinstance(value, bool):
+                value = int(value)
+            formatted[field] = value
+        return formatted
+
+    def _listField(self, fields):
+        for field, value in fields.items():
+            if isinstance(value, (list, tuple)):
+                return field
+        return None
+
+    def _key(self, compiled, fields):
+        return (compiled.command.name,) + tuple(str(fields.get(field)) for field in compiled.fields if field != "value")
+
+    def _keys(self, compiled, fields):
+        # One key per channel of a channel list
+        listField = self._listField(fields)
+        if listField is None:
+            return [self._key(compiled, fields)]
+        keys = []
+        for value in sorted(int(value) for value in fields[listField]):
+            keys.append(self._key(compiled, dict(fields, **{listField: value})))
+        return keys
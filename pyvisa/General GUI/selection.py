@@ -9,35 +9,54 @@ Classes:
     DeviceSelectionGUI: Creates the GUI for the selection screen. Allows user to select a device that is currently connected via Pyvisa or Pyserial. Users must click the
     corresponding button to display devices via Pyvisa or Pyserial (the two are separated because of code differences in establishing connections).
         Constructor:
-            no parameters
+            visa_timeout: time in milliseconds to wait for a Pyvisa resource to answer (optional)
+            serial_timeout: time in seconds to wait for a serial device to answer at each baud rate (optional)
+            workers: maximum number of devices probed at the same time (optional)
+            cache_ttl: time in seconds the discovery cache is trusted (optional)
+            shown: function called once the window is on screen (optional)
         Methods:
             sample() - all parameters; description
 
-            selectIndex() - no parameters; stores selected index and matches it to the device, terminates connection to all devices except for one selected (at least it should)
+            selectIndex() - no parameters; stores selected index and matches it to the device, stores the identification of the device in selected_idn,
+                            keeps the session of the selected device open in the session registry and closes all other sessions
             wait() - no parameters; constantly passes to simulate waiting, used to solve issue of GUI immediately closing, waits until the user selects a device before closing
-            fillSelection() - array of devices (either Pyvisa or Pyserial); connects to and displays the identification of every available device, Pyvisa and Pyserial are separate because of code differences during connection
-                              Note: Serial connections are scanned for using all connected COM ports and the 9 most common BAUD numbers
+            fillSelection() - type of devices ("PyVisa" or "PySerial"); displays the identification of every device of that type found so far, devices found later are added as they answer
+            showDevice() - DiscoveredDevice; adds the device to the list
+            addDevice() - kind, resource, DiscoveredDevice; stores the result of one probe, displays it if devices of that kind are shown
+            updateStatus() - no parameters; displays how many devices are still being probed
+                              Note: All Pyvisa resources and serial ports are probed at the same time in the background as soon as the window opens (see discovery.py),
+                              serial ports are scanned using all connected COM ports and the 9 most common BAUD numbers
+                              Note: Identifications and baud rates are cached in discovery_cache.json, a cached device only needs one query to be verified
 """
 
-from PySide6.QtWidgets import QApplication, QPushButton, QVBoxLayout, QWidget, QMessageBox, QListWidget
-from PySide6.QtCore import QTimer
-import serial
+from PySide6.QtWidgets import QApplication, QPushButton, QVBoxLayout, QWidget, QMessageBox, QListWidget, QLabel
+from PySide6.QtCore import QTimer, QObject, Signal
 import serial.tools.list_ports
 
-import pyvisa
-from pyvisa.errors import VisaIOError
-import time
+import os
+
+from sessions import registry
+from discovery import DeviceProber, DiscoveryCache
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "discovery_cache.json")
+
+
+class DiscoverySignals(QObject):
+    # Emitted from the probing threads, received on the GUI thread
+    found = Signal(str, str, object)
+
 
 class DeviceSelectionGUI:
-    def __init__(self):
+    def __init__(self, visa_timeout=1000, serial_timeout=0.3, workers=16, cache_ttl=7 * 24 * 3600, shown=None):
         self.selected_device = None
+        self.selected_idn = None
         self.selected_type = ""
-        self.rm = pyvisa.ResourceManager()
+        self.rm = registry.resourceManager()
         self.PyVisaIds = list(self.rm.list_resources())
-        self.PySerialIds = []
-        self.serialMap = {}
-        self.allDevices = []
-        self.deleteIndex = []
+        self.serialPorts = list(serial.tools.list_ports.comports())
+        self.found = {"PyVisa": [], "PySerial": []}
+        self.shown = []
+        self.remaining = len(self.PyVisaIds) + len(self.serialPorts)
 
         self.app = QApplication.instance()
         if self.app is None:
@@ -52,55 +71,54 @@ class DeviceSelectionGUI:
 
         self.Lb = QListWidget()
         self.max_length = 0
-
-        for i in range(len(self.PyVisaIds)):
-            try:
-                device = self.rm.open_resource(self.PyVisaIds[i])
-                device.query("*IDN?")
-                self.allDevices.append(device)
-            except VisaIOError:
-                self.deleteIndex.append(i)
-
-        for i in range(len(self.deleteIndex) - 1, -1, -1):
-            self.PySerialIds.insert(0, self.PyVisaIds[self.deleteIndex[i]])
-            del self.PyVisaIds[self.deleteIndex[i]]
-
         self.Lb.setMinimumWidth(self.max_length * 8)
         self.layout.addWidget(self.Lb)
 
+        self.statusLabel = QLabel()
+        self.layout.addWidget(self.statusLabel)
+        self.updateStatus()
+
         self.btn_show_index = QPushButton("Select Device")
         self.btn_show_index.clicked.connect(self.selectIndex)
         self.layout.addWidget(self.btn_show_index)
 
         self.btn_select_pyvisa = QPushButton("Show PyVisa Devices")
-        self.btn_select_pyvisa.clicked.connect(lambda: self.fillSelection(self.PyVisaIds))
+        self.btn_select_pyvisa.clicked.connect(lambda: self.fillSelection("PyVisa"))
         self.layout.addWidget(self.btn_select_pyvisa)
 
         self.btn_select_pyserial = QPushButton("Show PySerial Devices")
-        self.btn_select_pyserial.clicked.connect(lambda: self.fillSelection(self.PySerialIds))
+        self.btn_select_pyserial.clicked.connect(lambda: self.fillSelection("PySerial"))
         self.layout.addWidget(self.btn_select_pyserial)
 
         self.main.setLayout(self.layout)
         self.main.show()
+        if shown is not None:
+            QTimer.singleShot(0, shown)
+
+        self.signals = DiscoverySignals()
+        self.signals.found.connect(self.addDevice)
+        self.prober = DeviceProber(registry, visa_timeout, serial_timeout, workers, DiscoveryCache(CACHE_PATH, cache_ttl))
+        self.prober.probeAll(self.PyVisaIds, self.serialPorts, self.signals.found.emit)
 
         self.timer = QTimer()
         self.timer.timeout.connect(self.wait)
         self.timer.start(0)
         self.app.exec()
+        self.prober.shutdown()
         self.wait()
 
     def selectIndex(self):
         selected_indices = self.Lb.selectedIndexes()
         if selected_indices:
-            selected_index = selected_indices[0].row()
-            if self.selected_type == "PyVisa":
-                self.selected_device = ["PyVisa", self.PyVisaIds[selected_index]]
-                # Close all PyVisa devices
-                for device in self.allDevices:
-                    device.close()
-            if self.selected_type == "PySerial":
-                self.selected_device = ["PySerial", self.serialMap[selected_index][0], self.serialMap[selected_index][1]]
-                # No need to close PySerial devices as they are closed after identification
+            device = self.shown[selected_indices[0].row()]
+            if device.kind == "PyVisa":
+                self.selected_device = ["PyVisa", device.resource]
+            if device.kind == "PySerial":
+                self.selected_device = ["PySerial", device.resource, device.baud]
+            self.selected_idn = device.idn
+            # Keep the chosen session open for the device GUI, close all the others
+            registry.claim(device.resource)
+            registry.releaseUnclaimed()
             self.main.close()
         else:
             QMessageBox.warning(self.main, "No Device Selected", "No Device Selected", QMessageBox.Ok)
@@ -109,38 +127,30 @@ class DeviceSelectionGUI:
     def wait(self):
         pass
 
-    def fillSelection(self, array):
+    def fillSelection(self, kind):
         self.max_length = 1
         self.Lb.clear()
-        if array == self.PyVisaIds:
-            self.selected_type = "PyVisa"
-            for i in range(len(array)):
-                try:
-                    device = self.rm.open_resource(array[i])
-                    device_id = device.query("*IDN?")
-                    self.Lb.addItem(device_id)
-                    self.max_length = max(self.max_length, len(device_id))
-                except VisaIOError:
-                    continue
-        if array == self.PySerialIds:
-            self.selected_type = "PySerial"
-            BAUD = [4800, 9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600]
-            comlist = serial.tools.list_ports.comports()
-            connected = [element.device for element in comlist]
-
-            for i, com in enumerate(connected):
-                for baud in BAUD:
-                    try:
-                        device = serial.Serial(com, baud, timeout=1)
-                        device.write(b'*IDN?\n')
-                        time.sleep(0.1)
-                        device_id = device.read_all().decode("utf-8")
-                        device.close()
-                        if device_id:
-                            self.Lb.addItem(device_id)
-                            self.max_length = max(self.max_length, len(device_id))
-                            self.serialMap[i] = [com, baud]
-                            break
-                    except Exception as e:
-                        print(e)
-                        continue
\ No newline at end of file
+        self.shown = []
+        self.selected_type = kind
+        for device in self.found[kind]:
+            self.showDevice(device)
+
+    def showDevice(self, device):
+        self.shown.append(device)
+        self.Lb.addItem(device.idn)
+        self.max_length = max(self.max_length, len(device.idn))
+
+    def addDevice(self, kind, resource, device):
+        self.remaining -= 1
+        self.updateStatus()
+        if device is None:
+            return
+        self.found[kind].append(device)
+        if kind == self.selected_type:
+            self.showDevice(device)
+
+    def updateStatus(self):
+        if self.remaining > 0:
+            self.statusLabel.setText(f"Searching for devices... ({self.remaining} remaining)")
+        else:
+            self.statusLabel.setText("Search complete")
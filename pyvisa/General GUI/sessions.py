@@ -0,0 +1,127 @@
+"""
+Dependencies:
+    Python: version 3.8.18
+    pyvisa: version 1.14.1
+    pyserial: version 3.5
+
+Classes:
+    SessionRegistry: Keeps every open instrument session (Pyvisa and Pyserial) in one place, so the selection screen and the device GUIs share one ResourceManager
+    and the chosen device is handed over already open instead of being closed and opened again
+        Constructor:
+            no parameters
+        Methods:
+            sample() - all parameters; description
+
+            resourceManager() - no parameters; returns the shared pyvisa ResourceManager, created the first time it is needed
+            setResourceManager() - resource manager; uses the resource manager instead of pyvisa's (e.g. SimulatedResourceManager, see simulated.py), closes every open session
+            open() - resource string, settings (optional, e.g. timeout, read_termination); returns the open session for the resource, opens it if needed, applies the settings
+            openSerial() - port name, baud rate, timeout; returns the open serial session for the port, opens it if needed or if it is open at a different baud rate
+            get() - resource string or port name; returns the open session, None if it is not open
+            configure() - session, settings; applies the settings (attributes such as timeout, read_termination, write_termination) to the session
+            claim() - resource string or port name, settings (optional); marks the session as in use and returns it, claimed sessions are not closed by releaseUnclaimed()
+            isClaimed() - resource string or port name; returns True if the session is claimed
+            close() - resource string or port name; closes the session
+            releaseUnclaimed() - no parameters; closes every session that is not claimed
+            closeAll() - no parameters; closes every session
+
+    Note: registry is the registry shared by all scripts, use it instead of creating a new SessionRegistry.
+"""
+
+import threading
+
+import pyvisa
+import serial
+
+
+class SessionRegistry:
+    def __init__(self):
+        self._rm = None
+        self._sessions = {}
+        self._claimed = set()
+        self._lock = threading.RLock()
+
+    def resourceManager(self):
+        with self._lock:
+            if self._rm is None:
+                self._rm = pyvisa.ResourceManager()
+            return self._rm
+
+    def setResourceManager(self, rm):
+        self.closeAll()
+        with self._lock:
+            self._rm = rm
+
+    def open(self, resource, open_timeout=0, **settings):
+        with self._lock:
+            session = self._sessions.get(resource)
+        if session is None:
+            # Opening can be slow (GPIB/USBTMC), do not hold the lock while other resources are opened
+            session = self.resourceManager().open_resource(resource, open_timeout=open_timeout)
+            with self._lock:
+                if resource in self._sessions:
+                    session.close()
+                    session = self._sessions[resource]
+                else:
+                    self._sessions[resource] = session
+        self.configure(session, **settings)
+        return session
+
+    def openSerial(self, port, baud, timeout=1):
+        with self._lock:
+            session = self._sessions.get(port)
+            if session is not None and session.baudrate != baud:
+                session.close()
+                del self._sessions[port]
+                session = None
+            if session is None:
+                session = serial.Serial(port, baud, timeout=timeout)
+                self._sessions[port] = session
+            else:
+                session.timeout = timeout
+            return session
+
+    def get(self, resource):
+        with self._lock:
+            return self._sessions.get(resource)
+
+    def configure(self, session, **settings):
+        for name, value in settings.items():
+            setattr(session, name, value)
+
+    def claim(self, resource, **settings):
+        with self._lock:
+            session = self._sessions.get(resource)
+            if session is None:
+                return None
+            self._claimed.add(resource)
+        self.configure(session, **settings)
+        return session
+
+    def isClaimed(self, resource):
+        with self._lock:
+            return resource in self._claimed
+
+    def close(self, resource):
+        with self._lock:
+            session = self._sessions.pop(resource, None)
+            self._claimed.discard(resource)
+        if session is not None:
+            try:
+                session.close()
+            except Exception as e:
+                print(e)
+
+    def releaseUnclaimed(self):
+        with self._lock:
+            unclaimed = [resource for resource in self._sessions if resource not in self._claimed]
+        for resource in unclaimed:
+            self.close(resource)
+
+    def closeAll(self):
+        with self._lock:
+            resources = list(self._sessions)
+        for resource in resources:
+            self.close(resource)
+
+
+registry = SessionRegistry()
@@ -0,0 +1,738 @@
+"""
+Dependencies:
+    Python: version 3.8.18
+    pyvisa: version 1.14.1
+
+Classes:
+    SimulatedSession: In-process stand-in for a pyvisa session (write, query, read, read_raw, read_bytes, read_stb, wait_for_srq, clear, close), so the
+    controls, GUIs and recorder can run without an instrument. Subclasses answer the commands.
+        Constructor:
+            latency: time in seconds every write and read takes (bus round trip)
+            latencies: dictionary of command header: extra time in seconds (e.g. {"MEAS:VOLT": 0.02}), matched against the start of the header
+            noise: standard deviation of the measurement noise, relative to the reading
+            seed: seed for the noise (optional), the same seed gives the same readings
+        Methods:
+            sample() - all parameters; description
+
+            write() - command; runs the command, answers of queries are kept for read(), returns the number of bytes written like pyvisa
+            query() - command; writes the command and returns the answer
+            read() - no parameters; returns the next answer as a string, read_termination is removed, raises VisaIOError (timeout) if there is no answer
+            read_raw() - no parameters; returns the next answer as bytes
+            read_bytes() - number of bytes; returns exactly that many bytes of the answers
+            read_stb() - no parameters; returns the status byte
+            wait_for_srq() - timeout in milliseconds (optional); waits until the instrument requests service, raises VisaIOError (timeout) if it does not
+            clear() - no parameters; removes answers that were not read
+            close() - no parameters; closes the session
+            stats() - no parameters; returns a dictionary of counters: writes, reads, commands, bytes_written, bytes_read
+
+    SimulatedE36312A: Keysight E36312A power supply (3 channels). Supports *IDN?, *RST, *CLS, SYST:ERR?, OUTP[:STAT], OUTP:PAIR (OFF, SER, PAR),
+    [SOUR:]VOLT, [SOUR:]CURR, VOLT:PROT, MEAS[:SCAL]:VOLT[:DC]?, MEAS[:SCAL]:CURR[:DC]?, SENS:DLOG:FUNC:VOLT/CURR, SENS:DLOG:PER, SENS:DLOG:TIME,
+    INIT:DLOG, ABOR:DLOG and FETC:DLOG?, chained with ";:" and with (@1:3) channel lists
+        Constructor:
+            loads: resistance in ohms connected to each channel, outputs go into constant current when the load draws more than the current limit
+            all parameters of SimulatedSession
+        Methods:
+            sample() - all parameters; description
+
+            reset() - no parameters; *RST, all outputs off, setpoints and data logger back to their defaults
+
+    SimulatedHP3458A: HP 3458A multimeter (DCV). Supports ID?, RESET, PRESET, TARM, TRIG, NRDGS, TIMER, NPLC, AZERO, DCV, MEM, MCOUNT?, RMEM, OFORMAT, MFORMAT,
+    ISCALE?, INBUF, RQS, END, ERR? and STB?. Readings are taken in simulated time, NPLC / line frequency (doubled with AZERO ON) or TIMER apart.
+        Constructor:
+            signal: function(time in seconds since the trigger) returning the input voltage (optional, 1 V by default)
+            line_frequency: power line frequency in Hz used for NPLC
+            all parameters of SimulatedSession
+        Methods:
+            sample() - all parameters; description
+
+            reset() - no parameters; RESET, back to the power-on settings
+
+    SimulatedSCPI: Generic simulated instrument built from the COMMANDS table of an SCPIInstrument (see scpi.py). Written values are stored and read back,
+    values that were never written are answered with a default. Lets a new instrument run in the simulator as soon as its table exists.
+        Constructor:
+            commands: COMMANDS table of the instrument
+            defaults: dictionary of command name: answer of values that were not written (optional, "0" otherwise)
+            all parameters of SimulatedSession
+        Methods:
+            sample() - all parameters; description
+
+            reset() - no parameters; forgets every written value
+
+    SimulatedResourceManager: Stand-in for pyvisa.ResourceManager with one simulated instrument per resource
+        Constructor:
+            instruments: dictionary of resource string: SimulatedSession (optional, one SimulatedE36312A and one SimulatedHP3458A by default)
+        Methods:
+            sample() - all parameters; description
+
+            list_resources() - no parameters; returns the resource strings
+            open_resource() - resource string; returns the simulated instrument, raises VisaIOError if there is none
+
+    Note: Use registry.setResourceManager(SimulatedResourceManager()) (see sessions.py) or start startGUI.py with --simulate to run everything against the
+    simulated instruments.
+    Note: Binary output formats of the 3458A (SINT, DINT, SREAL, DREAL) are big-endian, like the instrument. SINT and DINT readings are multiplied by ISCALE?.
+    Note: In MEM FIFO (or LIFO) the 3458A removes readings from memory as they are read over the bus, read_bytes() of a binary format reads many at once.
+    Note: FETC:DLOG? count returns up to count data logger records that were not fetched yet, every record is the enabled voltages and currents of
+    channel 1, 2 and 3 in that order, all separated by commas.
+"""
+
+from collections import deque
+import random
+import re
+from string import Formatter
+import struct
+import threading
+import time
+
+from pyvisa import constants
+from pyvisa.errors import VisaIOError
+
+# Long forms of the SCPI nodes that are used, everything is compared in short form
+LONG_FORMS = {
+    "ABORT": "ABOR", "CURRENT": "CURR", "ERROR": "ERR", "FETCH": "FETC", "FUNCTION": "FUNC", "IMMEDIATE": "IMM", "INITIATE": "INIT",
+    "LEVEL": "LEV", "MEASURE": "MEAS", "OUTPUT": "OUTP", "PERIOD": "PER", "PROTECTION": "PROT", "SCALAR": "SCAL", "SENSE": "SENS",
+    "SOURCE": "SOUR", "STATE": "STAT", "SYSTEM": "SYST", "VOLTAGE": "VOLT",
+}
+# Nodes that can be left out
+OPTIONAL_NODES = {"SOUR", "SCAL", "LEV", "IMM", "DC"}
+
+READY = 16
+ERROR = 32
+RQS = 64
+DATA_READY = 128
+
+
+def channelList(text):
+    """Returns the channel numbers in a SCPI channel list, (@1:3) is [1, 2, 3]"""
+    channels = []
+    for part in text.split(","):
+        part = part.strip()
+        if ":" in part:
+            first, last = part.split(":")
+            channels += range(int(first), int(last) + 1)
+        elif part:
+            channels.append(int(part))
+    return channels
+
+
+class SimulatedSession:
+    read_termination = None
+    write_termination = "\n"
+
+    def __init__(self, latency=0.0, latencies=None, noise=1e-4, seed=None):
+        self.latency = latency
+        self.latencies = latencies or {}
+        self.noise = noise
+        self.timeout = 2000
+        self.resource_name = ""
+        self._random = random.Random(seed)
+        self._output = deque()
+        self._errors = deque()
+        self._lock = threading.RLock()
+        self._counters = {"writes": 0, "reads": 0, "commands": 0, "bytes_written": 0, "bytes_read": 0}
+
+    def write(self, command):
+        with self._lock:
+            self._counters["writes"] += 1
+            self._counters["bytes_written"] += len(command)
+            if self._output:
+                # A new command throws away answers that were not read
+                self._output.clear()
+                self.interrupted()
+            delay = self.latency
+            answers = []
+            for part in self.split(command):
+                self._counters["commands"] += 1
+                delay += self._commandLatency(part)
+                answer = self.execute(part)
+                if answer is not None:
+                    answers.append(answer)
+            for answer in self.combine(answers):
+                self._output.append(answer if isinstance(answer, bytes) else answer.encode("ascii"))
+            self._sleep(delay)
+        return len(command) + len(self.write_termination or "")
+
+    def query(self, command):
+        self.write(command)
+        return self.read()
+
+    def read_raw(self):
+        with self._lock:
+            self._counters["reads"] += 1
+            self._sleep(self.latency)
+            if not self._output:
+                self._waitForOutput()
+            data = self._output.popleft()
+            self._counters["bytes_read"] += len(data)
+            return data
+
+    def read(self):
+        text = self.read_raw().decode("ascii", errors="replace")
+        if self.read_termination and self.read_termination in text:
+            text = text[:text.index(self.read_termination)]
+        return text
+
+    def read_bytes(self, count):
+        data = b""
+        while len(data) < count:
+            data += self.read_raw()
+        with self._lock:
+            if len(data) > count:
+                self._output.appendleft(data[count:])
+        return data[:count]
+
+    def read_stb(self):
+        with self._lock:
+            return self.statusByte()
+
+    def wait_for_srq(self, timeout=25000):
+        deadline = time.monotonic() + (timeout or 0) / 1000
+        while True:
+            with self._lock:
+                if self.statusByte() & RQS:
+                    return
+                ready = self.nextEvent()
+            now = time.monotonic()
+            if ready is None or now + ready > deadline:
+                time.sleep(max(0.0, deadline - now))
+                raise VisaIOError(constants.StatusCode.error_timeout)
+            time.sleep(max(ready, 0.0001))
+
+    def clear(self):
+        with self._lock:
+            self._output.clear()
+
+    def close(self):
+        pass
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def split(self, command):
+        return [part.strip() for part in command.split(";") if part.strip()]
+
+    def execute(self, command):
+        """Runs one command, returns the answer (string or bytes) or None"""
+        raise NotImplementedError
+
+    def combine(self, answers):
+        """Returns the messages sent for the answers of one write"""
+        return answers
+
+    def interrupted(self):
+        pass
+
+    def statusByte(self):
+        return RQS | ERROR if self._errors else 0
+
+    def nextEvent(self):
+        """Time in seconds until the instrument has something new to read, None if nothing is coming"""
+        return None
+
+    def error(self, code, message):
+        self._errors.append((code, message))
+
+    def measured(self, value):
+        return value + self._random.gauss(0.0, self.noise * max(abs(value), 1e-3))
+
+    def _commandLatency(self, command):
+        header = command.split()[0].upper() if command.split() else ""
+        return sum(delay for prefix, delay in self.latencies.items() if header.lstrip(":").startswith(prefix))
+
+    def _waitForOutput(self):
+        # Called with the lock held, answers that are still being measured are waited for (up to timeout)
+        ready = self.nextEvent()
+        if ready is None or ready > self.timeout / 1000:
+            self._sleep(self.timeout / 1000 if ready is not None else 0)
+            raise VisaIOError(constants.StatusCode.error_timeout)
+        self._sleep(ready)
+        self.nextEvent()
+        if not self._output:
+            raise VisaIOError(constants.StatusCode.error_timeout)
+
+    def _sleep(self, delay):
+        if delay > 0:
+            time.sleep(delay)
+
+
+class SimulatedE36312A(SimulatedSession):
+    IDN = "Keysight Technologies,E36312A,SIM00001,1.0.0-sim"
+    # Maximum set voltage and current limit of each channel
+    RATINGS = {1: (6.18, 5.15), 2: (25.75, 1.03), 3: (25.75, 1.03)}
+
+    def __init__(self, loads=(10.0, 100.0, 100.0), **session):
+        super().__init__(**session)
+        self.loads = dict(zip([1, 2, 3], loads))
+        self.reset()
+
+    def reset(self):
+        self.voltage = {1: 0.0, 2: 0.0, 3: 0.0}
+        self.current = {1: 5.0, 2: 1.0, 3: 1.0}
+        self.output = {1: False, 2: False, 3: False}
+        self.protection = {1: 6.6, 2: 26.5, 3: 26.5}
+        self.pair = "OFF"
+        self.dlogFunctions = {}
+        self.dlogPeriod = 0.1
+        self.dlogTime = 30.0
+        self.dlogStart = None
+        self.dlogFetched = 0
+
+    def combine(self, answers):
+        # The answers of chained queries come back in one message
+        if not answers:
+            return []
+        return [";".join(answers) + "\n"]
+
+    def interrupted(self):
+        self.error(-410, "Query INTERRUPTED")
+
+    def header(self, command):
+        header = command.split()[0].upper()
+        query = header.endswith("?")
+        nodes = [LONG_FORMS.get(node, node) for node in header.rstrip("?").lstrip(":").split(":")]
+        nodes = [node for node in nodes if node not in OPTIONAL_NODES]
+        if nodes[:2] == ["OUTP", "STAT"]:
+            del nodes[1]
+        return ":".join(nodes), query
+
+    def execute(self, command):
+        header, query = self.header(command)
+        argument = command[len(command.split()[0]):]
+        match = re.search(r"\(@([^)]*)\)", argument)
+        # Without a channel list commands go to channel 1
+        channels = channelList(match.group(1)) if match else [1]
+        value = argument[:match.start()] if match else argument
+        value = value.strip().strip(",").strip()
+
+        if header == "*IDN" and query:
+            return self.IDN
+        if header == "*RST":
+            self.reset()
+        elif header == "*CLS":
+            self._errors.clear()
+        elif header == "*OPC" and query:
+            return "1"
+        elif header == "SYST:ERR" and query:
+            code, message = self._errors.popleft() if self._errors else (0, "No error")
+            return f'{code:+d},"{message}"'
+        elif header == "OUTP:PAIR":
+            if query:
+                return self.pair
+            if value.upper() in ("OFF", "SER", "PAR"):
+                self.pair = value.upper()
+            else:
+                self.error(-224, "Illegal parameter value")
+        elif header == "OUTP":
+            return self.channelSetting(self.output, query, channels, value, lambda text: text.upper() in ("1", "ON"), lambda state: str(int(state)))
+        elif header == "VOLT":
+            return self.channelSetting(self.voltage, query, channels, value, float, "{:.6E}".format, limit=0)
+        elif header == "CURR":
+            return self.channelSetting(self.current, query, channels, value, float, "{:.6E}".format, limit=1)
+        elif header == "VOLT:PROT":
+            return self.channelSetting(self.protection, query, channels, value, float, "{:.6E}".format)
+        elif header in ("MEAS:VOLT", "MEAS:CURR") and query:
+            return ",".join("{:.6E}".format(self.measure(ch)[header == "MEAS:CURR"]) for ch in channels)
+        elif header in ("SENS:DLOG:FUNC:VOLT", "SENS:DLOG:FUNC:CURR"):
+            function = header.split(":")[-1]
+            if query:
+                return ",".join(str(int(self.dlogFunctions.get((ch, function), False))) for ch in channels)
+            for ch in channels:
+                self.dlogFunctions[(ch, function)] = value.upper() in ("1", "ON")
+        elif header == "SENS:DLOG:PER":
+            if query:
+                return "{:.6E}".format(self.dlogPeriod)
+            self.dlogPeriod = float(value)
+        elif header == "SENS:DLOG:TIME":
+            if query:
+                return "{:.6E}".format(self.dlogTime)
+            self.dlogTime = float(value)
+        elif header == "INIT:DLOG":
+            self.dlogStart = time.monotonic()
+            self.dlogFetched = 0
+        elif header == "ABOR:DLOG":
+            self.dlogStart = None
+        elif header == "FETC:DLOG" and query:
+            return self.fetchDlog(int(float(value)) if value else None)
+        else:
+            self.error(-113, "Undefined header")
+            # A query that is not understood is never answered, like the instrument
+        return None
+
+    def channelSetting(self, setting, query, channels, value, parse, format, limit=None):
+        if query:
+            return ",".join(format(setting[ch]) for ch in channels)
+        try:
+            parsed = parse(value)
+        except ValueError:
+            self.error(-224, "Illegal parameter value")
+            return None
+        for ch in channels:
+            if ch not in setting:
+                self.error(-221, "Settings conflict")
+            elif limit is not None and not 0 <= parsed <= self.rating(ch)[limit]:
+                self.error(-222, "Data out of range")
+            else:
+                setting[ch] = parsed
+        return None
+
+    def rating(self, ch):
+        voltage, current = self.RATINGS[ch]
+        if ch == 2 and self.pair == "SER":
+            voltage *= 2
+        if ch == 2 and self.pair == "PAR":
+            current *= 2
+        return voltage, current
+
+    def measure(self, ch):
+        """Returns the measured voltage and current of a channel"""
+        # Paired, channel 2 is the combined output and channel 3 follows it
+        source = 2 if ch == 3 and self.pair != "OFF" else ch
+        if not self.output[source]:
+            return self.measured(0.0), self.measured(0.0)
+        voltage = self.voltage[source]
+        current = voltage / self.loads[source]
+        if current > self.current[source]:
+            # Constant current
+            current = self.current[source]
+            voltage = current * self.loads[source]
+        if ch == 3 and self.pair == "SER":
+            voltage /= 2
+        elif ch == 3 and self.pair == "PAR":
+            current /= 2
+        return self.measured(voltage), self.measured(current)
+
+    def fetchDlog(self, count=None):
+        if self.dlogStart is None:
+            return ""
+        elapsed = min(time.monotonic() - self.dlogStart, self.dlogTime)
+        available = int(elapsed / self.dlogPeriod) + 1 - self.dlogFetched
+        if count is not None:
+            available = min(available, count)
+        values = []
+        for _ in range(max(available, 0)):
+            for ch in [1, 2, 3]:
+                voltage, current = self.measure(ch)
+                if self.dlogFunctions.get((ch, "VOLT")):
+                    values.append("{:.6E}".format(voltage))
+                if self.dlogFunctions.get((ch, "CURR")):
+                    values.append("{:.6E}".format(current))
+        self.dlogFetched += max(available, 0)
+        return ",".join(values)
+
+
+class SimulatedHP3458A(SimulatedSession):
+    write_termination = "\r"
+    # Readings that fit in reading memory in each memory format
+    MEMORY = {"SINT": 75000, "DINT": 37500, "SREAL": 37500, "DREAL": 18750, "ASCII": 10240}
+    BINARY = {"SINT": ">h", "DINT": ">i", "SREAL": ">f", "DREAL": ">d"}
+
+    def __init__(self, signal=None, line_frequency=60, **session):
+        session.setdefault("noise", 1e-6)
+        super().__init__(**session)
+        self.signal = signal or (lambda elapsed: 1.0)
+        self.line_frequency = line_frequency
+        self.reset()
+
+    def reset(self):
+        self.range = 10.0
+        self.nplc = 10.0
+        self.azero = True
+        self.nrdgs = 1
+        self.sampleEvent = "AUTO"
+        self.timer = 1.0
+        self.tarm = "AUTO"
+        self.trig = "AUTO"
+        self.mem = "OFF"
+        self.oformat = "ASCII"
+        self.mformat = "SREAL"
+        self.inbuf = False
+        self.rqs = 8
+        self.memory = deque()
+        self.burst = None
+        self.clear()
+        self._errors.clear()
+
+    def execute(self, command):
+        parts = command.split(None, 1)
+        header = parts[0].upper()
+        arguments = [argument.strip().upper() for argument in parts[1].split(",")] if len(parts) > 1 else []
+        if self.burst is not None and not self.inbuf and header not in ("ERR?", "STB?", "MCOUNT?"):
+            # Without INBUF ON the bus is held until the burst is finished
+            self._finishBurst()
+        self._advance()
+
+        if header == "ID?":
+            return "HP3458A\r\n"
+        if header == "RESET":
+            self.reset()
+        elif header == "PRESET":
+            fast = arguments[:1] == ["FAST"]
+            self.reset()
+            self.trig = "AUTO" if fast else "SYN"
+            self.oformat = "DINT" if fast else "ASCII"
+            self.mformat = "DINT" if fast else "SREAL"
+            self.nplc = 0.0 if fast else 1.0
+            self.azero = not fast
+        elif header == "DCV":
+            if arguments and arguments[0] not in ("AUTO", ""):
+                self.range = float(arguments[0])
+        elif header == "NPLC":
+            self.nplc = float(arguments[0])
+        elif header == "AZERO":
+            self.azero = arguments[0] in ("ON", "1", "ONCE")
+        elif header == "NRDGS":
+            self.nrdgs = int(float(arguments[0]))
+            self.sampleEvent = arguments[1] if len(arguments) > 1 else "AUTO"
+        elif header == "TIMER":
+            self.timer = float(arguments[0])
+        elif header == "TRIG":
+            self.trig = arguments[0]
+            if self.trig in ("AUTO", "SGL") and self.tarm in ("AUTO", "SGL") and self.burst is None:
+                self._arm(1)
+        elif header == "TARM":
+            self.tarm = arguments[0]
+            if self.tarm == "SGL":
+                self._arm(int(float(arguments[1])) if len(arguments) > 1 else 1)
+            elif self.tarm == "HOLD":
+                self.burst = None
+        elif header == "MEM":
+            self.mem = arguments[0]
+            if self.mem in ("FIFO", "LIFO"):
+                self.memory.clear()
+        elif header == "MCOUNT?":
+            return f"{len(self.memory)}\r\n"
+        elif header == "RMEM":
+            return self.readMemory(*[int(float(argument)) for argument in arguments[:2]])
+        elif header == "OFORMAT":
+            self.oformat = arguments[0]
+        elif header == "MFORMAT":
+            self.mformat = arguments[0]
+        elif header == "ISCALE?":
+            return "{: .9E}\r\n".format(self.scale(self.oformat))
+        elif header == "INBUF":
+            self.inbuf = arguments[0] in ("ON", "1")
+        elif header == "RQS":
+            self.rqs = int(float(arguments[0]))
+        elif header == "ERR?":
+            bits = 0
+            while self._errors:
+                bits |= self._errors.popleft()[0]
+            return f"{bits}\r\n"
+        elif header == "STB?":
+            return f"{self.statusByte()}\r\n"
+        elif header in ("END", "LFREQ", "QFORMAT", "MATH", "DISP", "TRIG?", "FUNC"):
+            pass
+        else:
+            self.error(1, "Undefined command")
+        return None
+
+    def scale(self, format):
+        if format == "SINT":
+            return self.range * 1.2 / 32767
+        if format == "DINT":
+            return self.range * 1.2 / 2147483647
+        return 1.0
+
+    def encode(self, readings):
+        if self.oformat in self.BINARY:
+            scale = self.scale(self.oformat)
+            if self.oformat in ("SINT", "DINT"):
+                readings = [round(reading / scale) for reading in readings]
+            return struct.pack(">" + self.BINARY[self.oformat][1] * len(readings), *readings)
+        return (",".join("{: .9E}".format(reading) for reading in readings) + "\r\n").encode("ascii")
+
+    def readMemory(self, first=1, count=1):
+        readings = list(self.memory) if self.mem != "LIFO" else list(reversed(self.memory))
+        if first < 1 or first + count - 1 > len(readings):
+            self.error(32, "Reading memory is empty or the reading does not exist")
+            return None
+        return self.encode(readings[first - 1:first - 1 + count])
+
+    def interval(self):
+        integration = max(self.nplc / self.line_frequency, 1e-5) * (2 if self.azero else 1)
+        if self.sampleEvent == "TIMER":
+            return max(self.timer, integration)
+        return integration
+
+    def statusByte(self):
+        self._advance()
+        status = 0
+        if self._output or (self.mem == "OFF" and self.burst is not None and self.burst["taken"] > self.burst["output"]):
+            status |= DATA_READY
+        if self.burst is None:
+            status |= READY
+        if self._errors:
+            status |= ERROR
+        if status & self.rqs:
+            status |= RQS
+        return status
+
+    def nextEvent(self):
+        self._advance()
+        if self.burst is None:
+            return None
+        burst = self.burst
+        return max(burst["start"] + (burst["taken"] + 1) * burst["interval"] - time.monotonic(), 0.0)
+
+    def _arm(self, count):
+        self.burst = {"start": time.monotonic(), "interval": self.interval(), "total": count * self.nrdgs, "taken": 0, "output": 0}
+
+    def _advance(self):
+        """Takes the readings that are finished by now"""
+        burst = self.burst
+        if burst is None:
+            return
+        done = min(int((time.monotonic() - burst["start"]) / burst["interval"]), burst["total"])
+        for index in range(burst["taken"], done):
+            reading = self.measured(self.signal(index * burst["interval"]))
+            if self.oformat in ("SINT", "DINT") or self.mformat in ("SINT", "DINT"):
+                scale = self.scale(self.mformat if self.mem != "OFF" else self.oformat)
+                reading = round(reading / scale) * scale
+            if self.mem == "OFF":
+                if self.tarm == "AUTO" and self.trig == "AUTO":
+                    # Measuring continuously, only the newest reading is kept
+                    self._output.clear()
+                self._output.append(self.encode([reading]))
+            elif len(self.memory) >= self.MEMORY.get(self.mformat, 10240):
+                if self.mem == "LIFO":
+                    self.memory.popleft()
+                    self.memory.append(reading)
+                else:
+                    self.error(4, "Reading memory overflow")
+            else:
+                self.memory.append(reading)
+        burst["taken"] = done
+        if done == burst["total"]:
+            self.burst = None
+            if self.tarm == "AUTO" and self.trig == "AUTO":
+                # Keeps measuring
+                self._arm(1)
+
+    def _finishBurst(self):
+        remaining = self.burst["start"] + self.burst["total"] * self.burst["interval"] - time.monotonic()
+        if self.tarm == "AUTO" and self.trig == "AUTO":
+            return
+        if remaining > self.timeout / 1000:
+            self._sleep(self.timeout / 1000)
+            raise VisaIOError(constants.StatusCode.error_timeout)
+        self._sleep(remaining)
+
+    def read_raw(self):
+        with self._lock:
+            if not self._output and self.mem in ("FIFO", "LIFO"):
+                self._advance()
+                if not self.memory and self.burst is not None:
+                    self._sleep(min(self.nextEvent(), self.timeout / 1000))
+                    self._advance()
+                if self.memory:
+                    # Reading memory from the bus removes the readings
+                    reading = self.memory.popleft() if self.mem == "FIFO" else self.memory.pop()
+                    self._output.append(self.encode([reading]))
+            return super().read_raw()
+
+    def read_bytes(self, count):
+        with self._lock:
+            if self._output or self.mem not in ("FIFO", "LIFO") or self.oformat not in self.BINARY:
+                return super().read_bytes(count)
+            # Binary readings straight from memory come in one transfer, waiting for readings that are still being taken
+            size = struct.calcsize(self.BINARY[self.oformat])
+            needed = -(-count // size)
+            deadline = time.monotonic() + self.timeout / 1000
+            self._advance()
+            while len(self.memory) < needed:
+                ready = self.nextEvent()
+                if ready is None or time.monotonic() + ready > deadline:
+                    raise VisaIOError(constants.StatusCode.error_timeout)
+                self._sleep(max(ready, 0.0001))
+            readings = [self.memory.popleft() if self.mem == "FIFO" else self.memory.pop() for i in range(needed)]
+            data = self.encode(readings)[:count]
+            self._counters["reads"] += 1
+            self._counters["bytes_read"] += len(data)
+            self._sleep(self.latency)
+            return data
+
+
+class SimulatedSCPI(SimulatedSession):
+    def __init__(self, commands, defaults=None, **session):
+        super().__init__(**session)
+        self.defaults = defaults or {}
+        self._writes = []
+        self._queries = []
+        for command in commands:
+            if command.write is not None:
+                self._writes.append((command, self._pattern(command.write)))
+            if command.query is not None:
+                self._queries.append((command, self._pattern(command.query)))
+        self.reset()
+
+    def reset(self):
+        self.values = {}
+
+    def _pattern(self, template):
+        pattern = ""
+        for literal, field, spec, conversion in Formatter().parse(template):
+            pattern += re.escape(literal)
+            if field:
+                pattern += f"(?P<{field}>.*?)"
+        return re.compile(pattern + "$", re.IGNORECASE)
+
+    def _keys(self, command, fields):
+        # Values are stored per channel, like SCPIInstrument caches them
+        fields = {field: value for field, value in fields.items() if field != "value"}
+        if "ch" not in fields:
+            return [(command.name,) + tuple(sorted(fields.items()))]
+        channels = channelList(fields.pop("ch"))
+        return [(command.name,) + tuple(sorted(dict(fields, ch=str(ch)).items())) for ch in channels]
+
+    def execute(self, command):
+        command = command.lstrip(":")
+        for declared, pattern in self._queries:
+            match = pattern.match(command)
+            if match:
+                answers = [self.values.get(key, self.defaults.get(declared.name, "0")) for key in self._keys(declared, match.groupdict())]
+                return ",".join(answers)
+        for declared, pattern in self._writes:
+            match = pattern.match(command)
+            if match:
+                if declared.invalidates == "*" and "value" not in match.groupdict():
+                    self.reset()
+                elif "value" in match.groupdict():
+                    for key in self._keys(declared, match.groupdict()):
+                        self.values[key] = match.group("value")
+                return None
+        self.error(-113, "Undefined header")
+        return None
+
+    def combine(self, answers):
+        if not answers:
+            return []
+        return [";".join(answers) + "\n"]
+
+    def interrupted(self):
+        self.error(-410, "Query INTERRUPTED")
+
+
+class SimulatedResourceManager:
+    def __init__(self, instruments=None):
+        if instruments is None:
+            instruments = {
+                "USB0::0x2A8D::0x1102::SIM00001::INSTR": SimulatedE36312A(),
+                "GPIB0::22::INSTR": SimulatedHP3458A(),
+            }
+        self.instruments = instruments
+        for resource, instrument in instruments.items():
+            instrument.resource_name = resource
+
+    def list_resources(self, query="?*::INSTR"):
+        return tuple(self.instruments)
+
+    def open_resource(self, resource, open_timeout=0, **settings):
+        instrument = self.instruments.get(resource)
+        if instrument is None:
+            raise VisaIOError(constants.StatusCode.error_resource_not_found)
+        for name, value in settings.items():
+            setattr(instrument, name, value)
+        return instrument
+
+    def close(self):
+        pass
@@ -0,0 +1,256 @@
+"""
+Dependencies:
+    Python: version 3.8.18
+
+Classes:
+    TelemetrySpool: Append-only local spool for line protocol points, so data is kept on disk when InfluxDB is slow or unreachable. Points are appended to the open
+    segment file, which is sealed and replaced by a new one when it gets too large or too old. Sealed segments are read back by SpoolDrainer.
+        Constructor:
+            directory: folder for the segment files, created if it does not exist
+            precision: precision of the timestamps in the points ('s', 'ms', 'us', 'ns'), stored in the segment file names
+            segment_bytes: size in bytes after which the open segment is sealed
+            segment_seconds: age in seconds after which the open segment is sealed
+            fsync: if True, every append is forced to disk (slower, survives power loss), otherwise appends are flushed to the operating system only
+        Methods:
+            sample() - all parameters; description
+
+            append() - line protocol string or list of strings; appends the points to the open segment
+            rotate() - force (optional); seals the open segment if it is too large or too old (or not empty when force is True)
+            sealedSegments() - no parameters; returns the paths of the sealed segments, oldest first
+            readSegment() - path; returns the points in the segment and their precision, an incomplete last line (crash while writing) is skipped
+            removeSegment() - path; deletes a segment after it has been written to InfluxDB
+            pending() - no parameters; returns the number of sealed segments, their total size in bytes and the number of points in them
+            close() - no parameters; seals the open segment
+
+    SpoolDrainer: Thread that writes the sealed segments of a TelemetrySpool to InfluxDB in large batches, waiting longer after each failed write (up to max_backoff)
+        Constructor:
+            spool: TelemetrySpool to drain
+            send: function(lines, precision) that writes the lines and raises an error if the write fails (for example InfluxClient.write_batch)
+            batch_size: maximum number of points per write
+            interval: time in seconds between checks for new segments
+            max_backoff: longest wait in seconds after failed writes
+            close: function called on the drainer's thread when it stops (optional, for example InfluxClient.close), so the client is never closed under a
+                   write that is still in progress
+            after: SpoolDrainer of the same spool folder that is still stopping (optional), this one waits for it before sending so a segment is never sent by two
+        Methods:
+            sample() - all parameters; description
+
+            stats() - no parameters; returns a dictionary of counters: pending_segments, pending_bytes, queue_depth (points not written yet), points_sent,
+                      batches_sent, failed_batches, last/mean/max flush latency in seconds (time of one write), backoff, last_error
+            stop() - drain (optional), timeout (optional); stops the thread, if drain is True everything in the spool is written first (gives up on the first
+                     failure), otherwise it stops after the write in progress, waits at most timeout seconds for the thread, returns True if it stopped
+            run() - no parameters; drains the spool until stopped, do not call directly, use start()
+
+    Note: Segments that were still open when the program stopped are sealed the next time the spool is opened, so nothing recorded before a crash is lost.
+    Note: A segment is deleted only when all of its points have been written. If the program stops in the middle of a segment, those points are written again on
+    the next run, InfluxDB overwrites points with the same measurement, tags and timestamp so this does not create duplicates.
+"""
+
+import logging
+import os
+import threading
+import time
+
+OPEN_SUFFIX = ".open"
+SEALED_SUFFIX = ".lp"
+
+
+class TelemetrySpool:
+    def __init__(self, directory, precision='s', segment_bytes=4 * 1024 * 1024, segment_seconds=10.0, fsync=False):
+        self.directory = directory
+        self.precision = precision
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._file = None
+        # Number of points in each sealed segment, segments sealed by a previous run are counted when pending() first sees them
+        self._points = {}
+        os.makedirs(directory, exist_ok=True)
+
+        # Seal segments left open by a previous run
+        sequence = 0
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(OPEN_SUFFIX):
+                path = os.path.join(directory, name)
+                os.replace(path, path[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+            if name.endswith(OPEN_SUFFIX) or name.endswith(SEALED_SUFFIX):
+                sequence = max(sequence, int(name.split("-")[0]) + 1)
+        self._sequence = sequence
+
+    def append(self, lines):
+        if isinstance(lines, str):
+            lines = [lines]
+        if not lines:
+            return
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        with self._lock:
+            if self._file is None:
+                self._openSegment()
+            self._file.write(data)
+            self._openPoints += len(lines)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._size += len(data)
+            if self._size >= self.segment_bytes:
+                self._sealSegment()
+
+    def rotate(self, force=False):
+        with self._lock:
+            if self._file is None:
+                return
+            if force or self._size >= self.segment_bytes or time.monotonic() - self._opened >= self.segment_seconds:
+                self._sealSegment()
+
+    def sealedSegments(self):
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(SEALED_SUFFIX))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def readSegment(self, path):
+        with open(path, "rb") as file:
+            data = file.read()
+        lines = data.decode("utf-8", errors="replace").split("\n")
+        # Everything after the last newline was not completely written
+        lines = [line for line in lines[:-1] if line]
+        precision = os.path.basename(path)[:-len(SEALED_SUFFIX)].split("-")[1]
+        return lines, precision
+
+    def removeSegment(self, path):
+        os.remove(path)
+        with self._lock:
+            self._points.pop(path, None)
+
+    def pending(self):
+        segments = self.sealedSegments()
+        points = 0
+        for path in segments:
+            with self._lock:
+                count = self._points.get(path)
+            if count is None:
+                count = len(self.readSegment(path)[0])
+                with self._lock:
+                    self._points[path] = count
+            points += count
+        return len(segments), sum(os.path.getsize(path) for path in segments), points
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._sealSegment()
+
+    def _openSegment(self):
+        self._path = os.path.join(self.directory, f"{self._sequence:012d}-{self.precision}{OPEN_SUFFIX}")
+        self._sequence += 1
+        self._file = open(self._path, "ab")
+        self._size = 0
+        self._openPoints = 0
+        self._opened = time.monotonic()
+
+    def _sealSegment(self):
+        self._file.close()
+        self._file = None
+        sealed = self._path[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX
+        os.replace(self._path, sealed)
+        self._points[sealed] = self._openPoints
+
+
+class SpoolDrainer(threading.Thread):
+    def __init__(self, spool, send, batch_size=5000, interval=1.0, max_backoff=60.0, close=None, after=None):
+        super().__init__(name="SpoolDrainer", daemon=True)
+        self.spool = spool
+        self.send = send
+        self.close = close
+        self.after = after
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self._stopping = threading.Event()
+        self._drainOnStop = False
+        self._backoff = 0.0
+        self._sent = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "points_sent": 0,
+            "batches_sent": 0,
+            "failed_batches": 0,
+            "last_error": None,
+            "last_flush_latency": 0.0,
+            "max_flush_latency": 0.0,
+            "total_flush_latency": 0.0,
+        }
+
+    def stats(self):
+        segments, size, points = self.spool.pending()
+        with self._lock:
+            stats = dict(self._counters)
+            # Points of a segment that were written before a failure are still in the segment file
+            points -= sum(self._sent.values())
+        batches = stats["batches_sent"] + stats["failed_batches"]
+        stats["mean_flush_latency"] = stats.pop("total_flush_latency") / batches if batches else 0.0
+        stats["pending_segments"] = segments
+        stats["pending_bytes"] = size
+        stats["queue_depth"] = max(0, points)
+        stats["backoff"] = self._backoff
+        return stats
+
+    def stop(self, drain=True, timeout=None):
+        self._drainOnStop = drain
+        self._stopping.set()
+        self.join(timeout)
+        return not self.is_alive()
+
+    def run(self):
+        try:
+            if self.after is not None:
+                self.after.join()
+                self.after = None
+            while not self._stopping.wait(self._backoff or self.interval):
+                self.spool.rotate()
+                self._drain()
+            if self._drainOnStop:
+                self.spool.rotate(force=True)
+                self._drain()
+        finally:
+            if self.close is not None:
+                self.close()
+
+    def _drain(self):
+        for path in self.spool.sealedSegments():
+            lines, precision = self.spool.readSegment(path)
+            # Points already written from this segment in this run
+            with self._lock:
+                start = self._sent.get(path, 0)
+            while start < len(lines):
+                if self._stopping.is_set() and not self._drainOnStop:
+                    # Stopped without draining, the rest stays in the spool
+                    with self._lock:
+                        self._sent[path] = start
+                    return
+                batch = lines[start:start + self.batch_size]
+                sendStart = time.perf_counter()
+                try:
+                    self.send(batch, precision)
+                except Exception as e:
+                    logging.error(f'Failed to write spooled data: {e}')
+                    with self._lock:
+                        self._countLatency(time.perf_counter() - sendStart)
+                        self._counters["failed_batches"] += 1
+                        self._counters["last_error"] = str(e)
+                        self._sent[path] = start
+                    self._backoff = min(max(2 * self._backoff, self.interval), self.max_backoff)
+                    return
+                start += len(batch)
+                with self._lock:
+                    self._countLatency(time.perf_counter() - sendStart)
+                    self._counters["points_sent"] += len(batch)
+                    self._counters["batches_sent"] += 1
+            self.spool.removeSegment(path)
+            with self._lock:
+                self._sent.pop(path, None)
+            self._backoff = 0.0
+
+    def _countLatency(self, latency):
+        self._counters["last_flush_latency"] = latency
+        self._counters["max_flush_latency"] = max(self._counters["max_flush_latency"], latency)
+        self._counters["total_flush_latency"] += latency
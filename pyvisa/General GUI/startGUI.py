@@ -13,43 +13,54 @@ No Classes
 Methods:
     sample() - all parameters; description
 
-    GUI_start() - no parameters, creates the selection GUI, Pyvisa and Pyserial devices are separated and have designated buttons to display
+    GUI_start() - no parameters, creates the selection GUI, Pyvisa and Pyserial devices are separated and have designated buttons to display,
+                  the selected device is taken from the session registry already open (see sessions.py), only the driver of the selected device is imported (see drivers.py)
+    startupTime() - name of the start up phase, time to measure from (optional); prints the time since start (or since the given time) when started with --startup-time
+
+    Note: Start with --simulate to use the simulated instruments (see simulated.py) instead of the connected ones.
+    Note: Start with --startup-time to print how long each phase of start up takes (imports, selection screen shown, driver import, device window shown).
 """
 
-# PyVisa imports
-import pyvisa
 import time
+STARTUP = time.perf_counter()
 
 #Pyside6 imports
 from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QTimer
 
-# PySerial imports
-import serial
-import serial.tools.list_ports
 import sys
 
 #Python Scripts
 from selection import DeviceSelectionGUI
-from E36312A import GUI_E36312A
+from sessions import registry
+from drivers import loadDriver
+
+def startupTime(phase, start=STARTUP):
+    if "--startup-time" in sys.argv:
+        print(f"{phase}: {time.perf_counter() - start:.3f} s")
 
 def GUI_start():
-    gui = DeviceSelectionGUI()
+    startupTime("imports")
+    if "--simulate" in sys.argv:
+        from simulated import SimulatedResourceManager
+        registry.setResourceManager(SimulatedResourceManager())
+    gui = DeviceSelectionGUI(shown=lambda: startupTime("selection screen shown"))
     selected_device = gui.selected_device
     if not selected_device:
         sys.exit()
+    # Everything after the selection is measured from when the device was selected
+    selected = time.perf_counter()
 
-    rm = pyvisa.ResourceManager()
+    # The selection screen already opened and identified the device
     if selected_device[0] == "PyVisa":
-        my_device = rm.open_resource(selected_device[1])
-        id = my_device.query("*IDN?").split(",")
+        my_device = registry.claim(selected_device[1])
     if selected_device[0] == "PySerial":
-        my_device = serial.Serial(selected_device[1], selected_device[2], timeout=1)
-        my_device.write(b'*IDN?\n')
-        time.sleep(0.1)
-        id = my_device.read_all().decode("utf-8").split(",")
-
-    class_name = f"GUI_{id[1]}"
-    if hasattr(sys.modules[__name__], class_name):
+        my_device = registry.claim(selected_device[1], timeout=1)
+    driver = loadDriver(gui.selected_idn)
+    startupTime("driver imported", selected)
+    if driver is None:
+        print(f"No driver for {gui.selected_idn.strip()}")
+    else:
         try:
             app = QApplication.instance()
             if app is None:
@@ -58,12 +69,14 @@ def GUI_start():
                 app.quit()
                 app = QApplication.instance()
 
-            main_window = globals()[class_name](my_device)
+            main_window = driver(my_device)
             main_window.show()
+            QTimer.singleShot(0, lambda: startupTime("device window shown", selected))
             app.exec()
         except Exception as e:
             app.quit()
-            my_device.close()
+            registry.closeAll()
             sys.exit()
+    registry.closeAll()
 
 GUI_start()
\ No newline at end of file
@@ -6,7 +6,10 @@ class InfluxClient:
         self._org=org 
         self._bucket = bucket
         self._client = InfluxDBClient(url="http://bragi.caltech.edu:8086", token=token)
+        self._write_apis = {}
 
-    def write_data(self,data,write_option=SYNCHRONOUS):
-        write_api = self._client.write_api(write_option)
-        write_api.write(self._bucket, self._org , data,write_precision='s')
\ No newline at end of file
+    def write_data(self,data,write_option=SYNCHRONOUS,precision='s'):
+        # Keep one write_api per write option instead of creating one per write
+        if write_option not in self._write_apis:
+            self._write_apis[write_option] = self._client.write_api(write_option)
+        self._write_apis[write_option].write(self._bucket, self._org , data,write_precision=precision)